@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark for the parallel batch export ("plot_flowchart.py batch").
+
+Writes a folder of synthetic Mermaid diagrams and renders all of them to PNG
+and SVG with an increasing number of worker processes, then once more without
+--force, when every source is unchanged and skipped by its content hash. Wall
+time includes starting the workers (each creates its own offscreen
+QApplication), so throughput only scales once the batch outweighs that.
+
+Run from the repository root:
+    python benchmarks/bench_batch_export.py
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_ROOT, "plot_flowchart.py")
+FILES = 48
+NODES_PER_FILE = 40
+
+
+def write_sources(folder):
+    for index in range(FILES):
+        lines = ["flowchart TD"]
+        for i in range(NODES_PER_FILE - 1):
+            label = f"|branch {i}|" if i % 5 == 0 else ""
+            lines.append(f"    N{i}[\"Step {i} of diagram {index}\"] -->{label} N{i + 1}{{\"Check {i + 1}\"}}")
+        with open(os.path.join(folder, f"diagram{index:03}.mmd"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def run_batch(source_dir, out_dir, jobs, force):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    command = [sys.executable, SCRIPT, "batch", source_dir, "--out-dir", out_dir, "--jobs", str(jobs)]
+    start = time.perf_counter()
+    subprocess.run(command + (["--force"] if force else []), env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    job_counts = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    print(f"{FILES} diagrams x {NODES_PER_FILE} nodes -> png + svg ({cpus} CPUs)")
+    print(f"{'jobs':>5} {'wall (s)':>9} {'files/s':>8} {'speed-up':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        source_dir, out_dir = os.path.join(folder, "src"), os.path.join(folder, "out")
+        os.makedirs(source_dir)
+        write_sources(source_dir)
+        baseline = None
+        for jobs in job_counts:
+            wall = run_batch(source_dir, out_dir, jobs, force=True)
+            baseline = baseline or wall
+            print(f"{jobs:>5} {wall:>9.2f} {FILES / wall:>8.1f} {baseline / wall:>8.2f}x")
+        wall = run_batch(source_dir, out_dir, cpus, force=False)
+        print(f"unchanged sources skipped: {wall:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark for saving projects as JSON.
+
+Builds a real Diagram (the designer's model) and compares the peak Python
+memory (tracemalloc) of three ways of saving it:
+
+  legacy    a project dict and one json.dumps(indent=2) string
+  records   the project dict (project_data) streamed by write_project_file
+  columns   a copy of the packed columns (project_snapshot, Diagram.copy)
+            streamed by write_project_file, which makes the records one at
+            a time: what FlowchartDesigner.save_project_file does
+
+Taking the snapshot is part of each measurement. The diagram itself is
+built before measuring, so only the cost of saving is reported. The timings
+include tracemalloc's overhead and are only comparable to each other.
+
+Run from the repository root:
+    python benchmarks/bench_json_save_memory.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flowchart_model import DiagramBuilder
+from plot_flowchart import FileTask, write_project_file
+
+SIZES = [10000, 50000, 100000]
+TYPES = ["rectangle", "diamond", "start_end", "input_output", "ellipse"]
+
+
+def build_diagram(n):
+    side = int(n ** 0.5) + 1
+    builder = DiagramBuilder()
+    for i in range(n):
+        builder.node(f"node{i}", f"Step {i}\nCheck input", TYPES[i % len(TYPES)],
+                     x=(i % side) * 150.0, y=(i // side) * 120.0)
+    for i in range(n - 1):
+        builder.edge(f"node{i}", f"node{i + 1}", "yes" if i % 7 == 0 else "")
+    return builder.build()
+
+
+def legacy_save(diagram, path):
+    with open(path, 'w') as f:
+        f.write(json.dumps(diagram.to_project(), indent=2))
+
+
+def records_save(diagram, path):
+    write_project_file(FileTask(), path, diagram.to_project())
+
+
+def columns_save(diagram, path):
+    write_project_file(FileTask(), path, diagram.copy())
+
+
+def measure(save, diagram, path):
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    save(diagram, path)
+    elapsed = time.perf_counter() - start
+    return (tracemalloc.get_traced_memory()[1] - baseline) / 2 ** 20, elapsed * 1000
+
+
+def main():
+    saves = (("legacy", legacy_save), ("records", records_save), ("columns", columns_save))
+    print(f"{'nodes':>7}" + "".join(f" {name + ' peak (MiB)':>20}" for name, _ in saves)
+          + "".join(f" {name + ' (ms)':>14}" for name, _ in saves))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "project.json")
+        for n in SIZES:
+            diagram = build_diagram(n)
+            tracemalloc.start()
+            results = [measure(save, diagram, path) for _, save in saves]
+            tracemalloc.stop()
+            print(f"{n:>7}" + "".join(f" {peak:>20.1f}" for peak, _ in results)
+                  + "".join(f" {ms:>14.0f}" for _, ms in results))
+
+
+if __name__ == "__main__":
+    main()
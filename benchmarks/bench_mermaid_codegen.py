@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the incremental Mermaid code generator (MermaidCodeCache).
+
+Builds a 10k-node chain diagram, then measures a full (cold) generation
+against a single-node text edit followed by regeneration.
+
+Run from the repository root:
+    python benchmarks/bench_mermaid_codegen.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plot_flowchart import MermaidCodeCache
+
+NODE_COUNT = 10000
+REPEATS = 200
+TYPES = ["rectangle", "diamond", "start_end", "input_output", "ellipse"]
+
+
+class StubShape:
+    """Only the attributes MermaidCodeCache reads from a Shape."""
+    def __init__(self, short_id, shape_type, text):
+        self.short_id, self.type, self.text = short_id, shape_type, text
+
+
+class StubConnector:
+    def __init__(self, start_shape, end_shape, label):
+        self.start_shape, self.end_shape, self.label = start_shape, end_shape, label
+
+
+def build_diagram(n):
+    shapes = [StubShape(f"node{i}", TYPES[i % len(TYPES)], f"Step {i}\nDetails")
+              for i in range(n)]
+    connectors = [StubConnector(shapes[i], shapes[i + 1], "yes" if i % 7 == 0 else "")
+                  for i in range(n - 1)]
+    return shapes, connectors
+
+
+def main():
+    shapes, connectors = build_diagram(NODE_COUNT)
+    cache = MermaidCodeCache()
+
+    start = time.perf_counter()
+    full_code = cache.generate(shapes, connectors)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for i in range(REPEATS):
+        shape = shapes[(i * 37) % NODE_COUNT]
+        start = time.perf_counter()
+        shape.text = f"Edited {i}"
+        cache.invalidate_node(shape)
+        code = cache.generate(shapes, connectors)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Sanity check: the incremental output must match a from-scratch generation
+    assert code == MermaidCodeCache().generate(shapes, connectors)
+
+    timings.sort()
+    print(f"Nodes: {NODE_COUNT}, edges: {len(connectors)}, code size: {len(full_code) / 1024:.0f} KiB")
+    print(f"Full generation:        {cold_ms:8.3f} ms")
+    print(f"Single-node edit (p50): {timings[len(timings) // 2]:8.3f} ms")
+    print(f"Single-node edit (p95): {timings[int(len(timings) * 0.95)]:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
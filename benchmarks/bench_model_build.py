@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the Qt-free diagram model (flowchart_model).
+
+Builds a large layered diagram with DiagramBuilder, runs the auto-layout,
+exports it to a project dict and to Mermaid code, and parses that code back,
+timing each step. Peak memory of the built model is measured with
+tracemalloc and reported per node. Qt is never imported.
+
+Run from the repository root:
+    python benchmarks/bench_model_build.py [nodes]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flowchart_model import DiagramBuilder, parse_mermaid
+
+NODES = 100_000
+FAN_OUT = 3  # Every node gets an edge from one of the FAN_OUT nodes before it
+TYPES = ("rectangle", "diamond", "start_end", "input_output", "ellipse")
+
+
+def build(n):
+    builder = DiagramBuilder()
+    for i in range(n):
+        builder.node(f"n{i}", f"Step {i}", TYPES[i % len(TYPES)])
+    for i in range(1, n):
+        builder.edge(f"n{i - 1 - i % FAN_OUT if i > FAN_OUT else i - 1}", f"n{i}", "yes" if i % 7 == 0 else "")
+    return builder.build()
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:>16} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NODES
+    print(f"{n} nodes, {n - 1} edges")
+
+    tracemalloc.start()
+    diagram = timed("build", build, n)
+    model_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timed("layout", diagram.apply_layout)
+    timed("to_project", diagram.to_project)
+    code = timed("to_mermaid", diagram.to_mermaid)
+    parsed = timed("parse_mermaid", parse_mermaid, code)
+    assert len(parsed.nodes) == n and len(parsed.edges) == n - 1
+
+    print(f"model memory: {model_bytes / 1e6:.1f} MB, {model_bytes / n:.0f} bytes per node (incl. its edge)")
+    assert "PyQt5" not in sys.modules, "the model must not import Qt"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark for the packed diagram model (flowchart_model).
+
+Adds nodes and then edges to a Diagram and measures each step with
+tracemalloc, reporting bytes per node and per edge, and times a few
+rectangle queries like the ones the designer's canvas runs while
+scrolling through a huge diagram. Qt is not imported for these.
+
+A last row loads a smaller diagram into a (never shown) designer window, on
+Qt's offscreen platform with its autosave and edit journal in a throwaway
+temporary folder, and reports the designer's bytes per node: the shapes,
+connectors and journal on top of the model.
+
+Run from the repository root:
+    python benchmarks/bench_model_memory.py [nodes]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flowchart_model import Diagram, DiagramBuilder, Edge
+
+NODES = 100_000
+DESIGNER_NODES = 20_000
+FAN_OUT = 3
+TYPES = ("rectangle", "diamond", "start_end", "input_output", "ellipse")
+QUERIES = 20
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NODES
+    diagram = Diagram()
+
+    tracemalloc.start()
+    for i in range(n):
+        diagram.add_node(f"n{i}", f"Step {i}", TYPES[i % len(TYPES)])
+    node_bytes, _ = tracemalloc.get_traced_memory()
+    nodes = diagram.nodes
+    for i in range(1, n):
+        diagram.add_edge(Edge(nodes[f"n{(i - 1) // FAN_OUT}"], nodes[f"n{i}"], "yes" if i % 7 == 0 else ""))
+    total_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    edge_bytes = total_bytes - node_bytes
+
+    print(f"{n} nodes: {node_bytes / 1e6:.1f} MB, {node_bytes / n:.0f} bytes per node")
+    print(f"{n - 1} edges: {edge_bytes / 1e6:.1f} MB, {edge_bytes / (n - 1):.0f} bytes per edge")
+
+    diagram.apply_layout()
+    left, top, right, bottom = diagram.bounds()
+    start = time.perf_counter()
+    found = 0
+    for step in range(QUERIES):
+        x = left + (right - left) * step / QUERIES
+        found += len(diagram.node_rows_in(x, top, x + 1600, top + 1000))
+        found += len(diagram.edge_rows_in(x, top, x + 1600, top + 1000))
+    elapsed = (time.perf_counter() - start) * 1000 / QUERIES
+    print(f"viewport query: {elapsed:.1f} ms, {found / QUERIES:.0f} nodes and edges per viewport")
+    assert "PyQt5" not in sys.modules, "the model must not import Qt"
+
+    designer_memory(min(n, DESIGNER_NODES))
+
+
+def designer_memory(n):
+    builder = DiagramBuilder()
+    for i in range(n):
+        builder.node(f"n{i}", f"Step {i}", TYPES[i % len(TYPES)])
+    for i in range(1, n):
+        builder.edge(f"n{(i - 1) // FAN_OUT}", f"n{i}", "yes" if i % 7 == 0 else "")
+    data = builder.build(layout=True).to_project()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    tempfile.tempdir = tempfile.mkdtemp()  # A fresh autosave folder: nothing to recover
+    from PyQt5.QtWidgets import QApplication
+    from plot_flowchart import FlowchartDesigner
+    app = QApplication(sys.argv[:1])
+    designer = FlowchartDesigner()
+    tracemalloc.start()
+    start = time.perf_counter()
+    designer.load_project_records(data["nodes"], data["connections"], layout=False)
+    elapsed = time.perf_counter() - start
+    designer.flush_journal()
+    designer_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    designer.journal.close()
+    app.quit()
+    shutil.rmtree(tempfile.tempdir, ignore_errors=True)
+    print(f"designer, {n} nodes: {designer_bytes / 1e6:.1f} MB, {designer_bytes / n:.0f} bytes per node "
+          f"(loaded in {elapsed:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the binary project format (.fcb) against the JSON project format.
+
+Saves and loads synthetic projects of increasing size both ways and reports
+file size and wall time. "open" is mapping the .fcb file and creating the
+column views; "load" additionally decodes every record, which is what the
+JSON path always has to do.
+
+A last case converts a sparse project (records with only an ID and a label,
+integer IDs, a dangling connection, as hand-written or exported by other
+tools) with "convert" into each Qt-free target format, and checks that every
+output holds the same normalised project.
+
+Run from the repository root:
+    python benchmarks/bench_project_format.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flowchart_model import NODE_FIELDS
+from plot_flowchart import (encode_project_binary, read_project_binary, read_project_json_compressed,
+                            convert_diagram_file)
+
+SIZES = [10000, 100000]
+SPARSE_NODES = 10000
+CONVERT_TARGETS = [".json", ".json.gz", ".fcb", ".mmd", ".html"]
+REPEATS = 3
+TYPES = ["rectangle", "diamond", "start_end", "input_output", "ellipse"]
+COLORS = ["#add8e6", "#90ee90", "#ffcccb", "#ffffe0"]
+
+
+def build_project(n):
+    side = int(n ** 0.5) + 1
+    nodes = [{"id": f"node{i}", "label": f"Step {i}\nCheck input", "type": TYPES[i % len(TYPES)],
+              "x": (i % side) * 150.0, "y": (i // side) * 120.0, "width": 100, "height": 60,
+              "color": COLORS[i % len(COLORS)]} for i in range(n)]
+    connections = [{"start_id": f"node{i}", "end_id": f"node{i + 1}", "label": "yes" if i % 7 == 0 else ""}
+                   for i in range(n - 1)]
+    return {"nodes": nodes, "connections": connections}
+
+
+def best_ms(action):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def save_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, indent=2))
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.loads(f.read())
+
+
+def save_binary(data, path):
+    with open(path, 'wb') as f:
+        f.write(encode_project_binary(data))
+
+
+def build_sparse_project(n):
+    nodes = [{"id": i, "label": f"Step {i}"} if i % 2 else {"id": f"node{i}"} for i in range(n)]
+    node_ids = [node["id"] for node in nodes]
+    connections = [{"start_id": node_ids[i], "end_id": node_ids[i + 1]} for i in range(n - 1)]
+    connections.append({"start_id": node_ids[0], "end_id": "missing"})
+    return {"nodes": nodes, "connections": connections}
+
+
+def convert_sparse(folder):
+    source = os.path.join(folder, "sparse.json")
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump(build_sparse_project(SPARSE_NODES), f)
+    print(f"\nconvert, sparse project of {SPARSE_NODES} nodes")
+    print(f"{'target':>8} {'size (KiB)':>11} {'convert (ms)':>13}")
+    outputs = {}
+    for suffix in CONVERT_TARGETS:
+        target = os.path.join(folder, "sparse-out" + suffix)
+        elapsed = best_ms(lambda: convert_diagram_file(source, target))
+        print(f"{suffix:>8} {os.path.getsize(target) / 1024:>11.0f} {elapsed:>13.1f}")
+        outputs[suffix] = target
+
+    project = load_json(outputs[".json"])
+    assert all(tuple(node) == NODE_FIELDS for node in project["nodes"])
+    assert len(project["connections"]) == SPARSE_NODES - 1
+    assert read_project_json_compressed(outputs[".json.gz"]) == project
+    assert read_project_binary(outputs[".fcb"]).to_dict() == project
+
+
+def main():
+    print(f"{'nodes':>7} {'format':>6} {'size (KiB)':>11} {'save (ms)':>10} {'open (ms)':>10} {'load (ms)':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for n in SIZES:
+            data = build_project(n)
+            json_path = os.path.join(folder, f"project{n}.json")
+            binary_path = os.path.join(folder, f"project{n}.fcb")
+
+            json_save = best_ms(lambda: save_json(data, json_path))
+            json_load = best_ms(lambda: load_json(json_path))
+            binary_save = best_ms(lambda: save_binary(data, binary_path))
+            binary_open = best_ms(lambda: read_project_binary(binary_path))
+            binary_load = best_ms(lambda: read_project_binary(binary_path).to_dict())
+            assert read_project_binary(binary_path).to_dict() == data
+
+            print(f"{n:>7} {'json':>6} {os.path.getsize(json_path) / 1024:>11.0f} {json_save:>10.1f} "
+                  f"{json_load:>10.1f} {json_load:>10.1f}")
+            print(f"{n:>7} {'fcb':>6} {os.path.getsize(binary_path) / 1024:>11.0f} {binary_save:>10.1f} "
+                  f"{binary_open:>10.1f} {binary_load:>10.1f}")
+        convert_sparse(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Latency and throughput benchmark for the local render server ("plot_flowchart.py serve").
+
+Starts the server on a free loopback port with a fresh result cache and
+posts Mermaid diagrams from several client threads in three rounds:
+distinct diagrams (every request renders), the same diagrams again (every
+request is a cache hit), and one diagram posted by all clients at once
+(concurrent identical requests share one render). The server's own
+/metrics are printed at the end.
+
+Run from the repository root:
+    python benchmarks/bench_render_server.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import signal
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_ROOT, "plot_flowchart.py")
+DIAGRAMS = 40
+NODES = 30
+CLIENTS = 8
+
+
+def diagram(index):
+    lines = ["flowchart TD"]
+    for i in range(NODES - 1):
+        lines.append(f"    N{i}[\"Step {i} of request {index}\"] --> N{i + 1}{{\"Check {i + 1}\"}}")
+    return "\n".join(lines).encode("utf-8")
+
+
+def post(url, body):
+    start = time.perf_counter()
+    request = urllib.request.Request(url + "/render?format=svg", data=body, method="POST")
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+        cache = response.headers["X-Render-Cache"]
+    return time.perf_counter() - start, cache
+
+
+def run_round(name, url, bodies):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as clients:
+        results = list(clients.map(lambda body: post(url, body), bodies))
+    wall = time.perf_counter() - start
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    caches = {status: sum(cache == status for _, cache in results) for status in ("miss", "hit", "shared")}
+    print(f"{name:>10} {len(bodies):>5} {len(bodies) / wall:>8.1f} {statistics.median(latencies):>8.1f} "
+          f"{latencies[int(0.95 * (len(latencies) - 1))]:>8.1f}  {caches}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        server = subprocess.Popen([sys.executable, SCRIPT, "serve", "--port", "0", "--cache-dir", cache_dir],
+                                  env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            line = server.stdout.readline()
+            url = re.search(r"http://[\d.]+:\d+", line).group(0)
+            print(line.strip())
+            print(f"{'round':>10} {'reqs':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}  cache")
+            bodies = [diagram(index) for index in range(DIAGRAMS)]
+            run_round("distinct", url, bodies)
+            run_round("cached", url, bodies)
+            run_round("identical", url, [diagram(DIAGRAMS)] * CLIENTS)
+            with urllib.request.urlopen(url + "/metrics", timeout=10) as response:
+                print(json.dumps(json.loads(response.read()), indent=2))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Start-up benchmark: time to first interactive canvas.
+
+Each run starts a fresh Python process on Qt's offscreen platform and measures
+from interpreter start-up until the design canvas has painted and the event
+loop is idle again (i.e. the canvas would react to input). The "eager" mode
+imports networkx, matplotlib's Qt backend and QtWebEngine up front, as the
+application used to, for comparison with the default lazy start-up.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import json
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+HEAVY_MODULES = ["networkx", "matplotlib", "PyQt5.QtWebEngineWidgets"]
+
+CHILD = r"""
+import time
+start = time.perf_counter()
+import sys, json, importlib
+sys.path.insert(0, {repo!r})
+mode, heavy_modules = sys.argv[1], {heavy!r}
+from PyQt5.QtCore import Qt, QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QApplication
+if mode == "eager":
+    for name in heavy_modules + ["matplotlib.backends.backend_qt5agg"]:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+app = QApplication(sys.argv[:1])
+import plot_flowchart
+window = plot_flowchart.FlowchartDesigner()
+result = {{}}
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "painted" not in result:
+            result["painted"] = time.perf_counter() - start
+            QTimer.singleShot(0, idle)
+        return False
+
+def idle():
+    result["interactive"] = time.perf_counter() - start
+    result["loaded"] = [name for name in heavy_modules if name in sys.modules]
+    app.quit()
+
+painted = FirstPaint()
+window.graphics_view.viewport().installEventFilter(painted)
+window.show()
+app.exec_()
+print(json.dumps(result))
+"""
+
+
+def run_once(mode, scratch_dir):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+               # A private temp dir keeps a leftover autosave file from opening the recovery prompt
+               TMPDIR=scratch_dir, TEMP=scratch_dir, TMP=scratch_dir)
+    code = CHILD.format(repo=REPO_ROOT, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code, mode], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'mode':>6} {'first paint (ms)':>17} {'interactive (ms)':>17}  heavy modules loaded")
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        for mode in ("eager", "lazy"):
+            results = [run_once(mode, scratch_dir) for _ in range(RUNS)]
+            painted = statistics.median(result["painted"] for result in results) * 1000
+            interactive = statistics.median(result["interactive"] for result in results) * 1000
+            loaded = ", ".join(results[-1]["loaded"]) or "none"
+            print(f"{mode:>6} {painted:>17.1f} {interactive:>17.1f}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the static preview renderer (StaticPreviewRenderer).
+
+Compares one preview refresh done the old way (fig.clear + draw_networkx_*)
+with one done by updating the reused artists in place. Each refresh moves
+and recolours a single node, then renders the figure with the Agg backend.
+Both draw every label, so the speedup is like for like; the last column is
+the renderer with its default level of detail, which leaves out labels
+while they are too dense to read.
+
+Run from the repository root:
+    python benchmarks/bench_static_preview.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import networkx as nx
+import matplotlib.figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from plot_flowchart import StaticPreviewRenderer
+
+SIZES = [500, 5000]
+REPEATS = 3
+COLORS = ["#add8e6", "#90ee90", "#ffcccb", "#ffffe0"]
+
+
+def build_graph(n):
+    """A random tree with a few extra cross edges, laid out on a grid like a canvas would be."""
+    rng = random.Random(n)
+    G = nx.DiGraph()
+    side = int(n ** 0.5) + 1
+    for i in range(n):
+        G.add_node(f"node{i}", pos=((i % side) * 150.0, -(i // side) * 150.0),
+                   color=COLORS[i % len(COLORS)], label=f"Step {i}")
+    for i in range(1, n):
+        G.add_edge(f"node{rng.randrange(i)}", f"node{i}", label="yes" if i % 9 == 0 else "")
+    for _ in range(n // 10):
+        u, v = rng.sample(range(n), 2)
+        G.add_edge(f"node{u}", f"node{v}", label="")
+    return G
+
+
+def mutate(G, step):
+    node = f"node{(step * 131) % G.number_of_nodes()}"
+    x, y = G.nodes[node]["pos"]
+    G.nodes[node]["pos"] = (x + 10.0, y)
+    G.nodes[node]["color"] = COLORS[step % len(COLORS)]
+
+
+def legacy_refresh(G, figure):
+    pos = dict(G.nodes(data="pos"))
+    edge_labels = {(u, v): label for u, v, label in G.edges(data="label") if label}
+    figure.clear()
+    ax = figure.add_subplot(111)
+    nx.draw_networkx_nodes(G, pos, node_color=[c for _, c in G.nodes(data="color")], node_size=2500, ax=ax,
+                           alpha=0.9, edgecolors='black', linewidths=1)
+    nx.draw_networkx_edges(G, pos, ax=ax, edge_color='gray', arrows=True, arrowsize=20, arrowstyle='-|>',
+                           node_size=2500, min_source_margin=15, min_target_margin=15, width=2)
+    nx.draw_networkx_labels(G, pos, dict(G.nodes(data="label")), font_size=10, ax=ax, font_weight='bold')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='black', font_size=9, ax=ax)
+    ax.set_title("Flowchart Preview (Static)", fontsize=14, fontweight='bold')
+    ax.axis('off')
+    figure.tight_layout()
+    figure.canvas.draw()
+
+
+def renderer_refresh(G, renderer):
+    edge_list = list(G.edges())
+    renderer.update(dict(G.nodes(data="pos")),
+                    [c for _, c in G.nodes(data="color")],
+                    [label for _, label in G.nodes(data="label")],
+                    edge_list,
+                    {(u, v): G.edges[u, v]["label"] for u, v in edge_list})
+    renderer.figure.canvas.draw()
+
+
+def make_renderer(G, all_labels):
+    figure = matplotlib.figure.Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    renderer = StaticPreviewRenderer(figure)
+    if all_labels:
+        renderer.MAX_LABEL_COVERAGE = float("inf")
+    renderer_refresh(G, renderer)  # First render creates the pooled artists
+    return renderer
+
+
+def time_refreshes(G, refresh, target):
+    timings = []
+    for step in range(REPEATS):
+        mutate(G, step)
+        start = time.perf_counter()
+        refresh(G, target)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    print(f"{'nodes':>6} {'edges':>6} {'legacy (ms)':>12} {'renderer (ms)':>14} {'speedup':>8} {'renderer LOD (ms)':>18}")
+    for n in SIZES:
+        G = build_graph(n)
+
+        legacy_figure = matplotlib.figure.Figure(figsize=(8, 6))
+        FigureCanvasAgg(legacy_figure)
+        legacy_ms = time_refreshes(G, legacy_refresh, legacy_figure)
+        renderer_ms = time_refreshes(G, renderer_refresh, make_renderer(G, all_labels=True))
+        lod_ms = time_refreshes(G, renderer_refresh, make_renderer(G, all_labels=False))
+
+        print(f"{n:>6} {G.number_of_edges():>6} {legacy_ms:>12.1f} {renderer_ms:>14.1f} "
+              f"{legacy_ms / renderer_ms:>7.1f}x {lod_ms:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
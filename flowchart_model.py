@@ -0,0 +1,842 @@
+# -*- coding: utf-8 -*-
+"""
+Qt-free diagram model of the Flowchart Designer: nodes, edges, their geometry
+and style, Mermaid parsing/generation and the layered auto-layout.
+
+Nothing here imports Qt, so scripts and tests can build and process large
+diagrams directly; plot_flowchart.FlowchartDesigner shows a Diagram on its
+canvas (every Shape and Connector is a view of a Node or Edge).
+
+A Diagram stores its nodes and edges column-wise in packed arrays (one row per
+node or edge) with labels, types and colours interned in string tables rather
+than a Python object per attribute. The columns take about 60 bytes per node
+and 21 per edge; the rest of a node's cost is its ID and label strings and
+their lookup dicts, so with a distinct label per node it comes to about 316
+bytes (see benchmarks/bench_model_memory.py). Node and Edge objects are small
+handles on a row.
+
+    diagram = (DiagramBuilder()
+               .node("start", "Start", type="start_end")
+               .node("check", "Valid?", type="diamond")
+               .edge("start", "check")
+               .edge("check", "done", "yes")
+               .build(layout=True))
+"""
+import re
+from array import array
+from collections.abc import Mapping
+from copy import copy
+from itertools import accumulate
+
+SHAPE_TYPES = ("rectangle", "diamond", "start_end", "input_output", "ellipse")
+DEFAULT_NODE_COLOR = "#add8e6"  # lightblue
+DEFAULT_NODE_WIDTH = 100
+DEFAULT_NODE_HEIGHT = 60
+
+# Spacing of the layered auto-layout
+LAYOUT_H_SEP = 150
+LAYOUT_V_SEP = 150
+
+NODE_FIELDS = ("id", "label", "type", "x", "y", "width", "height", "color")  # Project record order
+NODE_NUMERIC_FIELDS = ("x", "y", "width", "height")  # Diagram.numeric columns, in this order
+
+# --- Nodes and Edges ---
+
+def node_field(name):
+    """Node attribute: kept on the node until it is added to a diagram, then read from
+    and written to the node's row (see Diagram.get_node_field)."""
+    index = NODE_FIELDS.index(name)
+
+    def get(node):
+        if node.diagram is None:
+            return node.values[index]
+        return node.diagram.get_node_field(node.row, name)
+
+    def set(node, value):
+        if node.diagram is None:
+            node.values[index] = value
+        else:
+            node.diagram.set_node_field(node.row, name, value)
+
+    return property(get, set)
+
+class Node:
+    """A shape of the diagram. The attributes mirror the JSON project record. A new node holds
+    them itself; once added to a Diagram it is a handle on the diagram's row."""
+    __slots__ = ("diagram", "row", "values")
+
+    def __init__(self, id=None, label="Node", type="rectangle", x=0.0, y=0.0,
+                 width=DEFAULT_NODE_WIDTH, height=DEFAULT_NODE_HEIGHT, color=DEFAULT_NODE_COLOR):
+        self.diagram = None
+        self.row = None
+        self.values = [id, label, type, x, y, width, height, color]  # In NODE_FIELDS order; None once added
+
+    id = node_field("id")  # Assigned by Diagram.add when None
+    label = node_field("label")
+    type = node_field("type")
+    x = node_field("x")
+    y = node_field("y")
+    width = node_field("width")
+    height = node_field("height")
+    color = node_field("color")
+
+    def to_record(self):
+        if self.diagram is None:
+            return dict(zip(NODE_FIELDS, self.values))
+        return self.diagram.node_record(self.row)
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record.get("id"), record.get("label", "Node"), record.get("type", "rectangle"),
+                   record.get("x", 100), record.get("y", 100), record.get("width", DEFAULT_NODE_WIDTH),
+                   record.get("height", DEFAULT_NODE_HEIGHT), record.get("color", DEFAULT_NODE_COLOR))
+
+    def __eq__(self, other):
+        if self.diagram is None or not isinstance(other, Node):
+            return self is other
+        return self.diagram is other.diagram and self.row == other.row
+
+    def __hash__(self):
+        return id(self) if self.diagram is None else hash((id(self.diagram), self.row))
+
+    def __repr__(self):
+        return f"Node({self.id!r}, {self.label!r}, {self.type!r})"
+
+class Edge:
+    """A directed connection between two nodes of the same diagram. Like Node, a new edge
+    holds its attributes itself and becomes a handle on a row once added."""
+    __slots__ = ("diagram", "row", "values")
+
+    def __init__(self, source, target, label=""):
+        self.diagram = None
+        self.row = None
+        self.values = (source, target, label)
+
+    @property
+    def source(self):
+        if self.diagram is None:
+            return self.values[0]
+        return self.diagram.node_at(self.diagram.edge_sources[self.row])
+
+    @property
+    def target(self):
+        if self.diagram is None:
+            return self.values[1]
+        return self.diagram.node_at(self.diagram.edge_targets[self.row])
+
+    @property
+    def label(self):
+        if self.diagram is None:
+            return self.values[2]
+        return self.diagram.labels[self.diagram.edge_labels[self.row]]
+
+    @label.setter
+    def label(self, label):
+        if self.diagram is None:
+            self.values = self.values[:2] + (label,)
+        else:
+            self.diagram.edge_labels[self.row] = self.diagram.labels.intern(label)
+
+    def to_record(self):
+        return {"start_id": self.source.id, "end_id": self.target.id, "label": self.label}
+
+    def __eq__(self, other):
+        if self.diagram is None or not isinstance(other, Edge):
+            return self is other
+        return self.diagram is other.diagram and self.row == other.row
+
+    def __hash__(self):
+        return id(self) if self.diagram is None else hash((id(self.diagram), self.row))
+
+    def __repr__(self):
+        return f"Edge({self.source.id!r}, {self.target.id!r}, {self.label!r})"
+
+# --- Diagram ---
+
+class StringTable:
+    """Interned strings: every distinct string is stored once and referred to by its index."""
+    __slots__ = ("strings", "indices")
+
+    def __init__(self):
+        self.strings = []
+        self.indices = {}
+
+    def intern(self, string):
+        index = self.indices.get(string)
+        if index is None:
+            index = self.indices[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def __len__(self):
+        return len(self.strings)
+
+    def copy(self):
+        table = StringTable()
+        table.strings, table.indices = self.strings.copy(), self.indices.copy()
+        return table
+
+class NodeMapping(Mapping):
+    """diagram.nodes: node ID -> Node handle, in insertion order."""
+    __slots__ = ("diagram",)
+
+    def __init__(self, diagram):
+        self.diagram = diagram
+
+    def __getitem__(self, node_id):
+        if not self.diagram.has_node(node_id):
+            raise KeyError(node_id)
+        return self.diagram.node_at(self.diagram.node_rows[node_id])
+
+    def __contains__(self, node_id):
+        return self.diagram.has_node(node_id)
+
+    def __iter__(self):
+        diagram = self.diagram
+        return (node_id for node_id, alive in zip(diagram.node_ids, diagram.node_alive) if alive)
+
+    def __len__(self):
+        return self.diagram.node_count
+
+class EdgeList:
+    """diagram.edges: the Edge handles in insertion order."""
+    __slots__ = ("diagram",)
+
+    def __init__(self, diagram):
+        self.diagram = diagram
+
+    def __iter__(self):
+        diagram = self.diagram
+        return (diagram.edge_at(row) for row, alive in enumerate(diagram.edge_alive) if alive)
+
+    def __len__(self):
+        return self.diagram.edge_count
+
+class Diagram:
+    """Nodes (by ID, in insertion order) and edges (in insertion order, parallel edges allowed),
+    stored column-wise: row r of node_ids, numeric, int_mask, node_labels, node_types and
+    node_colors describes one node, row r of edge_sources, edge_targets and edge_labels one edge
+    (endpoints are node rows). The edges of each node are chained through the rows as linked
+    lists: node_out[r]/node_in[r] is the row of one outgoing/incoming edge of node r (-1 for
+    none) and edge_next_out/edge_next_in the next edge of the same node. Removed rows stay
+    behind as tombstones (node_alive/edge_alive is 0), so rows, and the handles on them, never
+    move; start a new Diagram to reclaim them."""
+    __slots__ = ("node_ids", "node_rows", "node_alive", "numeric", "int_mask", "node_labels", "node_types",
+                 "node_colors", "node_out", "node_in", "edge_sources", "edge_targets", "edge_labels", "edge_alive",
+                 "edge_next_out", "edge_next_in", "labels", "types",
+                 "colors", "node_count", "edge_count", "reserved_ids", "next_id")
+
+    ID_PATTERN = re.compile(r'^\w+$')
+
+    def __init__(self):
+        self.node_ids = []
+        self.node_rows = {}  # Node ID -> row, also for removed nodes (their IDs are never reused)
+        self.node_alive = bytearray()
+        self.numeric = tuple(array('d') for _ in NODE_NUMERIC_FIELDS)
+        self.int_mask = array('B')  # Bit i set: NODE_NUMERIC_FIELDS[i] was given as an int
+        self.node_labels = array('I')
+        self.node_types = array('H')
+        self.node_colors = array('I')
+        self.node_out = array('i')
+        self.node_in = array('i')
+        self.edge_sources = array('I')
+        self.edge_targets = array('I')
+        self.edge_labels = array('I')
+        self.edge_alive = bytearray()
+        self.edge_next_out = array('i')
+        self.edge_next_in = array('i')
+        self.labels = StringTable()  # Node and edge labels
+        self.types = StringTable()
+        self.colors = StringTable()
+        self.node_count = 0
+        self.edge_count = 0
+        self.reserved_ids = set()  # Claimed (see claim_id) but not added yet
+        self.next_id = 0
+
+    def __len__(self):
+        return self.node_count
+
+    def copy(self):
+        """Independent copy of the columns (tombstones included): a snapshot that can be read,
+        e.g. saved, on another thread while this diagram keeps changing."""
+        diagram = Diagram.__new__(Diagram)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name == "numeric":
+                value = tuple(copy(column) for column in value)
+            elif isinstance(value, StringTable):
+                value = value.copy()
+            else:
+                value = copy(value)  # Arrays, lists, dicts and sets; the counts are immutable
+            setattr(diagram, name, value)
+        return diagram
+
+    @property
+    def nodes(self):
+        return NodeMapping(self)
+
+    @property
+    def edges(self):
+        return EdgeList(self)
+
+    def claim_id(self, requested=None):
+        """Reserves a short ID (e.g. nodeN) for a new node. A requested ID (from a loaded
+        project or Mermaid file) is kept when it is valid and unused, so IDs stay stable
+        across save/load; otherwise the next free nodeN is assigned. IDs of removed nodes
+        are never reused within a diagram."""
+        if requested is not None:
+            requested = str(requested)
+        if requested is not None and self.ID_PATTERN.match(requested) and not self.id_in_use(requested):
+            self.reserved_ids.add(requested)
+            return requested
+
+        while self.id_in_use(f"node{self.next_id}"):
+            self.next_id += 1
+        node_id = f"node{self.next_id}"
+        self.reserved_ids.add(node_id)
+        self.next_id += 1
+        return node_id
+
+    def id_in_use(self, node_id):
+        return node_id in self.node_rows or node_id in self.reserved_ids
+
+    def has_node(self, node_id):
+        row = self.node_rows.get(node_id)
+        return row is not None and self.node_alive[row] == 1
+
+    # --- Rows ---
+
+    def append_node(self, node_id, label, type, x, y, width, height, color):
+        """Adds a row for a node whose ID is already claimed and returns the row."""
+        row = len(self.node_ids)
+        self.reserved_ids.discard(node_id)
+        self.node_ids.append(node_id)
+        self.node_rows[node_id] = row
+        self.node_alive.append(1)
+        xs, ys, widths, heights = self.numeric
+        xs.append(x)
+        ys.append(y)
+        widths.append(width)
+        heights.append(height)
+        self.int_mask.append(isinstance(x, int) | isinstance(y, int) << 1 | isinstance(width, int) << 2
+                             | isinstance(height, int) << 3)
+        self.node_labels.append(self.labels.intern(label))
+        self.node_types.append(self.types.intern(type))
+        self.node_colors.append(self.colors.intern(color))
+        self.node_out.append(-1)
+        self.node_in.append(-1)
+        self.node_count += 1
+        return row
+
+    def append_edge(self, source_row, target_row, label):
+        row = len(self.edge_sources)
+        self.edge_sources.append(source_row)
+        self.edge_targets.append(target_row)
+        self.edge_labels.append(self.labels.intern(label))
+        self.edge_alive.append(1)
+        self.edge_next_out.append(self.node_out[source_row])
+        self.node_out[source_row] = row
+        self.edge_next_in.append(self.node_in[target_row])
+        self.node_in[target_row] = row
+        self.edge_count += 1
+        return row
+
+    def node_at(self, row):
+        node = Node.__new__(Node)
+        node.diagram, node.row, node.values = self, row, None
+        return node
+
+    def edge_at(self, row):
+        edge = Edge.__new__(Edge)
+        edge.diagram, edge.row, edge.values = self, row, None
+        return edge
+
+    def get_node_field(self, row, name):
+        if name == "id":
+            return self.node_ids[row]
+        if name == "label":
+            return self.labels[self.node_labels[row]]
+        if name == "type":
+            return self.types[self.node_types[row]]
+        if name == "color":
+            return self.colors[self.node_colors[row]]
+        i = NODE_NUMERIC_FIELDS.index(name)
+        value = self.numeric[i][row]
+        return int(value) if self.int_mask[row] >> i & 1 else value
+
+    def set_node_field(self, row, name, value):
+        if name == "id":
+            raise AttributeError("The ID of a node in a diagram cannot change.")
+        if name == "label":
+            self.node_labels[row] = self.labels.intern(value)
+        elif name == "type":
+            self.node_types[row] = self.types.intern(value)
+        elif name == "color":
+            self.node_colors[row] = self.colors.intern(value)
+        else:
+            i = NODE_NUMERIC_FIELDS.index(name)
+            self.numeric[i][row] = value
+            self.int_mask[row] = self.int_mask[row] & ~(1 << i) | isinstance(value, int) << i
+
+    def node_record(self, row):
+        mask = self.int_mask[row]
+        xs, ys, widths, heights = self.numeric
+        return {"id": self.node_ids[row], "label": self.labels[self.node_labels[row]],
+                "type": self.types[self.node_types[row]],
+                "x": int(xs[row]) if mask & 1 else xs[row], "y": int(ys[row]) if mask & 2 else ys[row],
+                "width": int(widths[row]) if mask & 4 else widths[row],
+                "height": int(heights[row]) if mask & 8 else heights[row],
+                "color": self.colors[self.node_colors[row]]}
+
+    def live_node_rows(self):
+        return [row for row, alive in enumerate(self.node_alive) if alive]
+
+    def live_edge_rows(self):
+        return [row for row, alive in enumerate(self.edge_alive) if alive]
+
+    def chained_rows(self, heads, links, node_row):
+        """Edge rows of one node's outgoing (node_out, edge_next_out) or incoming (node_in,
+        edge_next_in) chain, in insertion order."""
+        rows = []
+        row = heads[node_row]
+        while row >= 0:
+            rows.append(row)
+            row = links[row]
+        rows.reverse()  # New edges are put at the head of the chain
+        return rows
+
+    def out_edge_rows(self, node_row):
+        return self.chained_rows(self.node_out, self.edge_next_out, node_row)
+
+    def in_edge_rows(self, node_row):
+        return self.chained_rows(self.node_in, self.edge_next_in, node_row)
+
+    def edge_rows_of(self, node):
+        """Rows of the edges attached to a node of this diagram, in insertion order."""
+        return sorted(set(self.out_edge_rows(node.row)) | set(self.in_edge_rows(node.row)))
+
+    # --- Editing ---
+
+    def add(self, node):
+        """Adds a new node, giving it its final ID (see claim_id); the node becomes a handle
+        on its row."""
+        if node.diagram is not None:
+            raise ValueError(f"{node!r} already belongs to a diagram")
+        values = node.values
+        row = self.append_node(self.claim_id(values[0]), *values[1:])
+        node.diagram, node.row, node.values = self, row, None
+        return node
+
+    def add_node(self, id=None, label="Node", type="rectangle", x=0.0, y=0.0,
+                 width=DEFAULT_NODE_WIDTH, height=DEFAULT_NODE_HEIGHT, color=DEFAULT_NODE_COLOR):
+        return self.node_at(self.append_node(self.claim_id(id), label, type, x, y, width, height, color))
+
+    def add_edge(self, edge):
+        """Adds a new edge between two nodes of this diagram; the edge becomes a handle on its row."""
+        source, target, label = edge.values if edge.diagram is None else (None, None, None)
+        if source is None or not all(node.diagram is self and self.node_alive[node.row] for node in (source, target)):
+            raise ValueError(f"{edge!r} connects nodes outside the diagram")
+        row = self.append_edge(source.row, target.row, label)
+        edge.diagram, edge.row, edge.values = self, row, None
+        return edge
+
+    def connect(self, source_id, target_id, label=""):
+        for node_id in (source_id, target_id):
+            if not self.has_node(node_id):
+                raise KeyError(node_id)
+        return self.edge_at(self.append_edge(self.node_rows[source_id], self.node_rows[target_id], label))
+
+    def remove_edge(self, edge):
+        if edge.diagram is not self or not self.edge_alive[edge.row]:
+            raise ValueError(f"{edge!r} is not in the diagram")
+        self.drop_edge_row(edge.row)
+
+    def drop_edge_row(self, row):
+        self.edge_alive[row] = 0
+        self.edge_count -= 1
+        for heads, links, node_row in ((self.node_out, self.edge_next_out, self.edge_sources[row]),
+                                       (self.node_in, self.edge_next_in, self.edge_targets[row])):
+            if heads[node_row] == row:
+                heads[node_row] = links[row]
+                continue
+            previous = heads[node_row]
+            while links[previous] != row:
+                previous = links[previous]
+            links[previous] = links[row]
+
+    def remove_node(self, node):
+        """Removes the node and every edge attached to it."""
+        if node.diagram is not self or not self.node_alive[node.row]:
+            raise ValueError(f"{node!r} is not in the diagram")
+        for edge_row in self.edge_rows_of(node):
+            self.drop_edge_row(edge_row)
+        self.node_alive[node.row] = 0
+        self.node_count -= 1
+
+    def successors(self, node_id):
+        """IDs of the targets of the node's edges."""
+        row = self.node_rows[node_id]
+        return [self.node_ids[self.edge_targets[edge_row]] for edge_row in self.out_edge_rows(row)]
+
+    def predecessors(self, node_id):
+        """IDs of the sources of the node's incoming edges."""
+        row = self.node_rows[node_id]
+        return [self.node_ids[self.edge_sources[edge_row]] for edge_row in self.in_edge_rows(row)]
+
+    # --- Records ---
+
+    def node_records(self):
+        """The JSON project records of the nodes, made one at a time."""
+        return (self.node_record(row) for row, alive in enumerate(self.node_alive) if alive)
+
+    def edge_records(self):
+        """The JSON project records of the edges (connections), made one at a time."""
+        node_ids, labels = self.node_ids, self.labels
+        return ({"start_id": node_ids[self.edge_sources[row]], "end_id": node_ids[self.edge_targets[row]],
+                 "label": labels[self.edge_labels[row]]} for row, alive in enumerate(self.edge_alive) if alive)
+
+    def to_project(self):
+        """Plain-dict project (the JSON project layout)."""
+        return {"nodes": list(self.node_records()), "connections": list(self.edge_records())}
+
+    @classmethod
+    def from_project(cls, data):
+        """Diagram of a project dict; connections to unknown node IDs are dropped."""
+        diagram = cls()
+        rows = {}
+        for record in data.get("nodes", []):
+            node = Node.from_record(record)
+            rows[record.get("id")] = diagram.append_node(diagram.claim_id(node.values[0]), *node.values[1:])
+        for record in data.get("connections", []):
+            source, target = rows.get(record.get("start_id")), rows.get(record.get("end_id"))
+            if source is not None and target is not None:
+                diagram.append_edge(source, target, record.get("label", ""))
+        return diagram
+
+    def to_mermaid(self):
+        if not self.node_count:
+            return MERMAID_EMPTY_CODE
+        node_ids, labels, types = self.node_ids, self.labels, self.types
+        lines = [MERMAID_HEADER]
+        lines.extend(mermaid_node_line(node_ids[row], types[self.node_types[row]], labels[self.node_labels[row]])
+                     for row in self.live_node_rows())
+        lines.extend(mermaid_edge_line(node_ids[self.edge_sources[row]], node_ids[self.edge_targets[row]],
+                                       labels[self.edge_labels[row]]) for row in self.live_edge_rows())
+        return "\n".join(lines)
+
+    # --- Geometry ---
+    # The rectangle queries run over NumPy views of the columns (numpy is imported on first
+    # use); the views are dropped before returning, so the arrays can grow again
+
+    def column_views(self):
+        """xs, ys, widths, heights and node_alive as NumPy arrays sharing the columns' memory."""
+        import numpy as np
+        return tuple(np.frombuffer(column, dtype=column.typecode) for column in self.numeric) + \
+            (np.frombuffer(self.node_alive, dtype=np.uint8).astype(bool),)
+
+    def bounds(self):
+        """(left, top, right, bottom) around all nodes, or None when there are none."""
+        if not self.node_count:
+            return None
+        xs, ys, widths, heights, alive = self.column_views()
+        xs, ys, widths, heights = (column[alive] for column in (xs, ys, widths, heights))
+        return (float(xs.min()), float(ys.min()), float((xs + widths).max()), float((ys + heights).max()))
+
+    def node_rows_in(self, left, top, right, bottom):
+        """Rows of the nodes whose box overlaps the rectangle."""
+        if not self.node_count:
+            return []
+        import numpy as np
+        xs, ys, widths, heights, alive = self.column_views()
+        inside = alive & (xs < right) & (ys < bottom) & (xs + widths > left) & (ys + heights > top)
+        return np.flatnonzero(inside).tolist()
+
+    def edge_rows_in(self, left, top, right, bottom):
+        """Rows of the edges whose line (from centre to centre of their nodes) crosses the
+        rectangle."""
+        if not self.edge_count:
+            return []
+        import numpy as np
+        xs, ys, widths, heights, _ = self.column_views()
+        center_x, center_y = xs + widths / 2, ys + heights / 2
+        sources = np.frombuffer(self.edge_sources, dtype=self.edge_sources.typecode)
+        targets = np.frombuffer(self.edge_targets, dtype=self.edge_targets.typecode)
+        x1, x2, y1, y2 = center_x[sources], center_x[targets], center_y[sources], center_y[targets]
+        # Bounding boxes overlap, and the rectangle's corners are not all on one side of the line
+        inside = (np.frombuffer(self.edge_alive, dtype=np.uint8) == 1) & (np.minimum(x1, x2) <= right) & \
+            (np.maximum(x1, x2) >= left) & (np.minimum(y1, y2) <= bottom) & (np.maximum(y1, y2) >= top)
+        dx, dy = x2 - x1, y2 - y1
+        sides = [dx * (corner_y - y1) - dy * (corner_x - x1)
+                 for corner_x, corner_y in ((left, top), (right, top), (left, bottom), (right, bottom))]
+        inside &= ~(np.logical_and.reduce([side > 0 for side in sides]) |
+                    np.logical_and.reduce([side < 0 for side in sides]))
+        return np.flatnonzero(inside).tolist()
+
+    # --- Layout ---
+
+    def layer_rows(self):
+        """Layer of every node row (-1 for removed rows): sources are layer 0, any other node
+        sits one layer below its lowest predecessor. Nodes on or behind a cycle get one extra
+        layer each, after the others. Linear in nodes + edges."""
+        count = len(self.node_ids)
+        pending = [0] * count
+        out_degree = [0] * (count + 1)
+        edges = [(source, target) for source, target, alive in
+                 zip(self.edge_sources, self.edge_targets, self.edge_alive) if alive]
+        for source, target in edges:
+            out_degree[source + 1] += 1
+            pending[target] += 1
+        # Targets grouped by source (CSR): targets of row r are targets[offsets[r]:offsets[r + 1]]
+        offsets = list(accumulate(out_degree))
+        cursor = offsets[:-1]
+        targets = [0] * len(edges)
+        for source, target in edges:
+            targets[cursor[source]] = target
+            cursor[source] += 1
+
+        layers = [-1] * count
+        depth = [0] * count
+        frontier = [row for row in range(count) if self.node_alive[row] and not pending[row]]
+        while frontier:
+            next_frontier = []
+            for row in frontier:
+                layers[row] = depth[row]
+                below = depth[row] + 1
+                for target in targets[offsets[row]:offsets[row + 1]]:
+                    if depth[target] < below:
+                        depth[target] = below
+                    pending[target] -= 1
+                    if not pending[target]:
+                        next_frontier.append(target)
+            frontier = next_frontier
+
+        current_layer = max(layers, default=-1) + 1
+        for row in range(count):
+            if self.node_alive[row] and layers[row] < 0:
+                layers[row] = current_layer
+                current_layer += 1
+        return layers
+
+    def layer_indices(self):
+        """Node ID -> layer (see layer_rows)."""
+        return {self.node_ids[row]: layer for row, layer in enumerate(self.layer_rows()) if layer >= 0}
+
+    def layered_rows(self, h_sep=LAYOUT_H_SEP, v_sep=LAYOUT_V_SEP):
+        """(row, x, y) of every node for the layered auto-layout (layers top to bottom, each
+        centred horizontally, nodes ordered by ID), plus the (width, height) of the whole
+        layout, whose top-left corner is (0, 0)."""
+        by_layer = {}
+        for row, layer in enumerate(self.layer_rows()):
+            if layer >= 0:
+                by_layer.setdefault(layer, []).append(row)
+        if not by_layer:
+            return [], (0, 0)
+
+        def layer_width(count):
+            return (count - 1) * h_sep + DEFAULT_NODE_WIDTH if count else 0
+
+        total_width = max(layer_width(len(rows)) for rows in by_layer.values())
+        total_height = max(by_layer) * v_sep + DEFAULT_NODE_HEIGHT
+        placed = []
+        for layer, rows in by_layer.items():
+            rows.sort(key=self.node_ids.__getitem__)
+            start_x = (total_width - layer_width(len(rows))) / 2
+            placed.extend((row, start_x + i * h_sep, layer * v_sep) for i, row in enumerate(rows))
+        return placed, (total_width, total_height)
+
+    def layered_positions(self, h_sep=LAYOUT_H_SEP, v_sep=LAYOUT_V_SEP):
+        """Node ID -> top-left (x, y) of layered_rows, plus the layout size."""
+        placed, size = self.layered_rows(h_sep, v_sep)
+        return {self.node_ids[row]: (x, y) for row, x, y in placed}, size
+
+    def apply_layout(self, offset_x=0.0, offset_y=0.0):
+        """Moves every node to its layered_rows place (shifted by the offset)."""
+        placed, _ = self.layered_rows()
+        xs, ys = self.numeric[0], self.numeric[1]
+        for row, x, y in placed:
+            xs[row], ys[row] = x + offset_x, y + offset_y
+            self.int_mask[row] &= ~0b11
+
+class DiagramBuilder:
+    """Fluent construction of a Diagram; every method but build returns the builder.
+    Edges may name nodes that do not exist yet; those are created with their ID as label."""
+    __slots__ = ("diagram",)
+
+    def __init__(self):
+        self.diagram = Diagram()
+
+    def node(self, id=None, label=None, type="rectangle", **geometry_and_style):
+        if id is not None and self.diagram.has_node(id):
+            # Defining a node that an edge already created fills in its details
+            existing = self.diagram.nodes[id]
+            existing.label = label if label is not None else existing.label
+            existing.type = type
+            for name, value in geometry_and_style.items():
+                setattr(existing, name, value)
+        else:
+            self.diagram.add_node(id, label if label is not None else str(id or "Node"), type, **geometry_and_style)
+        return self
+
+    def edge(self, source, target, label=""):
+        for node_id in (source, target):
+            if not self.diagram.has_node(node_id):
+                self.node(node_id)
+        self.diagram.connect(source, target, label)
+        return self
+
+    def chain(self, *node_ids, label=""):
+        """Connects the nodes one after another: chain("a", "b", "c") adds a -> b -> c."""
+        for source, target in zip(node_ids, node_ids[1:]):
+            self.edge(source, target, label)
+        return self
+
+    def build(self, layout=False):
+        if layout:
+            self.diagram.apply_layout()
+        return self.diagram
+
+# --- Mermaid Code Generation ---
+
+MERMAID_HEADER = "flowchart TD"
+MERMAID_EMPTY_CODE = "flowchart TD\n    %% No shapes on canvas"
+
+def clean_text_for_mermaid_io(text):
+    """Strips quotes and excessive whitespace for Input/Output generation."""
+    t = text.strip()
+    if t.startswith('"') and t.endswith('"'):
+        t = t[1:-1].strip()
+    return t.replace('\n', '\\n')
+
+SHAPE_TO_MERMAID_MAP = {
+    "rectangle": lambda t: f"[\"{clean_text_for_mermaid_io(t)}\"]", # Explicitly quote for safety
+    "diamond": lambda t: f"{{\"{clean_text_for_mermaid_io(t)}\"}}",
+    "ellipse": lambda t: f"((\"{clean_text_for_mermaid_io(t)}\"))",
+    "start_end": lambda t: f"(\"{clean_text_for_mermaid_io(t)}\")",
+    # FIX: Use the cleaned text helper for Input/Output generation
+    "input_output": lambda t: f"[/\"{clean_text_for_mermaid_io(t)}\"/]",
+}
+
+def mermaid_node_line(node_id, shape_type, text):
+    syntax_func = SHAPE_TO_MERMAID_MAP.get(shape_type, SHAPE_TO_MERMAID_MAP["rectangle"])
+    return f"    {node_id}{syntax_func(text)}"
+
+def mermaid_edge_line(id1, id2, label):
+    # The standard labeled connector format is -->|label|
+    label_part = f"|{label}|" if label else ""
+    return f"    {id1} -->{label_part} {id2}"
+
+# --- Mermaid Parsing ---
+
+class MermaidSyntaxError(ValueError):
+    """The text is not a Mermaid flowchart this parser understands."""
+
+# Regex to capture: ID, shape definition part
+NODE_DEFINITION_PATTERN = re.compile(r'^\s*(\w+)\s*(?:\s*(.+?))?\s*$')
+
+# Regex to capture connection parts
+CONN_PATTERN = re.compile(r'^\s*(\w+)(?:.*?)\s*[-=]+>\s*(?:\|(.*?)\|)?\s*(\w+)\s*(?:.*?)\s*$')
+
+# Inline definition at the start or end of a connection, e.g. A[Start] or B{Ok?}
+INLINE_DEFINITION_PATTERN = re.compile(r'^(\w+)([()\[{}\[\]/]+.+?[)\]{}\/]+)')
+
+def parse_definition(mermaid_id, full_def):
+    """(text, shape type) of a node definition such as ["Text"], {Text} or ((Text))."""
+    text = mermaid_id
+    shape_type = 'rectangle' # Default
+
+    # Helper function to strip quotes from a string if present
+    def strip_quotes(s):
+        s = s.strip()
+        if s.startswith('"') and s.endswith('"'):
+            return s[1:-1].strip()
+        return s.strip()
+
+    if full_def.startswith('((') and full_def.endswith('))'):
+        shape_type = 'ellipse'
+        text = strip_quotes(full_def[2:-2])
+    elif full_def.startswith('(') and full_def.endswith(')'):
+        shape_type = 'start_end'
+        text = strip_quotes(full_def[1:-1])
+    elif full_def.startswith('{') and full_def.endswith('}'):
+        shape_type = 'diamond'
+        text = strip_quotes(full_def[1:-1])
+    elif full_def.startswith('[') and full_def.endswith(']'):
+        if full_def.startswith('[/') and full_def.endswith('/]'):
+            shape_type = 'input_output'
+            # FIX: Use the new robust quote stripping logic here
+            text = strip_quotes(full_def[2:-2])
+        else:
+            shape_type = 'rectangle'
+            text = strip_quotes(full_def[1:-1])
+    elif full_def.startswith('["') and full_def.endswith('"]'):
+        shape_type = 'rectangle'
+        text = full_def[2:-2].strip() # Text is already quoted, strip the outer ["]
+
+    # If after parsing the text is empty, fall back to the ID
+    return text if text else mermaid_id, shape_type
+
+def parse_mermaid(mermaid_code):
+    """Diagram of a Mermaid flowchart. Nodes keep their Mermaid IDs and get the default size
+    and no position (see Diagram.apply_layout); only nodes with a definition are created, and
+    connections between them."""
+    lines = [line.strip() for line in mermaid_code.split('\n') if line.strip() and not line.strip().startswith('%')]
+
+    if not lines or not re.match(r'^flowchart\s+(TD|LR)', lines[0], re.I):
+        raise MermaidSyntaxError("Mermaid file must start with 'flowchart TD' or 'flowchart LR'.")
+
+    node_defs = {}
+    connections = []
+
+    def define(mermaid_id, full_def):
+        text, shape_type = parse_definition(mermaid_id, full_def)
+        node_defs[mermaid_id] = {'text': text.replace('\\n', '\n'), 'type': shape_type}
+
+    # Pass 1: Collect ALL node definitions and connections
+    for line in lines[1:]:
+        conn_match = CONN_PATTERN.match(line)
+
+        if conn_match:
+            start_id = conn_match.group(1).strip()
+            label = conn_match.group(2).strip() if conn_match.group(2) else ""
+            end_id = conn_match.group(3).strip()
+            connections.append((start_id, end_id, label))
+
+            # FIX: Only extract inline definitions from the START and END of connections
+            # Don't try to extract from the middle (labels) or from within text content
+
+            # Extract start node definition if present
+            start_inline_match = INLINE_DEFINITION_PATTERN.match(line.split('-->')[0].strip())
+            if start_inline_match:
+                mermaid_id = start_inline_match.group(1).strip()
+                if mermaid_id not in node_defs:
+                    define(mermaid_id, start_inline_match.group(2).strip())
+
+            # Extract end node definition if present
+            # Split by --> and get the last part (after optional label)
+            arrow_parts = line.split('-->')
+            if len(arrow_parts) > 1:
+                # Remove label if present (anything between | |)
+                end_part = re.sub(r'\|.*?\|', '', arrow_parts[-1].strip()).strip()
+                end_inline_match = INLINE_DEFINITION_PATTERN.match(end_part)
+                if end_inline_match:
+                    mermaid_id = end_inline_match.group(1).strip()
+                    if mermaid_id not in node_defs:
+                        define(mermaid_id, end_inline_match.group(2).strip())
+        else:
+            # Check for explicit node definitions on the line (NOT in connections)
+            def_match = NODE_DEFINITION_PATTERN.match(line)
+            if def_match:
+                mermaid_id = def_match.group(1).strip()
+                define(mermaid_id, def_match.group(2) if def_match.group(2) else f"[{mermaid_id}]")
+
+    # Pass 2: Nodes for all defined IDs, then the connections between them
+    diagram = Diagram()
+    for mermaid_id, def_data in node_defs.items():
+        diagram.add_node(mermaid_id, def_data['text'], def_data['type'])
+    for start_id, end_id, label in connections:
+        if diagram.has_node(start_id) and diagram.has_node(end_id):
+            diagram.connect(start_id, end_id, label)
+    return diagram
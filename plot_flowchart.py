@@ -5,13 +5,28 @@ Created on Mon Nov 10 16:03:58 2025
 @author: pramod yadav
 """
 import sys
+import io
+import argparse
 import json
 import tempfile
 import os
 from pathlib import Path
-import re
 import math
 import uuid 
+import hashlib
+import time
+import struct
+import mmap
+import threading
+import signal
+import multiprocessing
+import gzip
+import lzma
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # PyQt5 imports
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -20,18 +35,41 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QColorDialog, QStatusBar, QSplitter, QGraphicsView, 
                              QGraphicsScene, QInputDialog, QCheckBox, QComboBox, QGridLayout,
                              QGraphicsTextItem, QGraphicsItem, QGraphicsRectItem, QGraphicsPathItem, 
-                             QGraphicsEllipseItem, QGraphicsLineItem, QPlainTextEdit, QFormLayout) # Added QPlainTextEdit, QFormLayout
-from PyQt5.QtCore import Qt, QUrl, QRectF, QPointF, QTimer
+                             QGraphicsEllipseItem, QGraphicsLineItem, QPlainTextEdit, QFormLayout, QSpinBox, QProgressBar) # Added QPlainTextEdit, QFormLayout
+from PyQt5.QtCore import (Qt, QUrl, QRectF, QPointF, QTimer, QEvent, QObject, pyqtSignal, QLockFile, QEventLoop,
+                          QFileSystemWatcher, QBuffer, QIODevice)
 from PyQt5.QtGui import QPen, QColor, QBrush, QPainterPath, QPainter, QKeySequence, QFont, QPixmap, QImage
 from PyQt5.QtWidgets import QShortcut
-from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtSvg import QSvgGenerator # Necessary for canvas SVG export
 
 # Other required libraries
-import networkx as nx
-import matplotlib.figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+# QtWebEngine, matplotlib, networkx and pyvis are imported where they are first used so the
+# canvas comes up without paying for them (see FlowchartDesigner.ensure_preview_widget)
+import numpy as np
+
+# Qt-free diagram model; the canvas below is a view over a flowchart_model.Diagram
+from flowchart_model import (Node, Edge, Diagram, MermaidSyntaxError, parse_mermaid, MERMAID_HEADER,
+                             MERMAID_EMPTY_CODE, mermaid_node_line, mermaid_edge_line)
+
+# Local copy of the Mermaid runtime, used when present: it is not shipped and has to be fetched
+# first (see vendor/mermaid/README.md). Without it the preview loads the runtime from the CDN.
+MERMAID_RUNTIME_DIR = Path(__file__).resolve().parent / "vendor" / "mermaid"
+MERMAID_RUNTIME_FILE = "mermaid.min.js"
+MERMAID_CDN_URL = "https://cdn.jsdelivr.net/npm/mermaid@9.1.7/dist/mermaid.min.js"
+
+# vis-network (the library PyVis wraps) is loaded from the copy shipped inside the pyvis package
+VIS_NETWORK_VERSION = "9.1.2"
+VIS_NETWORK_CDN_URL = f"https://cdnjs.cloudflare.com/ajax/libs/vis-network/{VIS_NETWORK_VERSION}/dist/"
+PYVIS_SHAPE_MAP = {'rectangle': 'box', 'diamond': 'diamond', 'ellipse': 'ellipse', 'start_end': 'box', 'input_output': 'box'}
+
+def vis_network_lib_dir():
+    """Folder holding vis-network.min.js/.css inside the installed pyvis package, or None."""
+    try:
+        import pyvis
+    except ImportError:
+        return None
+    lib_dir = Path(pyvis.__file__).resolve().parent / "templates" / "lib" / f"vis-{VIS_NETWORK_VERSION}"
+    return lib_dir if (lib_dir / "vis-network.min.js").exists() else None
 
 # --- Custom Graphics Items ---
 
@@ -48,6 +86,7 @@ class EditableTextItem(QGraphicsTextItem):
         new_text = self.toPlainText()
         if new_text != self.parent_shape.text:
             self.parent_shape.text = new_text
+            self.parent_shape.scene.parent_widget.mark_shape_dirty(self.parent_shape)
             
             # Trigger auto-resize when text is changed directly on canvas
             self.parent_shape.auto_resize_to_fit_text(padding=30)
@@ -84,40 +123,85 @@ class CustomGraphicsItem(QGraphicsItem):
             self.shape_obj.x = value.x()
             self.shape_obj.y = value.y()
             self.shape_obj.update_text_position() 
-            self.scene().parent_widget.update_all_connectors()
+            if not self.scene().parent_widget.placing_shapes:  # place_shapes updates them once at the end
+                self.scene().parent_widget.update_all_connectors()
             return value
         
         elif change == QGraphicsItem.ItemPositionHasChanged and self.shape_obj:
+            if self.scene().parent_widget.placing_shapes:
+                return super().itemChange(change, value)
+            self.scene().parent_widget.mark_shape_changed(self.shape_obj, moved=True)
             self.scene().parent_widget.autosave_activity()
             self.scene().parent_widget.refresh_preview()
             
         return super().itemChange(change, value)
 
+def node_attribute(name):
+    """Shape attribute read from and written to its model node."""
+    return property(lambda self: getattr(self.node, name), lambda self, value: setattr(self.node, name, value))
+
 class Shape:
-    def __init__(self, scene, shape_type, x, y, width=100, height=60, text="Shape", shape_id=None, color=None):
+    """Canvas view of a model Node (see flowchart_model): geometry, text, type and colour
+    live on the node, the Qt items are built from it by draw() and dropped by release().
+    The designer only keeps the shapes near the visible region drawn (see add_shape)."""
+    __slots__ = ("scene", "node", "_id", "selected", "graphics_item", "text_item")
+    border_color = QColor("black")
+    text_measure_item = None  # Shared by auto_resize_to_fit_text for shapes that are not drawn
+
+    def __init__(self, scene, shape_type="rectangle", x=0, y=0, width=100, height=60, text="Shape", shape_id=None,
+                 color=None, short_id=None, node=None):
         self.scene = scene
-        self.type = shape_type
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.text = text
-        self.id = shape_id if shape_id is not None else str(uuid.uuid4())
+        if node is None:
+            # The short ID is claimed when the designer adds the node to its Diagram (add_shape)
+            node = Node(short_id, text, shape_type, x, y, width, height)
+        self.node = node
+        self._id = shape_id
         self.selected = False
-        self.color = color if color else QColor("lightblue")
-        self.border_color = QColor("black")
+        self.color = color if color else QColor(node.color)
         self.graphics_item = None
         self.text_item = None
-        self.draw()
+
+    # Model attributes, stored on the node
+    x = node_attribute("x")
+    y = node_attribute("y")
+    width = node_attribute("width")
+    height = node_attribute("height")
+    text = node_attribute("label")
+    type = node_attribute("type")
+
+    @property
+    def id(self):
+        """Opaque unique ID of the shape object, made on first use (the exporters use short_id)."""
+        if self._id is None:
+            self._id = str(uuid.uuid4())
+        return self._id
+
+    @property
+    def short_id(self):
+        """Stable, human-readable ID used by every exporter (Mermaid, JSON, PyVis, NetworkX)."""
+        return self.node.id
+
+    @property
+    def color(self):
+        return QColor(self.node.color)
+
+    @color.setter
+    def color(self, color):
+        self.node.color = color.name()
 
     def auto_resize_to_fit_text(self, padding=30):
         """Calculates and updates shape size to fit text, then redraws."""
-        if not self.text_item:
-            self.draw_text() # Ensure text item exists
+        text_item = self.text_item
+        if not text_item:
+            # Not drawn: measure with a detached text item instead of building the shape's items
+            if Shape.text_measure_item is None:
+                Shape.text_measure_item = EditableTextItem(None, "")
+            text_item = Shape.text_measure_item
+            text_item.setTextWidth(-1)
             
         # 1. Get required text dimensions
-        self.text_item.setPlainText(self.text)
-        text_document = self.text_item.document()
+        text_item.setPlainText(self.text)
+        text_document = text_item.document()
         
         MAX_WIDTH = 300+50
         MIN_WIDTH = 100
@@ -132,13 +216,13 @@ class Shape:
         if new_width_content > MAX_WIDTH + padding:
             new_width = MAX_WIDTH + padding
             # Set the text item width constraint to the new capped shape width - margin
-            self.text_item.setTextWidth(new_width - padding) 
+            text_item.setTextWidth(new_width - padding) 
             # Re-read the resulting document size after wrapping
-            new_height = max(MIN_HEIGHT, math.ceil(self.text_item.document().size().height()) + padding)
+            new_height = max(MIN_HEIGHT, math.ceil(text_item.document().size().height()) + padding)
         else:
             new_width = new_width_content
-            self.text_item.setTextWidth(new_width - padding) # Set text width to be based on the shape
-            new_height = max(MIN_HEIGHT, math.ceil(self.text_item.document().size().height()) + padding)
+            text_item.setTextWidth(new_width - padding) # Set text width to be based on the shape
+            new_height = max(MIN_HEIGHT, math.ceil(text_item.document().size().height()) + padding)
 
 
         if new_width != self.width or new_height != self.height:
@@ -147,7 +231,9 @@ class Shape:
             self.height = new_height
             
             # 3. Redraw shape and text items
-            self.draw()
+            if self.graphics_item:
+                self.draw()
+            self.scene.parent_widget.mark_shape_changed(self)
             
             # 4. Update connectors
             self.scene.parent_widget.update_all_connectors()
@@ -174,6 +260,13 @@ class Shape:
         if self.graphics_item.visual_item:
             self.graphics_item.visual_item.setPen(pen)
 
+    def release(self):
+        """Drops the Qt items (the shape left the visible region); draw() builds them again."""
+        if self.graphics_item:
+            self.scene.removeItem(self.graphics_item)
+            self.graphics_item = None
+            self.text_item = None
+
     def draw_shape_visual(self):
         if self.graphics_item.visual_item:
             # Remove previous visual item if it exists
@@ -262,28 +355,62 @@ class Shape:
         
         return QPointF(intersection_x, intersection_y)
 
-class Connector(QGraphicsLineItem):
-    def __init__(self, start_shape, end_shape, scene, label=""):
+class ConnectorGraphicsItem(QGraphicsLineItem):
+    """The line of a drawn Connector; the arrowhead and the label are its child items."""
+    def __init__(self, connector):
         super().__init__()
+        self.connector = connector
+
+    def mouseDoubleClickEvent(self, event):
+        self.connector.edit_label()
+        super().mouseDoubleClickEvent(event)
+
+class Connector:
+    """Canvas view of a model Edge between the nodes of two shapes. Like Shape, its Qt items
+    are built by draw() and dropped by release()."""
+    __slots__ = ("start_shape", "end_shape", "scene", "edge", "graphics_item", "arrow", "label_item")
+
+    def __init__(self, start_shape, end_shape, scene, label=""):
         self.start_shape = start_shape
         self.end_shape = end_shape
         self.scene = scene
-        self.label = label
-        
-        self.setPen(QPen(QColor("gray"), 2, Qt.SolidLine, Qt.RoundCap, Qt.MiterJoin))
+        self.edge = Edge(start_shape.node, end_shape.node, label)
+        self.graphics_item = None
+        self.arrow = None
+        self.label_item = None
+
+    @property
+    def label(self):
+        return self.edge.label
+
+    @label.setter
+    def label(self, label):
+        self.edge.label = label
+
+    def draw(self):
+        if self.graphics_item:
+            self.update_position()
+            return
+        self.graphics_item = ConnectorGraphicsItem(self)
+        self.graphics_item.setPen(QPen(QColor("gray"), 2, Qt.SolidLine, Qt.RoundCap, Qt.MiterJoin))
         
-        self.arrow = QGraphicsPathItem(self)
+        self.arrow = QGraphicsPathItem(self.graphics_item)
         self.arrow.setPen(QPen(QColor("gray"), 2))
         self.arrow.setBrush(QBrush(QColor("gray")))
         
-        self.label_item = QGraphicsTextItem(self.label, self)
+        self.label_item = QGraphicsTextItem(self.label, self.graphics_item)
         # self.label_item.setFont(QFont("Arial", 8, QFont.Bold))
         self.label_item.setFont(QFont("Inter", 10, QFont.Bold))
 
         self.update_position()
-        scene.addItem(self)
+        self.scene.addItem(self.graphics_item)
+
+    def release(self):
+        if self.graphics_item:
+            self.scene.removeItem(self.graphics_item)
+            self.graphics_item = self.arrow = self.label_item = None
         
-    def mouseDoubleClickEvent(self, event):
+    def edit_label(self):
         text, ok = QInputDialog.getText(self.scene.parent_widget, 
                                         "Edit Connector Label", 
                                         "Label (e.g., Yes/No):", 
@@ -292,20 +419,21 @@ class Connector(QGraphicsLineItem):
         if ok:
             self.label = text
             self.label_item.setPlainText(self.label)
+            self.scene.parent_widget.mark_connector_dirty(self)
             self.update_position()
             self.scene.parent_widget.autosave_activity()
             self.scene.parent_widget.refresh_preview()
-        
-        super().mouseDoubleClickEvent(event)
 
     def update_position(self):
+        if not self.graphics_item:
+            return
         center_start = self.start_shape.center_point()
         center_end = self.end_shape.center_point()
         
         start_pos = self.start_shape.get_closest_point_on_bounds(center_end)
         end_pos = self.end_shape.get_closest_point_on_bounds(center_start) 
 
-        self.setLine(start_pos.x(), start_pos.y(), end_pos.x(), end_pos.y())
+        self.graphics_item.setLine(start_pos.x(), start_pos.y(), end_pos.x(), end_pos.y())
         self.update_arrowhead(start_pos, end_pos)
         self.update_label_position(start_pos, end_pos)
         
@@ -363,16 +491,1110 @@ class Connector(QGraphicsLineItem):
         self.label_item.setPos(label_pos_x, label_pos_y)
         self.label_item.setPlainText(self.label)
 
+# --- Mermaid Code Generation ---
+
+class MermaidCodeCache:
+    """Keeps the emitted Mermaid line of every node and edge so that an edit
+    only regenerates the lines of the elements that actually changed."""
+    HEADER = MERMAID_HEADER
+    EMPTY_CODE = MERMAID_EMPTY_CODE
+
+    def __init__(self):
+        self.lines = []          # [HEADER, node lines..., edge lines...]
+        self.node_index = {}     # shape -> position in self.lines
+        self.edge_index = {}     # connector -> position in self.lines
+        self.dirty_nodes = set()
+        self.dirty_edges = set()
+        self.structure_dirty = True
+        self.code = None
+
+    def invalidate_node(self, shape):
+        self.dirty_nodes.add(shape)
+        self.code = None
+
+    def invalidate_edge(self, connector):
+        self.dirty_edges.add(connector)
+        self.code = None
+
+    def invalidate_structure(self):
+        """Shapes or connectors were added, removed or reordered."""
+        self.structure_dirty = True
+        self.code = None
+
+    def generate(self, shapes, connectors):
+        if not shapes:
+            self.invalidate_structure()
+            return self.EMPTY_CODE
+
+        # Cheap safety net for code paths that mutate the lists without notifying us
+        if len(self.node_index) != len(shapes) or len(self.edge_index) != len(connectors):
+            self.structure_dirty = True
+
+        if self.structure_dirty:
+            self._rebuild(shapes, connectors)
+        elif self.dirty_nodes or self.dirty_edges:
+            for shape in self.dirty_nodes:
+                index = self.node_index.get(shape)
+                if index is not None:
+                    self.lines[index] = self._node_line(shape)
+            for connector in self.dirty_edges:
+                index = self.edge_index.get(connector)
+                if index is not None:
+                    self.lines[index] = self._edge_line(connector)
+
+        self.dirty_nodes.clear()
+        self.dirty_edges.clear()
+        if self.code is None:
+            self.code = "\n".join(self.lines)
+        return self.code
+
+    def _node_line(self, shape):
+        return mermaid_node_line(shape.short_id, shape.type, shape.text)
+
+    def _edge_line(self, connector):
+        return mermaid_edge_line(connector.start_shape.short_id, connector.end_shape.short_id, connector.label)
+
+    def _rebuild(self, shapes, connectors):
+        # Short IDs never change, so lines of clean elements are reused as-is
+        old_lines, old_node_index, old_edge_index = self.lines, self.node_index, self.edge_index
+        self.code = None
+        self.lines = [self.HEADER]
+        self.node_index = {}
+        self.edge_index = {}
+
+        for shape in shapes:
+            index = old_node_index.get(shape)
+            line = old_lines[index] if index is not None and shape not in self.dirty_nodes else self._node_line(shape)
+            self.node_index[shape] = len(self.lines)
+            self.lines.append(line)
+
+        for connector in connectors:
+            index = old_edge_index.get(connector)
+            line = old_lines[index] if index is not None and connector not in self.dirty_edges else self._edge_line(connector)
+            self.edge_index[connector] = len(self.lines)
+            self.lines.append(line)
+
+        self.structure_dirty = False
+
+def project_to_mermaid(data):
+    """Mermaid code of a project dict; the same lines MermaidCodeCache emits for the canvas."""
+    return Diagram.from_project(data).to_mermaid()
+
+def build_pyvis_html(nodes, connections, physics):
+    """Standalone interactive (PyVis) page for node and connection records."""
+    from pyvis.network import Network
+    net = Network(height="800px", width="100%", bgcolor="#ffffff", font_color="black", directed=True, notebook=False, cdn_resources='remote')
+    net.toggle_physics(physics)
+    for node in nodes:
+        net.add_node(node["id"], label=node["label"], shape=PYVIS_SHAPE_MAP.get(node["type"], 'box'),
+                     color=node["color"], font={'size': 14}, margin=10)
+    for conn in connections:
+        net.add_edge(conn["start_id"], conn["end_id"], label=conn["label"])
+    return net.generate_html()
+
+# --- Static Preview Rendering ---
+
+class StaticPreviewRenderer:
+    """Draws the static preview with one set of matplotlib artists that is reused across
+    refreshes: a PathCollection for nodes, a LineCollection for edge shafts, a PolyCollection
+    for arrowheads and pooled Text artists for labels. An update only changes offsets,
+    segments, colours and strings instead of clearing and rebuilding the figure.
+
+    Text rasterisation dominates matplotlib draw time, so labels are only drawn for the
+    elements inside the current view, and only at a zoom level where they are legible: while
+    the labels in view would cover more than MAX_LABEL_COVERAGE of the axes they would pile up
+    anyway, and are left out (zoom in with the toolbar to reveal them)."""
+    NODE_SIZE = 2500         # scatter marker area in points^2 (matches the old draw_networkx_nodes)
+    EDGE_MARGIN_PT = 15      # gap between the node marker and the edge end, in points
+    ARROW_LENGTH_PT = 12
+    ARROW_WIDTH_PT = 8
+    NODE_FONT_SIZE = 10
+    EDGE_FONT_SIZE = 9
+    LABEL_CHAR_WIDTH = 0.6   # average glyph width, relative to the font size
+    MAX_LABEL_COVERAGE = 0.5
+    SELF_LOOP_POINTS = 16    # polyline points of a self-loop arc
+
+    def __init__(self, figure):
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        self.figure = figure
+        figure.clear()
+        self.ax = figure.add_subplot(111)
+        self.ax.set_title("Flowchart Preview (Static)", fontsize=14, fontweight='bold')
+        self.ax.axis('off')
+
+        self.nodes = self.ax.scatter(np.empty(0), np.empty(0), s=self.NODE_SIZE, alpha=0.9,
+                                     edgecolors='black', linewidths=1, zorder=2)
+        self.edges = LineCollection([], colors='gray', linewidths=2, zorder=1)
+        self.arrows = PolyCollection([], facecolors='gray', edgecolors='gray', zorder=1)
+        self.ax.add_collection(self.edges)
+        self.ax.add_collection(self.arrows)
+        self.node_texts = []
+        self.edge_texts = []
+
+        self.xy = np.empty((0, 2))
+        self.edge_midpoints = np.empty((0, 2))
+        self.edge_index = np.empty((0, 2), dtype=int)
+        self.setting_limits = False
+        figure.tight_layout()
+
+        # Edge geometry is computed in display space and labels depend on the view, so both
+        # follow resizes and toolbar zoom/pan
+        self.ax.callbacks.connect('xlim_changed', self._on_view_changed)
+        self.ax.callbacks.connect('ylim_changed', self._on_view_changed)
+        if figure.canvas is not None:
+            figure.canvas.mpl_connect('resize_event', self._on_view_changed)
+
+    def update(self, positions, colors, labels, edge_list, edge_labels):
+        """positions: {node: (x, y)}, colors/labels: per node in positions order,
+        edge_list: [(u, v)], edge_labels: {(u, v): text}."""
+        nodes = list(positions)
+        index = {node: i for i, node in enumerate(nodes)}
+        self.xy = np.array([positions[node] for node in nodes], dtype=float).reshape(-1, 2)
+        self.edge_index = np.array([(index[u], index[v]) for u, v in edge_list], dtype=int).reshape(-1, 2)
+
+        self.nodes.set_offsets(self.xy)
+        self.nodes.set_facecolors(colors)
+        self._update_limits()
+
+        self._sync_texts(self.node_texts, self.xy, labels, dict(fontsize=self.NODE_FONT_SIZE, fontweight='bold'))
+        self.edge_midpoints = (self.xy[self.edge_index[:, 0]] + self.xy[self.edge_index[:, 1]]) / 2
+        self._sync_texts(self.edge_texts, self.edge_midpoints, [edge_labels.get(edge, "") for edge in edge_list],
+                         dict(fontsize=self.EDGE_FONT_SIZE, bbox=dict(boxstyle='round', ec='white', fc='white')))
+        self._update_edge_geometry()  # After the texts: self-loop labels are placed on their loops
+        self._update_label_visibility()
+
+    def _on_view_changed(self, *args):
+        if not self.setting_limits:
+            self._update_edge_geometry()
+            self._update_label_visibility()
+
+    def _update_limits(self):
+        self.setting_limits = True
+        try:
+            if not len(self.xy):
+                self.ax.set_xlim(0, 1)
+                self.ax.set_ylim(0, 1)
+                return
+            low, high = self.xy.min(axis=0), self.xy.max(axis=0)
+            # Leave room for the node markers around the outermost positions
+            pad = np.maximum((high - low) * 0.1, 1.0)
+            self.ax.set_xlim(low[0] - pad[0], high[0] + pad[0])
+            self.ax.set_ylim(low[1] - pad[1], high[1] + pad[1])
+        finally:
+            self.setting_limits = False
+
+    def _update_label_visibility(self):
+        (x0, x1), (y0, y1) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        points_to_pixels = self.figure.dpi / 72.0
+        pools = []
+        label_area = 0.0  # Estimated screen area of the labels in view, in pixels^2
+        for pool, xy, font_size in ((self.node_texts, self.xy, self.NODE_FONT_SIZE),
+                                    (self.edge_texts, self.edge_midpoints, self.EDGE_FONT_SIZE)):
+            lengths = np.array([len(text_artist.get_text()) for text_artist in pool[:len(xy)]], dtype=float)
+            in_view = (lengths > 0) & (xy[:, 0] >= x0) & (xy[:, 0] <= x1) & (xy[:, 1] >= y0) & (xy[:, 1] <= y1)
+            font_pixels = font_size * points_to_pixels
+            label_area += lengths[in_view].sum() * self.LABEL_CHAR_WIDTH * font_pixels * font_pixels
+            pools.append((pool, in_view))
+        legible = label_area <= self.MAX_LABEL_COVERAGE * self.ax.bbox.width * self.ax.bbox.height
+        for pool, in_view in pools:
+            for text_artist, visible in zip(pool, in_view):
+                text_artist.set_visible(bool(visible) and legible)
+
+    def _update_edge_geometry(self):
+        if not len(self.edge_index):
+            self.edges.set_segments([])
+            self.arrows.set_verts([])
+            return
+
+        # Work in display pixels so margins and arrowheads keep their size whatever the data scale
+        to_display = self.ax.transData
+        points_to_pixels = self.figure.dpi / 72.0
+        start = to_display.transform(self.xy[self.edge_index[:, 0]])
+        end = to_display.transform(self.xy[self.edge_index[:, 1]])
+        vector = end - start
+        length = np.hypot(vector[:, 0], vector[:, 1])
+        direction = vector / np.maximum(length, 1e-9)[:, None]
+        normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+
+        margin = (math.sqrt(self.NODE_SIZE) / 2 + self.EDGE_MARGIN_PT) * points_to_pixels
+        margin = np.minimum(margin, length / 2)[:, None]
+        start = start + direction * margin
+        tip = end - direction * margin
+        base = tip - direction * self.ARROW_LENGTH_PT * points_to_pixels
+        half_width = normal * self.ARROW_WIDTH_PT * points_to_pixels / 2
+
+        # Self-loops: an arc over the top of the node, ending in an arrow pointing back into it
+        loops = np.flatnonzero(self.edge_index[:, 0] == self.edge_index[:, 1])
+        radius = math.sqrt(self.NODE_SIZE) / 2 * points_to_pixels
+        angles = np.radians(np.linspace(-30, 210, self.SELF_LOOP_POINTS))
+        arc = np.column_stack((0.5 * radius * np.cos(angles), 1.2 * radius + 0.5 * radius * np.sin(angles)))
+        loop_direction = np.array([math.sin(math.radians(30)), -math.cos(math.radians(30))])
+        tip[loops] = start[loops] + arc[-1]
+        base[loops] = tip[loops] - loop_direction * self.ARROW_LENGTH_PT * points_to_pixels
+        half_width[loops] = np.array([-loop_direction[1], loop_direction[0]]) * self.ARROW_WIDTH_PT * points_to_pixels / 2
+
+        to_data = to_display.inverted()
+        segment_points = to_data.transform(np.concatenate((start, base)))
+        count = len(start)
+        segments = list(np.stack((segment_points[:count], segment_points[count:]), axis=1))
+        for row in loops:
+            segments[row] = to_data.transform(start[row] + arc)
+        self.edges.set_segments(segments)
+        head_points = to_data.transform(np.concatenate((tip, base + half_width, base - half_width)))
+        self.arrows.set_verts(np.stack((head_points[:count], head_points[count:2 * count], head_points[2 * count:]), axis=1))
+
+        if len(loops) and len(self.edge_midpoints) == count:
+            label_points = to_data.transform(start[loops] + np.array([0.0, 1.7 * radius]))
+            self.edge_midpoints[loops] = label_points
+            for row, point in zip(loops, label_points):
+                self.edge_texts[row].set_position(point)
+
+    def _sync_texts(self, pool, xy, strings, style):
+        """Reuses pooled Text artists, creating only the missing ones and hiding the surplus."""
+        for i in range(len(pool), len(strings)):
+            pool.append(self.ax.text(0, 0, "", ha='center', va='center', clip_on=True, zorder=3, **style))
+        for text_artist, (x, y), string in zip(pool, xy, strings):
+            if text_artist.get_text() != string:
+                text_artist.set_text(string)
+            text_artist.set_position((x, y))
+        for text_artist in pool[len(strings):]:
+            text_artist.set_visible(False)
+
+# --- Canvas Image Export ---
+
+CANVAS_IMAGE_FORMATS = ("png", "svg", "jpg")
+
+def render_scene_image(scene, file_path, image_format, margin=20):
+    """Renders every item of a QGraphicsScene to a PNG (transparent), JPG (white) or SVG file."""
+    # Bounding box of all items plus a small margin
+    scene_rect = scene.itemsBoundingRect()
+    scene_rect.setRect(
+        scene_rect.x() - margin,
+        scene_rect.y() - margin,
+        scene_rect.width() + 2 * margin,
+        scene_rect.height() + 2 * margin
+    )
+    painter = QPainter()
+    if image_format == "svg":
+        generator = QSvgGenerator()
+        generator.setFileName(str(file_path))
+        generator.setSize(scene_rect.size().toSize())
+        generator.setViewBox(scene_rect)
+
+        painter.begin(generator)
+        painter.setRenderHint(QPainter.Antialiasing)
+        scene.render(painter)
+        painter.end()
+    elif image_format in ("png", "jpg"):
+        image = QImage(scene_rect.size().toSize(), QImage.Format_ARGB32)
+        image.fill(Qt.transparent if image_format == "png" else Qt.white)
+
+        painter.begin(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        # Translate painter so that scene_rect origin becomes (0,0) in the image
+        painter.translate(-scene_rect.x(), -scene_rect.y())
+        scene.render(painter, target=scene_rect, source=scene_rect)
+        painter.end()
+
+        if not image.save(str(file_path), image_format.upper()):
+            raise OSError(f"Could not write {file_path}")
+    else:
+        raise ValueError(f"Unsupported canvas image format: {image_format}")
+
+# --- Atomic File Writes ---
+
+@contextmanager
+def atomic_output(file_path):
+    """Binary file object whose content replaces file_path only once the block completes, so
+    file_path holds either its old or its new content, never a torn mix: the data goes to a
+    temporary file in the same folder, is fsynced, then renamed over."""
+    file_path = Path(file_path)
+    temp_name = str(file_path.parent / f"{file_path.name}.{uuid.uuid4().hex[:12]}.tmp")
+    # Not tempfile.mkstemp: its files are private (0600), while the OS applies the umask to
+    # these exactly as for a plain open()
+    fd = os.open(temp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_name)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself (POSIX only)
+        dir_fd = os.open(file_path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def write_file_atomic(file_path, text):
+    """Writes text (or bytes) through atomic_output."""
+    with atomic_output(file_path) as f:
+        f.write(text if isinstance(text, bytes) else text.encode("utf-8"))
+
+# --- Compressed JSON Projects ---
+
+COMPRESSED_PROJECT_CODECS = {".json.gz": gzip, ".json.xz": lzma}
+
+def compressed_project_codec(file_path):
+    """The gzip or lzma module for a .json.gz / .json.xz path, None for anything else."""
+    name = str(file_path).lower()
+    return next((codec for suffix, codec in COMPRESSED_PROJECT_CODECS.items() if name.endswith(suffix)), None)
+
+PROJECT_JSON_CHUNK_RECORDS = 512  # Records encoded per write() call
+
+def write_project_json(stream, nodes, connections, **extra):
+    """Writes a project as JSON to a text stream a chunk of records at a time, so memory use
+    does not grow with the diagram: nodes and connections can be any iterables (e.g.
+    generators over the live shapes). Each record goes on its own line; extra top-level keys
+    are appended at the end."""
+    encode = json.JSONEncoder().encode
+    stream.write("{")
+    for key_index, (key, records) in enumerate((("nodes", nodes), ("connections", connections))):
+        stream.write(("," if key_index else "") + f'\n  "{key}": [')
+        separator = "\n    "
+        chunk = []
+        for record in records:
+            chunk.append(separator + encode(record))
+            separator = ",\n    "
+            if len(chunk) >= PROJECT_JSON_CHUNK_RECORDS:
+                stream.write("".join(chunk))
+                chunk = []
+        stream.write("".join(chunk))
+        stream.write("]" if separator == "\n    " else "\n  ]")
+    for key, value in extra.items():
+        stream.write(f",\n  {encode(key)}: {encode(value)}")
+    stream.write("\n}\n")
+
+def save_project_json(file_path, nodes, connections, **extra):
+    """Streams the project JSON into an atomic output file, through gzip/lzma for .json.gz /
+    .json.xz paths; the JSON text is never held in memory as a whole."""
+    codec = compressed_project_codec(file_path)
+    with atomic_output(file_path) as raw:
+        if codec is None:
+            text = io.TextIOWrapper(raw, encoding='utf-8', newline='\n')
+            write_project_json(text, nodes, connections, **extra)
+            text.flush()
+            text.detach()  # raw is closed (after fsync) by atomic_output
+        else:
+            # Closing the text wrapper finishes the compressed stream but leaves raw open
+            with codec.open(raw, 'wt', encoding='utf-8') as text:
+                write_project_json(text, nodes, connections, **extra)
+
+def read_project_json_compressed(file_path):
+    """Project dict of a .json.gz / .json.xz file, decompressed while it is parsed."""
+    with compressed_project_codec(file_path).open(file_path, 'rt', encoding='utf-8') as text:
+        return json.load(text)
+
+class AutosaveNotifier(QObject):
+    """Carries autosave results from the worker thread back to the GUI thread."""
+    finished = pyqtSignal(int, str)  # (write ID, error message or "")
+
+# --- Edit Journal ---
+
+def shape_to_record(shape):
+    """The JSON project record of a shape (also used by the edit journal)."""
+    return {
+        "id": shape.short_id,
+        "label": shape.text,
+        "type": shape.type,
+        "x": shape.x,
+        "y": shape.y,
+        "width": shape.width,
+        "height": shape.height,
+        "color": shape.color.name()
+    }
+
+def connector_to_record(connector):
+    return {
+        "start_id": connector.start_shape.short_id,
+        "end_id": connector.end_shape.short_id,
+        "label": connector.label
+    }
+
+class EditJournal:
+    """Append-only log of edits, one JSON record per line, kept next to the autosave snapshot.
+
+    The first record of a journal is a 'reset' naming the state it starts from (see
+    read_journal_base): the project file just saved or loaded, an autosave snapshot written
+    after it, or, for an empty diagram, the state itself. After that each edit costs one
+    small record (add, move, update, delete, connect, relabel_connection,
+    disconnect, clear). Connections are addressed by their index in the project's connection
+    list. Every record carries a sequence number; once a snapshot that includes sequence
+    number N is on disk, compact(N) drops the records it covers.
+
+    Moves and property changes are coalesced: shapes are only marked with touch_shape, and
+    flush_shapes writes one move (or, for any other change, update) record per shape. Bulk
+    loads are not journaled element by element: while paused nothing is recorded, and
+    defer_reset makes the journal restart from the loaded state before its next record.
+    No record holds the whole diagram, so none has to be serialised on the GUI thread.
+    Only the file offsets of the records are kept in memory, not their text."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = None
+        self.seq = 0
+        self.paused = False
+        self.pending_reset = None  # Callable that restarts the journal (see defer_reset)
+        self.dirty_shapes = {}     # short_id -> (Shape, only moved) waiting for flush_shapes
+        self.offsets = []          # File offset of every record since the last compaction
+        self.first_seq = 1         # Sequence number of the record at offsets[0]
+        self.size = 0              # Bytes in the file
+
+    def start(self, base):
+        """Begins a new journal file whose first record is a reset to base, the fields naming
+        the state it starts from ({"data": ...}, {"file": ...} or {"snapshot": True})."""
+        self.close()
+        self.pending_reset = None
+        self.dirty_shapes = {}
+        self.offsets = []
+        self.first_seq = self.seq + 1
+        self.size = 0
+        try:
+            self.file = open(self.path, 'wb')
+        except OSError as e:
+            print(f"Warning: Could not start edit journal: {e}")
+            return
+        self._write([dict(op="reset", **base)])
+
+    def defer_reset(self, restart):
+        """Replaces the records of a bulk load: before the next record (or flush_shapes),
+        restart() starts the journal again from the state at that time."""
+        if self.file is not None:
+            self.pending_reset = restart
+
+    def record(self, op, **fields):
+        if self.file is None or self.paused:
+            return
+        if op == "add":
+            self.dirty_shapes.pop(fields["node"]["id"], None)
+        elif op == "delete":
+            self.dirty_shapes.pop(fields["id"], None)
+        elif op == "clear":
+            self.dirty_shapes = {}
+            self.pending_reset = None  # Whatever was loaded is gone again
+        # Keep the log chronological: pending moves/relabels happened before this edit
+        self.flush_shapes()
+        self._write([dict(op=op, **fields)])
+
+    def touch_shape(self, shape, moved=False):
+        """Marks a shape as changed; moved=True when only its position changed."""
+        if self.file is not None and not self.paused:
+            entry = self.dirty_shapes.get(shape.short_id)
+            self.dirty_shapes[shape.short_id] = (shape, moved and (entry is None or entry[1]))
+
+    def flush_shapes(self):
+        if self.pending_reset is not None:
+            restart, self.pending_reset = self.pending_reset, None
+            restart()
+        records = [{"op": "move", "id": short_id, "x": shape.x, "y": shape.y} if moved
+                   else {"op": "update", "node": shape_to_record(shape)}
+                   for short_id, (shape, moved) in self.dirty_shapes.items()]
+        self.dirty_shapes = {}
+        self._write(records)
+
+    def _write(self, records):
+        if not records or self.file is None:
+            return
+        chunk = []
+        for record in records:
+            self.seq += 1
+            line = (json.dumps(dict(seq=self.seq, **record), separators=(',', ':')) + "\n").encode("utf-8")
+            self.offsets.append(self.size)
+            self.size += len(line)
+            chunk.append(line)
+        try:
+            self.file.write(b"".join(chunk))
+            self.file.flush()  # Survives an application crash; the OS writes it back in time
+        except OSError as e:
+            print(f"Warning: Could not write edit journal: {e}")
+
+    def compact(self, snapshot_seq):
+        """Rewrites the journal without the records already contained in the snapshot."""
+        if self.file is None:
+            return
+        covered = max(0, min(len(self.offsets), snapshot_seq + 1 - self.first_seq))
+        start = self.offsets[covered] if covered < len(self.offsets) else self.size
+        self.file.close()
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                remaining = f.read()
+            write_file_atomic(self.path, remaining)
+            self.file = open(self.path, 'ab')
+        except OSError as e:
+            print(f"Warning: Could not compact edit journal: {e}")
+            self.file = None
+            return
+        self.offsets = [offset - start for offset in self.offsets[covered:]]
+        self.first_seq += covered
+        self.size -= start
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def read_records(path):
+        """Records of a journal file; a torn last line (crash mid-write) is ignored."""
+        records = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+def read_journal_base(record):
+    """Project dict a journal's 'reset' record starts from: the data in the record, or the
+    project file it names, provided that file is unchanged since (same size and mtime).
+    A base snapshot is only read with the slot's snapshot (see recover_project_data), so
+    reaching its reset means the snapshot was never written."""
+    if "data" in record:
+        return record["data"]
+    if "file" in record:
+        stat = os.stat(record["file"])
+        if (stat.st_size, stat.st_mtime_ns) != (record["size"], record["mtime_ns"]):
+            raise ValueError(f"{record['file']} was changed after the journal was started")
+        project = read_project_file(FileTask(), record["file"])
+        return project.to_dict() if isinstance(project, BinaryProject) else project
+    raise ValueError("The autosave snapshot the journal starts from was never written")
+
+def replay_journal(data, records, after_seq=0):
+    """Applies the journal records newer than after_seq to a project dict (in place)."""
+    for record in records:
+        if record.get("seq", 0) <= after_seq:
+            continue
+        op = record["op"]
+        nodes = data["nodes"]
+        if op == "reset":
+            base = read_journal_base(record)
+            data["nodes"], data["connections"] = list(base["nodes"]), list(base["connections"])
+        elif op == "clear":
+            data["nodes"], data["connections"] = [], []
+        elif op == "add":
+            nodes.append(record["node"])
+        elif op == "connect":
+            data["connections"].append(record["connection"])
+        elif op == "disconnect":
+            del data["connections"][record["index"]]
+        elif op == "relabel_connection":
+            data["connections"][record["index"]]["label"] = record["label"]
+        elif op == "delete":
+            data["nodes"] = [node for node in nodes if node["id"] != record["id"]]
+            data["connections"] = [c for c in data["connections"]
+                                   if record["id"] not in (c["start_id"], c["end_id"])]
+        else:
+            node_id = record["node"]["id"] if op == "update" else record["id"]
+            index = next((i for i, node in enumerate(nodes) if node["id"] == node_id), None)
+            if index is None:
+                continue
+            if op == "update":
+                nodes[index] = record["node"]
+            elif op == "move":
+                nodes[index] = dict(nodes[index], x=record["x"], y=record["y"])
+            elif op == "relabel":
+                nodes[index] = dict(nodes[index], label=record["label"])
+    return data
+
+class AutosaveSlot:
+    """One designer session's recovery files in the shared autosave folder: <id>.json
+    (snapshot), <id>.journal and <id>.meta, guarded by <id>.lock. The lock is a QLockFile that
+    only goes stale when its owning process is gone, so a slot whose lock can be taken belongs
+    to a session that crashed or was killed."""
+
+    def __init__(self, directory, slot_id):
+        self.directory = Path(directory)
+        self.id = slot_id
+        self.snapshot_path = self.directory / f"{slot_id}.json"
+        self.journal_path = self.directory / f"{slot_id}.journal"
+        self.meta_path = self.directory / f"{slot_id}.meta"
+        self.lock = QLockFile(str(self.directory / f"{slot_id}.lock"))
+        self.lock.setStaleLockTime(0)  # Never time out a live session's lock
+
+    @classmethod
+    def for_project(cls, directory, project_path):
+        digest = hashlib.sha1(str(Path(project_path).resolve()).encode("utf-8")).hexdigest()
+        return cls(directory, "project-" + digest[:16])
+
+    @classmethod
+    def for_session(cls, directory):
+        return cls(directory, "session-" + uuid.uuid4().hex[:16])
+
+    @staticmethod
+    def list_ids(directory):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        return sorted({name.rsplit(".", 1)[0] for name in names if name.endswith((".json", ".journal", ".meta"))})
+
+    def acquire(self):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"Warning: Could not create autosave folder: {e}")
+            return False
+        return self.lock.tryLock(0)
+
+    def release(self):
+        self.lock.unlock()
+
+    def write_meta(self, project_path):
+        meta = {"project": project_path, "pid": os.getpid(), "started": time.time()}
+        try:
+            write_file_atomic(self.meta_path, json.dumps(meta))
+        except OSError as e:
+            print(f"Warning: Could not write autosave metadata: {e}")
+
+    def read_meta(self):
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def last_modified(self):
+        times = [path.stat().st_mtime for path in (self.snapshot_path, self.journal_path) if path.exists()]
+        return max(times) if times else 0.0
+
+    def recover_project_data(self):
+        """Project dict rebuilt from the snapshot and the journal written after it, or None."""
+        data, snapshot_seq = None, 0
+        if self.snapshot_path.exists() and self.snapshot_path.stat().st_size > 0:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            snapshot_seq = data.pop("journal_seq", 0)
+        records = EditJournal.read_records(self.journal_path)
+        if records:
+            data = replay_journal(data or {"nodes": [], "connections": []}, records, snapshot_seq)
+        return data
+
+    def remove_snapshot(self):
+        try:
+            self.snapshot_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not delete autosave file: {e}")
+
+    def remove_files(self):
+        for path in (self.snapshot_path, self.journal_path, self.meta_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Could not delete autosave file: {e}")
+
+# --- Binary Project Format ---
+#
+# A .fcb file holds the same project as the JSON format, laid out in columns:
+#   header      magic, version, node count, connection count, string count, string bytes
+#   offsets     uint64[strings + 1]      byte offsets into the string blob
+#   numeric     float64[4][nodes]        x, y, width, height
+#   strings     uint32[4][nodes]         id, label, type, colour (string table indices)
+#   connections uint32[3][connections]   start row, end row, label (string table index)
+#   int mask    uint8[nodes]             bit i set when numeric field i was an int (exact round trip)
+#   blob        the UTF-8 string table; every distinct string is stored once
+# Loading maps the file and wraps each column in a numpy view without copying it.
+
+BINARY_PROJECT_SUFFIX = ".fcb"
+BINARY_PROJECT_MAGIC = b"FCB1"
+BINARY_PROJECT_VERSION = 1
+BINARY_PROJECT_HEADER = struct.Struct("<4sIIIIQ")
+BINARY_PROJECT_DATA_START = 32  # Header padded so the columns are 8-byte aligned
+NODE_NUMERIC_FIELDS = ("x", "y", "width", "height")
+NODE_STRING_FIELDS = ("id", "label", "type", "color")
+
+def encode_project_binary(project):
+    """Encodes a Diagram (or a project dict, as produced by project_data) in the .fcb format.
+    The columns are gathered from the diagram's packed arrays; removed rows are left out."""
+    diagram = project if isinstance(project, Diagram) else Diagram.from_project(project)
+    strings = {}
+    node_rows = np.flatnonzero(np.frombuffer(diagram.node_alive, dtype=np.uint8))
+    edge_rows = np.flatnonzero(np.frombuffer(diagram.edge_alive, dtype=np.uint8))
+
+    def interned_column(table, column, rows):
+        """String table indices of the file for an interned column of the diagram."""
+        indices = np.frombuffer(column, dtype=column.typecode)[rows]
+        used = np.unique(indices)  # Strings no longer referenced are not written
+        file_indices = np.zeros(len(table), dtype=np.uint32)
+        file_indices[used] = [strings.setdefault(table[index], len(strings)) for index in used.tolist()]
+        return file_indices[indices]
+
+    node_ids = diagram.node_ids
+    ids = np.array([strings.setdefault(node_ids[row], len(strings)) for row in node_rows.tolist()], dtype=np.uint32)
+    string_columns = np.stack([ids, interned_column(diagram.labels, diagram.node_labels, node_rows),
+                               interned_column(diagram.types, diagram.node_types, node_rows),
+                               interned_column(diagram.colors, diagram.node_colors, node_rows)])
+    numeric = np.stack([np.frombuffer(column, dtype=np.float64)[node_rows] for column in diagram.numeric])
+    int_mask = np.frombuffer(diagram.int_mask, dtype=np.uint8)[node_rows]
+    file_rows = np.cumsum(np.frombuffer(diagram.node_alive, dtype=np.uint8), dtype=np.int64) - 1
+    connection_columns = np.stack([
+        file_rows[np.frombuffer(diagram.edge_sources, dtype=np.uint32)[edge_rows]],
+        file_rows[np.frombuffer(diagram.edge_targets, dtype=np.uint32)[edge_rows]],
+        interned_column(diagram.labels, diagram.edge_labels, edge_rows)]).astype(np.uint32)
+
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    blob = b"".join(encoded)
+
+    header = BINARY_PROJECT_HEADER.pack(BINARY_PROJECT_MAGIC, BINARY_PROJECT_VERSION, len(node_rows),
+                                        len(edge_rows), len(encoded), len(blob))
+    return b"".join([header.ljust(BINARY_PROJECT_DATA_START, b"\0"), offsets.tobytes(), numeric.tobytes(),
+                     string_columns.tobytes(), connection_columns.tobytes(), int_mask.tobytes(), blob])
+
+class BinaryProject:
+    """Read-only view of an encoded .fcb project. The column attributes are numpy arrays that
+    share memory with the buffer (e.g. an mmap), so opening costs no parsing at all."""
+
+    def __init__(self, buffer):
+        magic, version, node_count, connection_count, string_count, blob_size = BINARY_PROJECT_HEADER.unpack_from(buffer, 0)
+        if magic != BINARY_PROJECT_MAGIC:
+            raise ValueError("Not a binary flowchart project.")
+        if version != BINARY_PROJECT_VERSION:
+            raise ValueError(f"Unsupported binary project version {version}.")
+        self.buffer = buffer
+        self.node_count = node_count
+        self.connection_count = connection_count
+        offset = BINARY_PROJECT_DATA_START
+
+        def column(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self.string_offsets = column(np.uint64, string_count + 1)
+        self.numeric = column(np.float64, len(NODE_NUMERIC_FIELDS) * node_count).reshape(len(NODE_NUMERIC_FIELDS), node_count)
+        self.string_columns = column(np.uint32, len(NODE_STRING_FIELDS) * node_count).reshape(len(NODE_STRING_FIELDS), node_count)
+        self.connection_columns = column(np.uint32, 3 * connection_count).reshape(3, connection_count)
+        self.int_mask = column(np.uint8, node_count)
+        self.blob_start = offset
+        if offset + blob_size > len(buffer):
+            raise ValueError("Binary project file is truncated.")
+
+    def strings(self):
+        """The decoded string table."""
+        blob = memoryview(self.buffer)[self.blob_start:]
+        bounds = self.string_offsets.tolist()
+        return [str(blob[start:end], "utf-8") for start, end in zip(bounds, bounds[1:])]
+
+    def iter_nodes(self, strings=None):
+        """Node records identical to the JSON project's."""
+        strings = strings if strings is not None else self.strings()
+        xs, ys, widths, heights = (self._numeric_values(i) for i in range(len(NODE_NUMERIC_FIELDS)))
+        ids, labels, types, colors = ([strings[index] for index in indices.tolist()] for indices in self.string_columns)
+        for row in range(self.node_count):
+            yield {"id": ids[row], "label": labels[row], "type": types[row],
+                   "x": xs[row], "y": ys[row], "width": widths[row], "height": heights[row],
+                   "color": colors[row]}
+
+    def _numeric_values(self, field_index):
+        """One numeric column as Python numbers, ints where the source had ints."""
+        values = self.numeric[field_index]
+        is_int = (self.int_mask >> field_index) & 1
+        if is_int.all():
+            return values.astype(np.int64).tolist()
+        if not is_int.any():
+            return values.tolist()
+        return [int(value) if flag else value for value, flag in zip(values.tolist(), is_int.tolist())]
+
+    def iter_connections(self, strings=None):
+        strings = strings if strings is not None else self.strings()
+        ids = [strings[index] for index in self.string_columns[0].tolist()]
+        for start, end, label in zip(*(values.tolist() for values in self.connection_columns)):
+            yield {"start_id": ids[start], "end_id": ids[end], "label": strings[label]}
+
+    def to_dict(self):
+        """The equivalent JSON project dict."""
+        strings = self.strings()
+        return {"nodes": list(self.iter_nodes(strings)), "connections": list(self.iter_connections(strings))}
+
+def project_records(project):
+    """(nodes, connections) of a project dict or BinaryProject. For the latter they are
+    generators, so the whole project never exists as dicts at once."""
+    if isinstance(project, BinaryProject):
+        strings = project.strings()
+        return project.iter_nodes(strings), project.iter_connections(strings)
+    return project["nodes"], project["connections"]
+
+def read_project_binary(file_path):
+    """Maps a .fcb file into memory and returns a BinaryProject over it."""
+    with open(file_path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BinaryProject(buffer)
+
+# --- Background File Tasks ---
+
+class FileTaskCancelled(Exception):
+    """Raised inside a file task once the user pressed Cancel."""
+
+class FileTask(QObject):
+    """Progress and cancellation channel between a load/save running on the file worker
+    thread and the GUI (see FlowchartDesigner.run_file_task)."""
+    progress = pyqtSignal(int)  # percent
+    finished = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.cancel_event = threading.Event()
+        self.percent = -1
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, done, total):
+        """Called by the worker; also the point where a pending cancel takes effect."""
+        if self.cancel_event.is_set():
+            raise FileTaskCancelled()
+        percent = int(100 * done / total) if total else 100
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(percent)
+
+    def track(self, records, total, offset=0, span=None):
+        """Yields from records while reporting progress every FILE_TASK_REPORT_EVERY items."""
+        span = total if span is None else span
+        for index, record in enumerate(records):
+            if index % FILE_TASK_REPORT_EVERY == 0:
+                self.report(offset + index, offset + span)
+            yield record
+
+FILE_TASK_REPORT_EVERY = 1000
+FILE_TASK_READ_CHUNK = 1 << 20
+
+def read_project_file(task, file_path):
+    """File worker: reads and parses a project file. Returns the project dict, a BinaryProject
+    for .fcb files, or the text of a Mermaid file (which is parsed on the GUI thread)."""
+    name = str(file_path).lower()
+    if name.endswith(BINARY_PROJECT_SUFFIX):
+        # Stays a view over the mapped columns; records are made one at a time while the
+        # scene is built (see project_records)
+        project = read_project_binary(file_path)
+        task.report(1, 1)
+        return project
+
+    size = os.path.getsize(file_path)
+    codec = compressed_project_codec(file_path)
+    with open(file_path, 'rb') as raw:
+        text_stream = codec.open(raw, 'rt', encoding='utf-8') if codec else io.TextIOWrapper(raw, encoding='utf-8')
+        with text_stream:
+            chunks = []
+            while True:
+                # Progress follows the (compressed) bytes consumed from disk
+                task.report(raw.tell() * 0.9, size)
+                chunk = text_stream.read(FILE_TASK_READ_CHUNK)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    content = "".join(chunks)
+    del chunks  # Only one copy of the text may be alive while it is parsed
+    if name.endswith(('.mmd', '.txt')):
+        return content
+    data = json.loads(content)
+    task.report(1, 1)
+    return {"nodes": data.get("nodes", []), "connections": data.get("connections", [])}
+
+def write_project_file(task, file_path, project):
+    """File worker: saves a project snapshot (atomically) in the format given by the
+    extension. The snapshot is a Diagram copy (see project_snapshot), whose records are
+    made one at a time while they are written, or a project dict. A cancel leaves the
+    existing file untouched."""
+    if isinstance(project, Diagram):
+        nodes, connections = project.node_records(), project.edge_records()
+        node_count, total = project.node_count, project.node_count + project.edge_count
+    else:
+        nodes, connections = project["nodes"], project["connections"]
+        node_count, total = len(nodes), len(nodes) + len(connections)
+    if str(file_path).lower().endswith(BINARY_PROJECT_SUFFIX):
+        task.report(0, 1)
+        encoded = encode_project_binary(project)
+        task.report(1, 2)
+        write_file_atomic(file_path, encoded)
+    else:
+        save_project_json(file_path, task.track(nodes, total),
+                          task.track(connections, total, offset=node_count, span=total - node_count))
+    task.report(1, 1)
+
+def read_recovery_data(task, slots):
+    """File worker: the recovered project dict (or None) of every slot."""
+    results = []
+    for index, slot in enumerate(slots):
+        task.report(index, len(slots))
+        try:
+            results.append(slot.recover_project_data())
+        except Exception as e:
+            results.append(None)
+            print(f"Warning: Could not read recovery files of {slot.id}: {e}")
+    return results
+
+# --- Render Cache ---
+
+def user_cache_dir(app_name="FlowchartDesigner"):
+    """Per-user cache folder: LOCALAPPDATA on Windows, ~/Library/Caches on macOS, XDG elsewhere."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / app_name
+
+class RenderCache:
+    """Content-addressed, size-bounded LRU cache of rendered previews on disk.
+
+    Entries are files named <sha256 of the key parts>.<ext> (svg, html, json, png...).
+    Recency is the file mtime, so the LRU order survives restarts. Any I/O problem is
+    treated as a cache miss: the cache must never break a preview."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.entries = None  # OrderedDict file name -> size, least recently used first
+        self.total_bytes = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """Hashes the generated content plus render options into a stable key."""
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key, ext):
+        return self.directory / f"{key}.{ext}"
+
+    def lookup(self, key, ext):
+        """Returns the path of a cached entry (marking it recently used), or None."""
+        self._load_index()
+        name = f"{key}.{ext}"
+        path = self.directory / name
+        if name in self.entries and path.exists():
+            self.entries.move_to_end(name)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def read_text(self, key, ext):
+        path = self.lookup(key, ext)
+        if path is None:
+            return None
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def write_text(self, key, ext, text):
+        return self.write_bytes(key, ext, text.encode("utf-8"))
+
+    def write_bytes(self, key, ext, data):
+        path = self.path_for(key, ext)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(path.name + ".tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write render cache entry: {e}")
+            return None
+        return self.register(path)
+
+    def register(self, path):
+        """Accounts for a file written directly into the cache folder and evicts if needed."""
+        self._load_index()
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return None
+        self.total_bytes += size - self.entries.pop(path.name, 0)
+        self.entries[path.name] = size
+        self._evict()
+        return path
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate(),
+                "entries": len(self.entries or ()), "bytes": self.total_bytes}
+
+    def _load_index(self):
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        try:
+            files = [(entry.stat().st_mtime, entry.name, entry.stat().st_size)
+                     for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith(".tmp")]
+        except OSError:
+            files = []
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.directory / name)
+            except OSError:
+                pass
+
 # --- Main Designer Class ---
 
 class FlowchartDesigner(QMainWindow):
     AUTOSAVE_INTERVAL_MS = 60000 #300000  # 5 minutes (300,000 milliseconds)
-    AUTOSAVE_FILENAME = "flowchart_autosave.json"
+    AUTOSAVE_DIRNAME = "flowchart-designer-autosave"  # Per-session slots, see AutosaveSlot
+    JOURNAL_FLUSH_MS = 200            # Moves and property edits are coalesced for this long
+    JOURNAL_COMPACT_RECORDS = 2000    # Snapshot early once the journal holds this many records
+    STATIC_LAYOUT_CACHE_SIZE = 8  # Computed (force-directed) layouts kept per topology
+    RENDER_CACHE_MAX_BYTES = 200 * 1024 * 1024  # On-disk cache of rendered previews
+    PREVIEW_TAB_TYPES = ["mermaid", "interactive", "static"]  # In preview_tabs order
+    STARTUP_PREVIEW_DELAY_MS = 50  # Lets the canvas paint before the first preview widget is built
+    LARGE_GRAPH_NODE_THRESHOLD = 1000  # Default shape count above which the interactive view simplifies
+    LARGE_GRAPH_CLUSTER_TARGET = 200  # Roughly how many clusters large-graph mode aims for
+    VIRTUAL_CANVAS_THRESHOLD = 2000  # Above this many shapes only the visible region has graphics items
+    VISIBLE_REGION_MARGIN = 300  # Scene pixels around the viewport that are drawn as well
+    VISIBLE_ITEMS_DELAY_MS = 30  # Scrolls and moves are coalesced before the drawn items are updated
 
-    def __init__(self):
+    def __init__(self, headless=False):
         super().__init__()
-        self.shapes = []
-        self.connectors = []
+        # A headless designer is never shown: it backs the command-line conversions (see
+        # run_cli), so it keeps no autosave slot and reports problems as ConversionError
+        self.headless = headless
+        # Shapes and connectors in diagram order; dicts used as ordered sets (value None), so
+        # removing one does not scan the others
+        self.shapes = {}
+        self.connectors = {}
         self.selected_shape = None
         self.current_tool = "select"
         self.current_color = QColor("lightblue")
@@ -380,15 +1602,83 @@ class FlowchartDesigner(QMainWindow):
         
         self.connection_start_shape = None
         self.temp_line = None
+        self.mermaid_cache = MermaidCodeCache()
+        # networkx mirror of shapes/connectors, keyed by short_id. Only the static preview uses
+        # it, so it is built from the model on first access and then kept in sync
+        self._graph = None
+        self.structure_revision = 0  # Bumped on every add/remove of shapes or connectors
+        self.topology_hash_cache = (None, None)  # (structure_revision, hash)
+        self.static_layout_cache = {}  # (layout name, topology hash) -> positions
+        self.static_renderer = None    # StaticPreviewRenderer, created on first static refresh
+        # Until the static preview is interacted with, a cached image of it is shown when there
+        # is one; the live figure's first draw after each refresh is cached (see generate_static_preview)
+        self.static_preview_live = False
+        self.static_preview_pending = None  # Content key parts of the refresh waiting for its draw
+        self.render_cache = RenderCache(user_cache_dir() / "render-cache", self.RENDER_CACHE_MAX_BYTES)
+        # Previews are lazy: each remembers the diagram revision it last rendered and is only
+        # brought up to date while its tab is actually visible (see render_visible_preview)
+        self.diagram_revision = 0
+        self.preview_revisions = {preview_type: -1 for preview_type in self.PREVIEW_TAB_TYPES}
+        # The Mermaid page is loaded once; later renders are pushed into it with runJavaScript
+        self.mermaid_page_state = "unloaded"  # "unloaded" -> "loading" -> "ready"
+        self.mermaid_pending_render = None    # (code, theme) queued while the page is loading
+        self.mermaid_rendered = None          # (code, theme) last pushed to the page
+        # Same idea for the interactive page: what its vis DataSets currently hold, by element id
+        self.interactive_page_state = "unloaded"
+        self.interactive_sent = {"nodes": {}, "edges": {}, "options": None, "large": False}
+        # Preview widgets (two QWebEngineViews and a matplotlib canvas) are built on first use
+        self.mermaid_view = None
+        self.interactive_view = None
+        self.static_canvas = None
+        self.shown_once = False
+        self.placing_shapes = False  # True while place_shapes moves many shapes at once
+        # The model the canvas shows: shapes/connectors are views of its nodes/edges, in the same order
+        self.diagram = Diagram()
+        self.row_shapes = []      # Diagram node row -> Shape (None once removed)
+        self.row_connectors = []  # Diagram edge row -> Connector (None once removed)
+        # Shapes and connectors that currently have graphics items (see update_visible_items)
+        self.drawn_shapes = set()
+        self.drawn_connectors = set()
+        self.drawing_everything = False  # Set by all_items_drawn
+        self.scene_rect_pinned = False   # The scene rect is set to the diagram bounds while virtual
 
-        self.autosave_file_path = Path(tempfile.gettempdir()) / self.AUTOSAVE_FILENAME
-        print(self.autosave_file_path)
+        # Each running designer autosaves into its own slot (keyed by project path, or by a
+        # session id while untitled), so concurrent instances never touch each other's files
+        self.autosave_dir = Path(tempfile.gettempdir()) / self.AUTOSAVE_DIRNAME
+        self.autosave_slot = None
         self.autosave_timer = QTimer(self)  
+        # Autosave only writes when model_revision moved past autosaved_revision. Snapshots are
+        # serialised and written on a single worker thread, so writes land in order
+        self.model_revision = 0       # Bumped on every edit (see refresh_preview/autosave_activity)
+        self.autosaved_revision = 0   # model_revision held by the autosave file (or the saved project)
+        self.autosave_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self.autosave_future = None
+        self.autosave_notifier = AutosaveNotifier()
+        self.autosave_notifier.finished.connect(self.on_autosave_finished)
+        # Loads and saves run on their own worker (see run_file_task)
+        self.file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-io")
+        self.file_task = None
+        # Every edit is also appended to a journal, so recovery = last snapshot + journal replay
+        self.journal = None
+        self.autosave_writes = {}  # Write ID -> (model revision, journal, seq) of a snapshot being written
+        self.autosave_write_id = 0
+        if headless:
+            self.journal = EditJournal(os.devnull)  # Never started, so it records nothing
+        else:
+            print(self.autosave_dir)
+            self.open_autosave_slot(None)
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.timeout.connect(self.flush_journal)
+        self.visible_items_timer = QTimer(self)
+        self.visible_items_timer.setSingleShot(True)
+        self.visible_items_timer.timeout.connect(self.update_visible_items)
 
         self.init_ui()
 
-        self.setup_autosave()        # Start the autosave timer
-        self.check_for_recovery()    # Check for lost work on startup
+        if not headless:
+            self.setup_autosave()        # Start the autosave timer
+            self.check_for_recovery()    # Check for lost work on startup
 
     def init_ui(self):
         self.setWindowTitle("Flowchart Designer")
@@ -401,6 +1691,8 @@ class FlowchartDesigner(QMainWindow):
         main_layout = QHBoxLayout(central_widget)
         splitter = QSplitter(Qt.Horizontal)
         main_layout.addWidget(splitter)
+        # Collapsing the preview panel pauses previews; reopening it catches up
+        splitter.splitterMoved.connect(self.render_visible_preview)
         
         # --- Left Panel - Controls (Simplified and Compact) ---
         left_panel = QWidget()
@@ -554,6 +1846,10 @@ class FlowchartDesigner(QMainWindow):
         self.graphics_view.setScene(self.scene)
         self.graphics_view.setRenderHint(QPainter.Antialiasing)
         self.graphics_view.setBackgroundBrush(QBrush(QColor(240, 240, 240)))
+        # Scrolling (and resizing, which changes the scroll ranges) brings other shapes into view
+        for scroll_bar in (self.graphics_view.horizontalScrollBar(), self.graphics_view.verticalScrollBar()):
+            scroll_bar.valueChanged.connect(self.schedule_visible_items)
+            scroll_bar.rangeChanged.connect(self.schedule_visible_items)
         canvas_layout.addWidget(self.graphics_view)
         
         # Add Canvas and Left Panel to splitter
@@ -571,9 +1867,19 @@ class FlowchartDesigner(QMainWindow):
         self.theme_combo = QComboBox()
         self.theme_combo.addItems(["default", "base", "dark", "forest"])
         self.theme_combo.setCurrentText("base")
-        self.theme_combo.currentTextChanged.connect(self.refresh_preview)
+        self.theme_combo.currentTextChanged.connect(self.on_theme_changed)
         theme_layout.addWidget(self.theme_combo)
         preview_controls_layout.addLayout(theme_layout)
+
+        static_layout_layout = QHBoxLayout()
+        static_layout_layout.addWidget(QLabel("Static Layout:"))
+        self.static_layout_combo = QComboBox()
+        # "canvas" reuses the designer positions; the others are force-directed and cached per topology
+        self.static_layout_combo.addItems(["canvas", "kamada_kawai", "spring"])
+        self.static_layout_combo.setCurrentText("canvas")
+        self.static_layout_combo.currentTextChanged.connect(lambda: self.invalidate_preview("static"))
+        static_layout_layout.addWidget(self.static_layout_combo)
+        preview_controls_layout.addLayout(static_layout_layout)
         
         preview_type_layout = QHBoxLayout()
         self.preview_group = QButtonGroup(self)
@@ -601,7 +1907,28 @@ class FlowchartDesigner(QMainWindow):
         self.pyvis_controls.setLayout(QVBoxLayout())
         self.physics_checkbox = QCheckBox("Enable Physics")
         self.physics_checkbox.setChecked(True)
+        self.physics_checkbox.toggled.connect(lambda: self.invalidate_preview("interactive"))
         self.pyvis_controls.layout().addWidget(self.physics_checkbox)
+
+        # Seeding with canvas positions lets physics start from (almost) settled positions
+        self.seed_positions_checkbox = QCheckBox("Seed with Canvas Positions")
+        self.seed_positions_checkbox.setChecked(True)
+        self.seed_positions_checkbox.toggled.connect(lambda: self.invalidate_preview("interactive"))
+        self.pyvis_controls.layout().addWidget(self.seed_positions_checkbox)
+
+        pyvis_form = QFormLayout()
+        self.stabilization_spin = QSpinBox()
+        self.stabilization_spin.setRange(0, 5000)
+        self.stabilization_spin.setValue(200)
+        self.stabilization_spin.valueChanged.connect(lambda: self.invalidate_preview("interactive"))
+        pyvis_form.addRow(QLabel("Stabilisation Iterations:"), self.stabilization_spin)
+        self.large_graph_spin = QSpinBox()
+        self.large_graph_spin.setRange(10, 1000000)
+        self.large_graph_spin.setValue(self.LARGE_GRAPH_NODE_THRESHOLD)
+        self.large_graph_spin.setToolTip("Above this many shapes physics is switched off and nearby shapes are clustered (double-click a cluster to open it).")
+        self.large_graph_spin.valueChanged.connect(lambda: self.invalidate_preview("interactive"))
+        pyvis_form.addRow(QLabel("Large-Graph Mode Above:"), self.large_graph_spin)
+        self.pyvis_controls.layout().addLayout(pyvis_form)
         preview_controls_layout.addWidget(self.pyvis_controls)
         self.pyvis_controls.setVisible(False) 
 
@@ -611,26 +1938,26 @@ class FlowchartDesigner(QMainWindow):
         preview_layout = QVBoxLayout(preview_container)
         self.preview_tabs = QTabWidget()
         
+        # Tab contents are filled in by ensure_preview_widget when a tab is first rendered
         self.mermaid_tab = QWidget()
-        mermaid_layout = QVBoxLayout(self.mermaid_tab)
-        self.mermaid_view = QWebEngineView()
-        mermaid_layout.addWidget(self.mermaid_view)
+        QVBoxLayout(self.mermaid_tab)
         self.preview_tabs.addTab(self.mermaid_tab, "Mermaid")
         
         self.interactive_tab = QWidget()
-        interactive_layout = QVBoxLayout(self.interactive_tab)
-        self.interactive_view = QWebEngineView()
-        interactive_layout.addWidget(self.interactive_view)
+        QVBoxLayout(self.interactive_tab)
         self.preview_tabs.addTab(self.interactive_tab, "Interactive")
         
         self.static_tab = QWidget()
-        static_layout = QVBoxLayout(self.static_tab)
-        self.static_canvas = FigureCanvas(matplotlib.figure.Figure(figsize=(8, 6)))
-        self.static_toolbar = NavigationToolbar(self.static_canvas, self)
-        static_layout.addWidget(self.static_toolbar)
-        static_layout.addWidget(self.static_canvas)
+        QVBoxLayout(self.static_tab)
+        self.static_cached_label = QLabel()
+        self.static_cached_label.setAlignment(Qt.AlignCenter)
+        self.static_cached_label.setToolTip("Cached preview: click to zoom and pan")
+        self.static_cached_label.mousePressEvent = self.show_live_static_preview
+        self.static_cached_label.hide()
+        self.static_tab.layout().addWidget(self.static_cached_label)
         self.preview_tabs.addTab(self.static_tab, "Static")
         
+        self.preview_tabs.currentChanged.connect(self.on_preview_tab_changed)
         preview_layout.addWidget(self.preview_tabs)
         right_layout.addWidget(preview_container)
         
@@ -640,6 +1967,16 @@ class FlowchartDesigner(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Ready. Select tool, add shapes, then connect. Double-click connectors to label.")
+        # Shown only while a load or save runs in the background
+        self.file_progress = QProgressBar()
+        self.file_progress.setRange(0, 100)
+        self.file_progress.setMaximumWidth(200)
+        self.file_progress.setVisible(False)
+        self.status_bar.addPermanentWidget(self.file_progress)
+        self.file_cancel_button = QPushButton("Cancel")
+        self.file_cancel_button.setVisible(False)
+        self.file_cancel_button.clicked.connect(self.cancel_file_task)
+        self.status_bar.addPermanentWidget(self.file_cancel_button)
         
         self.scene.selectionChanged.connect(self.on_selection_changed)
         
@@ -647,7 +1984,7 @@ class FlowchartDesigner(QMainWindow):
         self.graphics_view.mouseMoveEvent = self.on_view_mouse_move
         self.graphics_view.mouseReleaseEvent = self.on_view_mouse_release
         
-        self.refresh_preview()
+        self.refresh_preview()  # Only fills the code editor; previews render once the window is shown
         
         self.delete_action = QShortcut(QKeySequence(Qt.Key_Delete), self)
         self.delete_action.activated.connect(self.delete_selected_shape)
@@ -707,6 +2044,8 @@ class FlowchartDesigner(QMainWindow):
         
         self.clear_canvas_internal()
         self.current_file_path = None
+        self.open_autosave_slot(None)
+        self.delete_autosave_file()
         self.setWindowTitle("Flowchart Designer - Untitled")
         self.status_bar.showMessage("New project created")
         self.refresh_preview()
@@ -719,10 +2058,12 @@ class FlowchartDesigner(QMainWindow):
         
         if self.current_file_path:
             # Save to existing file
-            json_data = self.generate_json_data()
-            if self.save_json_data_to_file(json_data, self.current_file_path):
+            revision = self.model_revision
+            if self.save_project_file(self.current_file_path):
                 self.status_bar.showMessage(f"Project saved to {Path(self.current_file_path).name}")
-                self.delete_autosave_file()
+                self.open_autosave_slot(self.current_file_path)
+                self.delete_autosave_file(self.current_file_path)
+                self.autosaved_revision = revision  # The saved file covers it
                 return True
             return False
         else:
@@ -739,160 +2080,62 @@ class FlowchartDesigner(QMainWindow):
             self, 
             "Save Project As", 
             "flowchart.json", 
-            "JSON Project Files (*.json);;All Files (*)"
+            "JSON Project Files (*.json);;Compressed JSON Project Files (*.json.gz *.json.xz);;Binary Project Files (*.fcb);;All Files (*)"
         )
         
         if file_path:
-            json_data = self.generate_json_data()
-            if self.save_json_data_to_file(json_data, file_path):
+            revision = self.model_revision
+            if self.save_project_file(file_path):
                 self.current_file_path = file_path
                 self.setWindowTitle(f"Flowchart Designer - {Path(file_path).name}")
                 self.status_bar.showMessage(f"Project saved to {Path(file_path).name}")
-                self.delete_autosave_file()
+                self.open_autosave_slot(file_path)
+                self.delete_autosave_file(file_path)
+                self.autosaved_revision = revision  # The saved file covers it
                 return True
         
         return False
-    # Regex to capture: ID, shape definition part
-    NODE_DEFINITION_PATTERN = re.compile(r'^\s*(\w+)\s*(?:\s*(.+?))?\s*$') 
-
-    # Regex to capture connection parts
-    CONN_PATTERN = re.compile(r'^\s*(\w+)(?:.*?)\s*[-=]+>\s*(?:\|(.*?)\|)?\s*(\w+)\s*(?:.*?)\s*$')
-
-
-    def parse_definition(self, mermaid_id, full_def):
-        text = mermaid_id
-        shape_type = 'rectangle' # Default
-        
-        # Helper function to strip quotes from a string if present
-        def strip_quotes(s):
-            s = s.strip()
-            if s.startswith('"') and s.endswith('"'):
-                return s[1:-1].strip()
-            return s.strip()
-
-        if full_def.startswith('((') and full_def.endswith('))'):
-            shape_type = 'ellipse'
-            text = strip_quotes(full_def[2:-2])
-        elif full_def.startswith('(') and full_def.endswith(')'):
-            shape_type = 'start_end'
-            text = strip_quotes(full_def[1:-1])
-        elif full_def.startswith('{') and full_def.endswith('}'):
-            shape_type = 'diamond'
-            text = strip_quotes(full_def[1:-1])
-        elif full_def.startswith('[') and full_def.endswith(']'):
-            if full_def.startswith('[/') and full_def.endswith('/]'):
-                shape_type = 'input_output'
-                # FIX: Use the new robust quote stripping logic here
-                text = strip_quotes(full_def[2:-2])
-            else:
-                shape_type = 'rectangle'
-                text = strip_quotes(full_def[1:-1])
-        elif full_def.startswith('["') and full_def.endswith('"]'): 
-            shape_type = 'rectangle'
-            text = full_def[2:-2].strip() # Text is already quoted, strip the outer ["]
-
-        # If after parsing the text is empty, fall back to the ID
-        return text if text else mermaid_id, shape_type
-
-
-    def parse_mermaid_to_gui(self, mermaid_code: str):
+    def parse_mermaid_to_gui(self, mermaid_code: str, layout=True):
         # Disconnect signal to prevent immediate refresh_preview call during auto_layout
         try:
             self.scene.selectionChanged.disconnect(self.on_selection_changed)
         except TypeError:
             pass 
         
-        self.scene.clear()
-        self.shapes = []
-        self.connectors = []
-        node_defs = {} 
-        connections = [] 
-        
-        lines = [line.strip() for line in mermaid_code.split('\n') if line.strip() and not line.strip().startswith('%')]
-        
-        if not lines or not re.match(r'^flowchart\s+(TD|LR)', lines[0], re.I):
-            QMessageBox.warning(self, "Parse Warning", "Mermaid file must start with 'flowchart TD' or 'flowchart LR'.")
-            self.scene.selectionChanged.connect(self.on_selection_changed)
-            self.refresh_preview()
-            return
-        
-        # Pass 1: Collect ALL node definitions and connections
-        for line in lines[1:]:
-            
-            conn_match = self.CONN_PATTERN.match(line)
-            
-            if conn_match:
-                start_id = conn_match.group(1).strip()
-                label = conn_match.group(2).strip() if conn_match.group(2) else ""
-                end_id = conn_match.group(3).strip()
-                connections.append((start_id, end_id, label))
-            
-            # Check for explicit node definitions on the line (NOT in connections)
-            if not conn_match: 
-                def_match = self.NODE_DEFINITION_PATTERN.match(line)
-                if def_match:
-                    mermaid_id = def_match.group(1).strip()
-                    full_def = def_match.group(2) if def_match.group(2) else f"[{mermaid_id}]" 
-                    text, shape_type = self.parse_definition(mermaid_id, full_def)
-                    text = text.replace('\\n', '\n')
-                    node_defs[mermaid_id] = {'text': text, 'type': shape_type}
-            else:
-                # FIX: Only extract inline definitions from the START and END of connections
-                # Don't try to extract from the middle (labels) or from within text content
-                
-                # Extract start node definition if present
-                start_inline_match = re.match(r'^(\w+)([()\[{}\[\]/]+.+?[)\]{}\/]+)', line.split('-->')[0].strip())
-                if start_inline_match:
-                    mermaid_id = start_inline_match.group(1).strip()
-                    full_def = start_inline_match.group(2).strip()
-                    if mermaid_id not in node_defs:
-                        text, shape_type = self.parse_definition(mermaid_id, full_def)
-                        text = text.replace('\\n', '\n')
-                        node_defs[mermaid_id] = {'text': text, 'type': shape_type}
-                
-                # Extract end node definition if present
-                # Split by --> and get the last part (after optional label)
-                arrow_parts = line.split('-->')
-                if len(arrow_parts) > 1:
-                    end_part = arrow_parts[-1].strip()
-                    # Remove label if present (anything between | |)
-                    end_part = re.sub(r'\|.*?\|', '', end_part).strip()
-                    
-                    end_inline_match = re.match(r'^(\w+)([()\[{}\[\]/]+.+?[)\]{}\/]+)', end_part)
-                    if end_inline_match:
-                        mermaid_id = end_inline_match.group(1).strip()
-                        full_def = end_inline_match.group(2).strip()
-                        if mermaid_id not in node_defs:
-                            text, shape_type = self.parse_definition(mermaid_id, full_def)
-                            text = text.replace('\\n', '\n')
-                            node_defs[mermaid_id] = {'text': text, 'type': shape_type}
-
-        # Pass 2: Create Shapes for all used IDs
-        shape_id_map = {}
-        for i, (mermaid_id, def_data) in enumerate(node_defs.items()):
-            text = def_data.get('text', mermaid_id)
-            shape_type = def_data.get('type', 'rectangle')
-            
-            new_shape = Shape(self.scene, shape_type, 0, 0, text=text, shape_id=str(uuid.uuid4()))
+        with self.bulk_load():
+            self.scene.clear()
+            self.reset_diagram_state()
+
+            try:
+                diagram = parse_mermaid(mermaid_code)
+            except MermaidSyntaxError as e:
+                self.scene.selectionChanged.connect(self.on_selection_changed)
+                self.refresh_preview()
+                self.show_warning("Parse Warning", str(e))
+                return
+
+            # Shapes for the parsed nodes (which keep their Mermaid IDs), then the connectors; they
+            # are drawn once laid out (see update_visible_items)
+            shape_map = {}
+            for node in diagram.nodes.values():
+                new_shape = Shape(self.scene, node.type, text=node.label, short_id=node.id)
             
-            # Auto-resize after creating the shape
-            new_shape.auto_resize_to_fit_text(padding=30)
+                # Auto-resize after creating the shape
+                new_shape.auto_resize_to_fit_text(padding=30)
             
-            self.shapes.append(new_shape)
-            shape_id_map[mermaid_id] = new_shape
+                self.add_shape(new_shape, draw=False)
+                shape_map[node.id] = new_shape
 
-        # Pass 3: Create Connectors
-        for start_id, end_id, label in connections:
-            if start_id in shape_id_map and end_id in shape_id_map:
-                start_shape = shape_id_map[start_id]
-                end_shape = shape_id_map[end_id]
-                new_connector = Connector(start_shape, end_shape, self.scene, label=label)
-                self.connectors.append(new_connector)
+            for edge in diagram.edges:
+                self.add_connector(Connector(shape_map[edge.source.id], shape_map[edge.target.id], self.scene,
+                                             label=edge.label), draw=False)
 
-        if self.shapes:
-            self.auto_layout()
-        else:
-            QMessageBox.warning(self, "Load Warning", "Could not identify any shapes from the Mermaid code.")
+            if self.shapes:
+                if layout:
+                    self.auto_layout()
+            else:
+                self.show_warning("Load Warning", "Could not identify any shapes from the Mermaid code.")
+            self.update_visible_items()
 
         # Reconnect signal
         self.scene.selectionChanged.connect(self.on_selection_changed)
@@ -926,96 +2169,31 @@ class FlowchartDesigner(QMainWindow):
         if not self.shapes:
             return
         
-        # 1. Build a NetworkX graph
-        G = nx.DiGraph()
-        shape_map = {shape.id: shape for shape in self.shapes}
+        # Layers are computed on the model (see Diagram.layered_positions), then centred in the view
+        positions, (total_width, total_height) = self.diagram.layered_positions()
+        view_rect = self.graphics_view.viewport().rect()
+        offset_x = view_rect.width() / 2 - total_width / 2
+        offset_y = view_rect.height() / 2 - total_height / 2
+        positions = {node_id: (x + offset_x, y + offset_y) for node_id, (x, y) in positions.items()}
         
-        for shape in self.shapes:
-            G.add_node(shape.id)
-            
-        for connector in self.connectors:
-            G.add_edge(connector.start_shape.id, connector.end_shape.id)
-            
-        # 2. Use NetworkX to determine layers (a simplified topological sort)
-        try:
-            layers = {}
-            current_layer = 0
-            unlayered_nodes = set(G.nodes())
-            
-            while unlayered_nodes:
-                if current_layer == 0:
-                    layer_nodes = [n for n in unlayered_nodes if not list(G.predecessors(n))]
-                else:
-                    layer_nodes = [n for n in unlayered_nodes if all(p in layers and layers[p] < current_layer for p in G.predecessors(n))]
-                
-                if not layer_nodes:
-                    # Break if no more nodes can be placed (e.g., in case of cycles)
-                    break 
-
-                for node_id in layer_nodes:
-                    layers[node_id] = current_layer
-                
-                unlayered_nodes -= set(layer_nodes)
-                current_layer += 1
-                
-            # Fallback for remaining nodes (e.g., if there's a cycle)
-            for i, node_id in enumerate(unlayered_nodes):
-                layers[node_id] = current_layer + i 
-                
-        except Exception:
-            layers = {shape.id: i for i, shape in enumerate(self.shapes)}
-
-
-        # 3. Calculate Positions
-        H_SEP = 150 
-        V_SEP = 150 
-        NODE_W = 100
-        NODE_H = 60
-        
-        layer_width = {}
-        layer_nodes_list = {}
-        
-        # Calculate max layer index
-        max_layer_idx = max(layers.values()) if layers else 0
-        
-        for i in range(max_layer_idx + 1):
-            nodes_in_layer = sorted([n for n, l in layers.items() if l == i])
-            layer_nodes_list[i] = nodes_in_layer
-            layer_width[i] = len(nodes_in_layer) * H_SEP - H_SEP + NODE_W if nodes_in_layer else 0
-        
-        # Handle case where all nodes are unlayered due to cycles and are assigned high layers
-        if not layer_width and self.shapes:
-             layer_width[0] = len(self.shapes) * H_SEP - H_SEP + NODE_W
-             max_total_width = layer_width[0]
-        else:
-             max_total_width = max(layer_width.values()) if layer_width else NODE_W
-             
-        total_height = (max_layer_idx + 1) * V_SEP - V_SEP + NODE_H
-
-        view_rect = self.graphics_view.viewport().rect()
-        offset_x = view_rect.width() / 2 - max_total_width / 2
-        offset_y = view_rect.height() / 2 - total_height / 2
-        
-        for layer_idx, nodes_in_layer in layer_nodes_list.items():
-            num_nodes = len(nodes_in_layer)
-            
-            # Center the current layer horizontally
-            layer_content_width = (num_nodes - 1) * H_SEP + NODE_W if num_nodes > 0 else 0
-            start_x = (max_total_width - layer_content_width) / 2
-            
-            for i, node_id in enumerate(nodes_in_layer):
-                x = start_x + i * H_SEP 
-                y = layer_idx * V_SEP
-                
-                final_x = x + offset_x
-                final_y = y + offset_y
-                
-                shape_map[node_id].update_position(final_x, final_y)
-        
-        self.update_all_connectors() 
+        self.place_shapes(positions)
         self.status_bar.showMessage("Layered auto-layout applied.")
         self.refresh_preview()
 
+    def place_shapes(self, positions):
+        """Moves many shapes at once (short_id -> (x, y)). Connectors are updated once at the
+        end instead of after every single move; the caller refreshes the previews."""
+        self.placing_shapes = True
+        try:
+            for shape in self.shapes:
+                if shape.short_id in positions:
+                    shape.update_position(*positions[shape.short_id])
+                    self.mark_shape_changed(shape, moved=True)
+        finally:
+            self.placing_shapes = False
+        self.update_all_connectors()
+        self.update_visible_items()
+
     # --- Selected Shape Property Handlers ---
     def auto_resize_selected_shape(self):
         if self.selected_shape:
@@ -1031,6 +2209,7 @@ class FlowchartDesigner(QMainWindow):
             color = QColorDialog.getColor(self.selected_shape.color, self, "Choose Shape Color")
             if color.isValid():
                 self.selected_shape.color = color
+                self.mark_shape_changed(self.selected_shape)
                 self.selected_shape.graphics_item.visual_item.setBrush(QBrush(color))
                 self.selected_color_button.setStyleSheet(f"background-color: {color.name()}")
                 self.refresh_preview()
@@ -1042,12 +2221,14 @@ class FlowchartDesigner(QMainWindow):
             new_type = self.selected_type_combo.currentText()
             if new_type != self.selected_shape.type:
                 self.selected_shape.type = new_type
+                self.mark_shape_dirty(self.selected_shape)
                 self.selected_shape.draw_shape_visual() 
                 
             # Check for text change (from QPlainTextEdit)
             new_text = self.selected_text_input.toPlainText() # Get multiline text
             if new_text != self.selected_shape.text:
                 self.selected_shape.text = new_text
+                self.mark_shape_dirty(self.selected_shape)
                 
                 # Update the text item on the canvas immediately 
                 self.selected_shape.text_item.setPlainText(new_text)
@@ -1074,66 +2255,14 @@ class FlowchartDesigner(QMainWindow):
         if not file_path:
             return
 
-        # 1. Determine the bounding box of all items
-        scene_rect = self.scene.itemsBoundingRect()
-        # Add a small margin
-        margin = 20
-        scene_rect.setRect(
-            scene_rect.x() - margin, 
-            scene_rect.y() - margin, 
-            scene_rect.width() + 2 * margin, 
-            scene_rect.height() + 2 * margin
-        )
+        image_format = next((fmt for fmt in CANVAS_IMAGE_FORMATS if fmt.upper() in selected_filter), None)
+        if image_format is None:
+            QMessageBox.warning(self, "Export Failed", "Selected format is not supported for canvas export.")
+            return
 
         try:
-            painter = QPainter()
-
-            if "PNG" in selected_filter:
-                # Export as PNG
-                image = QImage(scene_rect.size().toSize(), QImage.Format_ARGB32)
-                image.fill(Qt.transparent)
-                
-                painter.begin(image)
-                painter.setRenderHint(QPainter.Antialiasing)
-                
-                # Translate painter so that scene_rect origin becomes (0,0) in the image
-                painter.translate(-scene_rect.x(), -scene_rect.y())
-                self.scene.render(painter, target=scene_rect, source=scene_rect)
-                painter.end()
-                
-                image.save(file_path, "PNG")
-
-            elif "SVG" in selected_filter:
-                # Export as SVG using QPainter
-                
-                generator = QSvgGenerator()
-                generator.setFileName(file_path)
-                generator.setSize(scene_rect.size().toSize())
-                generator.setViewBox(scene_rect)
-                
-                painter.begin(generator)
-                painter.setRenderHint(QPainter.Antialiasing)
-                self.scene.render(painter)
-                painter.end()
-
-            elif "JPG" in selected_filter:
-                # Export as PNG
-                image = QImage(scene_rect.size().toSize(), QImage.Format_ARGB32)
-                image.fill(Qt.white)
-                
-                painter.begin(image)
-                painter.setRenderHint(QPainter.Antialiasing)
-                
-                # Translate painter so that scene_rect origin becomes (0,0) in the image
-                painter.translate(-scene_rect.x(), -scene_rect.y())
-                self.scene.render(painter, target=scene_rect, source=scene_rect)
-                painter.end()
-                
-                image.save(file_path, "JPG")    
-            else:
-                QMessageBox.warning(self, "Export Failed", "Selected format is not supported for canvas export.")
-                return
-
+            with self.all_items_drawn():
+                render_scene_image(self.scene, file_path, image_format)
             QMessageBox.information(self, "Export Successful", f"Design Canvas exported to:\n{file_path}")
 
         except Exception as e:
@@ -1145,7 +2274,8 @@ class FlowchartDesigner(QMainWindow):
             return
 
         self.preview_tabs.setCurrentIndex(0)
-        self.refresh_preview() 
+        self.ensure_preview_widget("mermaid")
+        self.render_visible_preview()
         
         file_path, filter_name = QFileDialog.getSaveFileName(
             self, "Export Mermaid Plot as Image", "flowchart_mermaid.png", "PNG Image (*.png)"
@@ -1158,82 +2288,384 @@ class FlowchartDesigner(QMainWindow):
         self.mermaid_view.grab().save(file_path)
         QMessageBox.information(self, "Export Successful", f"Mermaid plot exported to:\n{file_path}")
 
-    def generate_id_map(self):
-        """Creates a sequential ID map (UUID -> nodeN) for clean exports."""
-        id_map = {}
-        for i, shape in enumerate(self.shapes):
-            id_map[shape.id] = f"node{i}"
-        return id_map
-    
     def generate_mermaid_code(self):
-        if not self.shapes:
-            return "flowchart TD\n    %% No shapes on canvas"
-            
-        id_map = self.generate_id_map()
-        lines = ["flowchart TD"]
-        
-        def clean_text_for_mermaid_io(text):
-            """Strips quotes and excessive whitespace for Input/Output generation."""
-            t = text.strip()
-            if t.startswith('"') and t.endswith('"'):
-                t = t[1:-1].strip()
-            return t.replace('\n', '\\n')
-
-        shape_to_mermaid_map = {
-            "rectangle": lambda t: f"[\"{clean_text_for_mermaid_io(t)}\"]", # Explicitly quote for safety
-            "diamond": lambda t: f"{{\"{clean_text_for_mermaid_io(t)}\"}}", 
-            "ellipse": lambda t: f"((\"{clean_text_for_mermaid_io(t)}\"))",
-            "start_end": lambda t: f"(\"{clean_text_for_mermaid_io(t)}\")",
-            # FIX: Use the cleaned text helper for Input/Output generation
-            "input_output": lambda t: f"[/\"{clean_text_for_mermaid_io(t)}\"/]",
-        }
-        
-        for shape in self.shapes:
-            node_id = id_map[shape.id]
-            # Escape inner quotes for Mermaid
-            # text_label = shape.text.replace('"', '"') 
-            text_label = shape.text.replace('\n', '\n') 
-
-            syntax_func = shape_to_mermaid_map.get(shape.type, shape_to_mermaid_map["rectangle"])
-            mermaid_syntax = node_id + syntax_func(text_label)
-            lines.append(f"    {mermaid_syntax}")
-            
-        for connector in self.connectors:
-            id1 = id_map[connector.start_shape.id]
-            id2 = id_map[connector.end_shape.id]
-            
-            # The standard labeled connector format is -->|label|
-            label_part = f"|{connector.label}|" if connector.label else ""
-            lines.append(f"    {id1} -->{label_part} {id2}")
-        
-        return "\n".join(lines)
+        """Assembles the Mermaid code from per-element cached lines (see MermaidCodeCache)."""
+        return self.mermaid_cache.generate(self.shapes, self.connectors)
+
+    # --- Change Tracking ---
+
+    def mark_shape_dirty(self, shape):
+        """Call after a shape's text or type changed."""
+        self.mermaid_cache.invalidate_node(shape)
+        self.mark_shape_changed(shape)
+
+    def mark_shape_changed(self, shape, moved=False):
+        """Call after a shape's position, size or colour changed (journaled, coalesced);
+        moved=True when only its position changed."""
+        self.journal.touch_shape(shape, moved)
+        if not self.journal_timer.isActive():
+            self.journal_timer.start(self.JOURNAL_FLUSH_MS)
+        if self.virtual_canvas:
+            self.schedule_visible_items()  # It may have moved into or out of the visible region
+
+    def mark_connector_dirty(self, connector):
+        """Call after a connector's label changed."""
+        self.mermaid_cache.invalidate_edge(connector)
+        self.journal.record("relabel_connection", index=self.connector_index(connector), label=connector.label)
+
+    def mark_structure_dirty(self):
+        """Call after shapes or connectors were added, removed or replaced."""
+        self.structure_revision += 1
+        self.mermaid_cache.invalidate_structure()
+
+    def topology_hash(self):
+        """Hash of the node/edge structure only (positions, labels and colours are ignored).
+        Built from short IDs, so it is stable across sessions and usable as a disk cache key."""
+        revision, cached_hash = self.topology_hash_cache
+        if revision != self.structure_revision:
+            edges = {(c.start_shape.short_id, c.end_shape.short_id) for c in self.connectors}
+            cached_hash = RenderCache.make_key(sorted(shape.short_id for shape in self.shapes), sorted(edges))
+            self.topology_hash_cache = (self.structure_revision, cached_hash)
+        return cached_hash
+
+    # --- Diagram Model (shapes, connectors and their graph mirror) ---
+
+    def add_shape(self, shape, draw=True):
+        """Adds a shape to the diagram; draw=False leaves drawing it to a later
+        update_visible_items (bulk loads)."""
+        self.diagram.add(shape.node)  # Claims the shape's short ID
+        self.row_shapes.append(shape)
+        self.shapes[shape] = None
+        if draw and self.in_visible_region(QRectF(shape.x, shape.y, shape.width, shape.height)):
+            shape.draw()
+            self.drawn_shapes.add(shape)
+        if self._graph is not None:
+            self._graph.add_node(shape.short_id, shape=shape)
+        self.journal.record("add", node=shape_to_record(shape))
+        self.mark_structure_dirty()
+
+    def add_connector(self, connector, draw=True):
+        self.diagram.add_edge(connector.edge)
+        self.row_connectors.append(connector)
+        self.connectors[connector] = None
+        start, end = connector.start_shape.center_point(), connector.end_shape.center_point()
+        if draw and self.in_visible_region(QRectF(start, end).normalized().adjusted(-1, -1, 1, 1)):
+            connector.draw()
+            self.drawn_connectors.add(connector)
+        if self._graph is not None:
+            self.add_graph_edge(self._graph, connector)
+        self.journal.record("connect", connection=connector_to_record(connector))
+        self.mark_structure_dirty()
+
+    def connector_index(self, connector):
+        """Position of the connector in the project's connection list (journal records use it):
+        the live edge rows before its row, counted over the alive flags at C speed."""
+        return self.diagram.edge_alive.count(1, 0, connector.edge.row)
+
+    def remove_connector(self, connector):
+        connector.release()
+        self.drawn_connectors.discard(connector)
+        self.row_connectors[connector.edge.row] = None
+        self.journal.record("disconnect", index=self.connector_index(connector))
+        del self.connectors[connector]
+        self.diagram.remove_edge(connector.edge)
+        if self._graph is not None:
+            u, v = connector.start_shape.short_id, connector.end_shape.short_id
+            edge_connectors = self._graph.edges[u, v]["connectors"]
+            edge_connectors.remove(connector)
+            if not edge_connectors:
+                self._graph.remove_edge(u, v)
+        self.mark_structure_dirty()
+
+    def remove_shape(self, shape):
+        """Removes the shape and every connector attached to it."""
+        for row in self.diagram.edge_rows_of(shape.node):
+            self.remove_connector(self.row_connectors[row])
+        shape.release()
+        self.drawn_shapes.discard(shape)
+        self.row_shapes[shape.node.row] = None
+        del self.shapes[shape]
+        self.diagram.remove_node(shape.node)
+        if self._graph is not None:
+            self._graph.remove_node(shape.short_id)
+        self.journal.record("delete", id=shape.short_id)
+        self.mark_structure_dirty()
+
+    @staticmethod
+    def add_graph_edge(graph, connector):
+        u, v = connector.start_shape.short_id, connector.end_shape.short_id
+        # Parallel connectors share one graph edge; the edge lives as long as one of them does
+        if graph.has_edge(u, v):
+            graph.edges[u, v]["connectors"].append(connector)
+        else:
+            graph.add_edge(u, v, connectors=[connector])
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            import networkx as nx
+            graph = nx.DiGraph()
+            graph.add_nodes_from((shape.short_id, {"shape": shape}) for shape in self.shapes)
+            for connector in self.connectors:
+                self.add_graph_edge(graph, connector)
+            self._graph = graph
+        return self._graph
+
+    def reset_diagram_state(self):
+        """Forgets all shapes and connectors (the caller is responsible for clearing the scene)."""
+        self.journal.record("clear")  # Flushes pending moves while the shapes can still be read
+        self.shapes = {}
+        self.connectors = {}
+        self._graph = None
+        # A new model: handles of the old shapes and connectors keep pointing at the old one
+        self.diagram = Diagram()
+        self.row_shapes = []
+        self.row_connectors = []
+        self.drawn_shapes = set()
+        self.drawn_connectors = set()
+        self.selected_shape = None
+        self.connection_start_shape = None
+        self.selected_props_group.setVisible(False)
+        if self.scene_rect_pinned:
+            self.scene.setSceneRect(QRectF())
+            self.scene_rect_pinned = False
+        self.mark_structure_dirty()
+
+    # --- Visible Region ---
+
+    @property
+    def virtual_canvas(self):
+        """True when only shapes and connectors in (or near) the visible region of the canvas
+        get graphics items. Small diagrams and headless designers draw everything."""
+        return (not self.headless and not self.drawing_everything
+                and len(self.shapes) > self.VIRTUAL_CANVAS_THRESHOLD)
+
+    def visible_region(self):
+        """The viewport in scene coordinates, grown by VISIBLE_REGION_MARGIN."""
+        margin = self.VISIBLE_REGION_MARGIN
+        rect = self.graphics_view.mapToScene(self.graphics_view.viewport().rect()).boundingRect()
+        return rect.adjusted(-margin, -margin, margin, margin)
+
+    def in_visible_region(self, rect):
+        return not self.virtual_canvas or self.visible_region().intersects(rect)
+
+    def schedule_visible_items(self):
+        if not self.visible_items_timer.isActive():
+            self.visible_items_timer.start(self.VISIBLE_ITEMS_DELAY_MS)
+
+    def update_visible_items(self):
+        """Builds the graphics items of the shapes and connectors in the visible region and drops
+        those of all others, so a huge diagram only costs Qt items (memory and paint time) for
+        what can be seen. The region is looked up in the diagram's coordinate columns."""
+        if self.virtual_canvas:
+            rect = self.visible_region()
+            region = (rect.left(), rect.top(), rect.right(), rect.bottom())
+            shapes = {self.row_shapes[row] for row in self.diagram.node_rows_in(*region)}
+            shapes.update(shape for shape in (self.selected_shape, self.connection_start_shape) if shape)
+            connectors = {self.row_connectors[row] for row in self.diagram.edge_rows_in(*region)}
+            # Undrawn shapes do not extend the scene, so its rect has to cover the whole diagram
+            left, top, right, bottom = self.diagram.bounds()
+            margin = self.VISIBLE_REGION_MARGIN
+            self.scene.setSceneRect(QRectF(left - margin, top - margin, right - left + 2 * margin,
+                                           bottom - top + 2 * margin))
+            self.scene_rect_pinned = True
+        else:
+            shapes, connectors = set(self.shapes), set(self.connectors)
+            if self.scene_rect_pinned:
+                self.scene.setSceneRect(QRectF())  # Back to growing with the items
+                self.scene_rect_pinned = False
+
+        for shape in self.drawn_shapes - shapes:
+            shape.release()
+        for connector in self.drawn_connectors - connectors:
+            connector.release()
+        # New items are placed where their shapes already are; nothing moved, so nothing to update
+        placing_shapes, self.placing_shapes = self.placing_shapes, True
+        try:
+            for shape in shapes - self.drawn_shapes:
+                shape.draw()
+        finally:
+            self.placing_shapes = placing_shapes
+        for connector in connectors - self.drawn_connectors:
+            connector.draw()
+        self.drawn_shapes, self.drawn_connectors = shapes, connectors
+
+    @contextmanager
+    def bulk_load(self):
+        """Builds a whole diagram without a journal record per shape and connector; the
+        journal restarts from the loaded state instead."""
+        self.journal.paused = True
+        try:
+            yield
+        finally:
+            self.journal.paused = False
+            self.journal.defer_reset(self.restart_journal)
+            if not self.journal_timer.isActive():
+                self.journal_timer.start(self.JOURNAL_FLUSH_MS)
+
+    @contextmanager
+    def all_items_drawn(self):
+        """Draws the whole diagram for the duration of the block (e.g. a canvas image export)."""
+        self.drawing_everything = True
+        try:
+            self.update_visible_items()
+            yield
+        finally:
+            self.drawing_everything = False
+            self.update_visible_items()
+
+    def graph_edge_label(self, u, v):
+        """Label of the first labelled connector behind the graph edge u -> v."""
+        return next((c.label for c in self.graph.edges[u, v]["connectors"] if c.label), "")
 
     def generate_mermaid_preview(self):
         mermaid_code = self.generate_mermaid_code()
         theme = self.theme_combo.currentText()
         
-        if not mermaid_code or "No shapes on canvas" in mermaid_code:
-            html_content = self._get_placeholder_html("Mermaid Preview", "No shapes to preview. Add some shapes to the canvas.")
-            self.mermaid_view.setHtml(html_content)
+        self.push_mermaid_render(mermaid_code if self.shapes else None, theme)
+
+    def push_mermaid_render(self, mermaid_code, theme):
+        """Re-renders only the diagram element of the persistent Mermaid page.
+        A None code shows the empty-canvas placeholder instead."""
+        if self.mermaid_page_state != "ready":
+            self.mermaid_pending_render = (mermaid_code, theme)
+            if self.mermaid_page_state == "unloaded":
+                self.load_mermaid_page()
+            return
+
+        if self.mermaid_rendered == (mermaid_code, theme):
+            return
+        self.mermaid_rendered = (mermaid_code, theme)
+        if mermaid_code is None:
+            script = f"showMessage({json.dumps('No shapes to preview. Add some shapes to the canvas.')});"
+            self.mermaid_view.page().runJavaScript(script)
+            return
+
+        # The page caches rendered SVGs per (code hash, theme), so flipping back is instant;
+        # the disk cache does the same across sessions
+        code_hash = hashlib.sha1(mermaid_code.encode("utf-8")).hexdigest()
+        cache_key = RenderCache.make_key("mermaid", code_hash, theme)
+        cached_svg = self.render_cache.read_text(cache_key, "svg")
+        if cached_svg is not None:
+            script = f"showSvg({json.dumps(cached_svg)}, {json.dumps(theme)}, {json.dumps(code_hash)});"
+            self.mermaid_view.page().runJavaScript(script)
+            return
+
+        def store_svg(svg):
+            if svg:
+                self.render_cache.write_text(cache_key, "svg", svg)
+
+        script = f"renderDiagram({json.dumps(mermaid_code)}, {json.dumps(theme)}, {json.dumps(code_hash)});"
+        self.mermaid_view.page().runJavaScript(script, store_svg)
+
+    def on_theme_changed(self, theme):
+        """Re-themes the already loaded Mermaid page; the code and other previews are untouched."""
+        if self.get_current_preview_type() != "mermaid" or not self.previews_visible():
+            self.invalidate_preview("mermaid")
             return
+        if self.mermaid_pending_render is not None:
+            self.mermaid_pending_render = (self.mermaid_pending_render[0], theme)
+        elif self.mermaid_rendered is not None:
+            self.push_mermaid_render(self.mermaid_rendered[0], theme)
+        else:
+            self.generate_mermaid_preview()
+
+    def load_mermaid_page(self):
+        runtime_path = MERMAID_RUNTIME_DIR / MERMAID_RUNTIME_FILE
+        if runtime_path.exists():
+            # Relative script src resolved against the vendor folder: no network needed
+            runtime_src = MERMAID_RUNTIME_FILE
+        else:
+            runtime_src = MERMAID_CDN_URL
+            self.status_bar.showMessage(f"No local Mermaid runtime in {MERMAID_RUNTIME_DIR}, loading it from the CDN.")
+
+        self.ensure_preview_widget("mermaid")
+        self.mermaid_page_state = "loading"
+        self.mermaid_rendered = None
+        self.mermaid_view.loadFinished.connect(self.on_mermaid_page_loaded)
+        self.mermaid_view.setHtml(self._get_mermaid_page_html(runtime_src),
+                                  QUrl.fromLocalFile(str(MERMAID_RUNTIME_DIR) + os.sep))
 
-        html_content = f"""
+    def on_mermaid_page_loaded(self, ok):
+        self.mermaid_view.loadFinished.disconnect(self.on_mermaid_page_loaded)
+        self.mermaid_page_state = "ready"
+        if self.mermaid_pending_render is not None:
+            mermaid_code, theme = self.mermaid_pending_render
+            self.mermaid_pending_render = None
+            self.push_mermaid_render(mermaid_code, theme)
+
+    def _get_mermaid_page_html(self, runtime_src):
+        return f"""
         <!DOCTYPE html>
         <html>
         <head>
             <meta charset="utf-8">
             <title>Mermaid Preview</title>
-            <script src="https://cdn.jsdelivr.net/npm/mermaid@9.1.7/dist/mermaid.min.js"></script>
+            <script src="{runtime_src}"></script>
             <script>
-                mermaid.initialize({{ 
-                    startOnLoad: true, 
-                    theme: '{theme}', 
-                    flowchart: {{
-                        useMaxWidth: true,
-                        htmlLabels: true,
-                        curve: 'basis'
+                var renderCount = 0;
+                var svgCache = new Map();  // theme + ':' + code hash -> svg, oldest first
+                var SVG_CACHE_SIZE = 16;
+
+                // Returns the SVG markup (so Python can store it) or null on failure
+                function renderDiagram(code, theme, codeHash) {{
+                    var cacheKey = theme + ':' + codeHash;
+                    if (svgCache.has(cacheKey)) {{
+                        return showSvg(svgCache.get(cacheKey), theme, codeHash);
+                    }}
+                    if (typeof mermaid === 'undefined') {{
+                        showError('Mermaid runtime could not be loaded.');
+                        return null;
+                    }}
+                    mermaid.initialize({{ 
+                        startOnLoad: false, 
+                        theme: theme, 
+                        flowchart: {{
+                            useMaxWidth: true,
+                            htmlLabels: true,
+                            curve: 'basis'
+                        }}
+                    }});
+                    var renderId = 'flowchart' + (++renderCount);
+                    var rendered = null;
+                    try {{
+                        // Mermaid 9 calls back synchronously
+                        mermaid.render(renderId, code, function (svg) {{
+                            rendered = showSvg(svg, theme, codeHash);
+                        }});
+                    }} catch (error) {{
+                        // A failed render leaves its scratch element behind
+                        var scratch = document.getElementById('d' + renderId);
+                        if (scratch) scratch.remove();
+                        showError(String(error.str || error.message || error));
+                    }}
+                    return rendered;
+                }}
+
+                function showSvg(svg, theme, codeHash) {{
+                    var container = document.getElementById('diagram');
+                    container.className = 'diagram';
+                    container.innerHTML = svg;
+                    var cacheKey = theme + ':' + codeHash;
+                    svgCache.delete(cacheKey);
+                    svgCache.set(cacheKey, svg);
+                    if (svgCache.size > SVG_CACHE_SIZE) {{
+                        svgCache.delete(svgCache.keys().next().value);
                     }}
-                }});
+                    return svg;
+                }}
+
+                function showMessage(message) {{
+                    var container = document.getElementById('diagram');
+                    container.className = 'placeholder';
+                    container.textContent = message;
+                }}
+
+                function showError(message) {{
+                    var container = document.getElementById('diagram');
+                    container.className = 'error';
+                    container.textContent = message;
+                }}
             </script>
             <style>
                 body {{
@@ -1242,23 +2674,19 @@ class FlowchartDesigner(QMainWindow):
                     background: white;
                     font-family: Arial, sans-serif;
                 }}
-                .mermaid {{
+                .diagram {{
                     text-align: center;
                     display: block; 
                 }}
+                .placeholder {{ text-align: center; color: #666; font-size: 18px; margin-top: 40vh; }}
+                .error {{ text-align: center; color: #d32f2f; font-size: 16px; padding: 20px; background: #ffebee; border: 1px solid #f44336; border-radius: 5px; white-space: pre-wrap; }}
             </style>
         </head>
         <body>
-            <div class="mermaid">
-{mermaid_code}
-            </div>
+            <div id="diagram" class="diagram"></div>
         </body>
         </html>
         """
-        
-        temp_dir = tempfile.gettempdir()
-        self.mermaid_view.setHtml(html_content, QUrl.fromLocalFile(os.path.join(temp_dir, "temp.html")))
-        self.preview_tabs.setCurrentIndex(0)
     
     def gui_to_mermaid_save(self):
         mermaid_code = self.generate_mermaid_code()
@@ -1278,30 +2706,26 @@ class FlowchartDesigner(QMainWindow):
                 QMessageBox.critical(self, "Export Error", f"Failed to save file: {e}")
     
     def generate_json_data(self):
-        """Generates the dictionary structure of the current project state."""
-        data = {"nodes": [], "connections": []}
-        id_map = self.generate_id_map()
-        
-        for shape in self.shapes:
-            data["nodes"].append({
-                "id": id_map[shape.id],
-                "label": shape.text,
-                "type": shape.type,
-                "x": shape.x,
-                "y": shape.y,
-                "width": shape.width,
-                "height": shape.height,
-                "color": shape.color.name()
-            })
+        """Generates the JSON text of the current project state."""
+        text = io.StringIO()
+        write_project_json(text, self.iter_shape_records(), self.iter_connector_records())
+        return text.getvalue()
 
-        for connector in self.connectors:
-            data["connections"].append({
-                "start_id": id_map[connector.start_shape.id],
-                "end_id": id_map[connector.end_shape.id],
-                "label": connector.label
-            })
-        
-        return json.dumps(data, indent=2)
+    def iter_shape_records(self):
+        return (shape_to_record(shape) for shape in self.shapes)
+
+    def iter_connector_records(self):
+        return (connector_to_record(connector) for connector in self.connectors)
+
+    def project_data(self):
+        """Plain-dict snapshot of the project; it shares nothing with the live Qt objects,
+        so it can be serialised off the GUI thread."""
+        return self.diagram.to_project()
+
+    def project_snapshot(self):
+        """Copy of the diagram's packed columns: a snapshot for saving off the GUI thread that
+        costs a fraction of project_data (the records are made from it while writing)."""
+        return self.diagram.copy()
 
     def gui_to_json_save(self):
         '''Legacy export method - now uses save_project_as.'''
@@ -1316,8 +2740,18 @@ class FlowchartDesigner(QMainWindow):
     def on_preview_type_changed(self):
         radio = self.preview_group.checkedButton()
         preview_type = radio.preview_type if radio else "mermaid"
+        # The radio buttons and the tabs select the same thing; the tab change does the rendering
+        self.preview_tabs.setCurrentIndex(self.PREVIEW_TAB_TYPES.index(preview_type))
+
+    def on_preview_tab_changed(self, index):
+        preview_type = self.PREVIEW_TAB_TYPES[index]
+        for radio in self.preview_group.buttons():
+            if radio.preview_type == preview_type and not radio.isChecked():
+                radio.blockSignals(True)
+                radio.setChecked(True)
+                radio.blockSignals(False)
         self.pyvis_controls.setVisible(preview_type == "interactive")
-        self.refresh_preview()
+        self.render_visible_preview()
 
     def on_tool_changed(self):
         self.clear_temp_connection()
@@ -1364,6 +2798,12 @@ class FlowchartDesigner(QMainWindow):
                     
                     return 
     
+    def show_warning(self, title, message):
+        """QMessageBox.warning, except when headless, where nobody could dismiss the box."""
+        if self.headless:
+            raise ConversionError(message)
+        QMessageBox.warning(self, title, message)
+
     def clear_canvas_internal(self):
         # Disconnect and clear without the user prompt for internal use (like sync_mermaid_to_gui)
         try:
@@ -1372,10 +2812,7 @@ class FlowchartDesigner(QMainWindow):
             pass 
             
         self.scene.clear()
-        self.shapes = []
-        self.connectors = []
-        self.selected_shape = None
-        self.selected_props_group.setVisible(False)
+        self.reset_diagram_state()
         self.mermaid_code_editor.setPlainText("flowchart TD\n    %% No shapes on canvas")
         
         self.scene.selectionChanged.connect(self.on_selection_changed)
@@ -1392,76 +2829,83 @@ class FlowchartDesigner(QMainWindow):
     def load_project_file(self):
         file_path, filter_name = QFileDialog.getOpenFileName(
             self, "Load Flowchart Project", "", 
-            "JSON Project Files (*.json);;Mermaid Files (*.mmd *.txt);;All Files (*)"
+            "JSON Project Files (*.json);;Compressed JSON Project Files (*.json.gz *.json.xz);;Binary Project Files (*.fcb);;Mermaid Files (*.mmd *.txt);;All Files (*)"
         )
         if not file_path:
             return
         
+        # Reading and parsing run on the file worker; the current diagram stays until the
+        # parsed model is handed back, and the scene is then built in one go
+        self.graphics_view.setEnabled(False)
+        try:
+            payload = self.run_file_task(f"Loading {Path(file_path).name}...", read_project_file, file_path)
+        except FileTaskCancelled:
+            self.status_bar.showMessage("Load cancelled.")
+            return
+        except Exception as e:
+            QMessageBox.critical(self, "Load Error", f"Failed to load file: {e}")
+            return
+        finally:
+            self.graphics_view.setEnabled(True)
+
         self.clear_canvas_internal()
 
         try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-            
-            if file_path.lower().endswith('.json'):
-                self.parse_json_to_gui(content)
-                self.current_file_path = file_path  # Set current file for JSON
-                self.setWindowTitle(f"Flowchart Designer - {Path(file_path).name}")
-            elif file_path.lower().endswith(('.mmd', '.txt')):
-                self.parse_mermaid_to_gui(content)
+            if isinstance(payload, str):
+                self.parse_mermaid_to_gui(payload)
                 self.current_file_path = None  # Mermaid files need Save As
                 self.setWindowTitle("Flowchart Designer - Untitled")
+            else:
+                self.load_project_records(*project_records(payload))
+                self.current_file_path = file_path
+                self.setWindowTitle(f"Flowchart Designer - {Path(file_path).name}")
             
             self.status_bar.showMessage(f"Project loaded from {Path(file_path).name}")
+            # The loaded file is the new baseline: autosave into its slot, journal from here
+            self.open_autosave_slot(self.current_file_path)
+            self.delete_autosave_file(self.current_file_path)
 
         except Exception as e:
             QMessageBox.critical(self, "Load Error", f"Failed to load file: {e}")
             self.clear_canvas_internal()
             self.refresh_preview()
 
-    def parse_json_to_gui(self, json_data: str):
+    def parse_json_to_gui(self, json_data: str, layout=True):
         data = json.loads(json_data)
-        self.shapes = []
-        self.connectors = []
-        shape_id_map = {}
-        
-        for node_data in data.get("nodes", []):
-            color = QColor(node_data.get("color", "#ADD8E6")) 
-            
-            new_shape = Shape(
-                self.scene,
-                node_data.get("type", "rectangle"),
-                node_data.get("x", 100),
-                node_data.get("y", 100),
-                width=node_data.get("width", 100),
-                height=node_data.get("height", 60),
-                text=node_data.get("label", "Node"),
-                shape_id=str(uuid.uuid4()), 
-                color=color
-            )
-            self.shapes.append(new_shape)
-            shape_id_map[node_data.get("id")] = new_shape 
+        self.load_project_records(data.get("nodes", []), data.get("connections", []), layout)
+
+    def load_project_records(self, nodes, connections, layout=True):
+        """Builds the diagram from node and connection records (JSON project layout)."""
+        with self.bulk_load():
+            self.reset_diagram_state()
+            shape_id_map = {}
+        
+            for node_data in nodes:
+                new_shape = Shape(self.scene, node=Node.from_record(node_data))
+                self.add_shape(new_shape, draw=False)
+                shape_id_map[node_data.get("id")] = new_shape 
             
-        for conn_data in data.get("connections", []):
-            start_id = conn_data.get("start_id")
-            end_id = conn_data.get("end_id")
-            label = conn_data.get("label", "")
+            for conn_data in connections:
+                start_id = conn_data.get("start_id")
+                end_id = conn_data.get("end_id")
+                label = conn_data.get("label", "")
             
-            if start_id in shape_id_map and end_id in shape_id_map:
-                start_shape = shape_id_map[start_id]
-                end_shape = shape_id_map[end_id]
-                new_connector = Connector(start_shape, end_shape, self.scene, label=label)
-                self.connectors.append(new_connector)
+                if start_id in shape_id_map and end_id in shape_id_map:
+                    start_shape = shape_id_map[start_id]
+                    end_shape = shape_id_map[end_id]
+                    self.add_connector(Connector(start_shape, end_shape, self.scene, label=label), draw=False)
                 
-        if self.shapes:
-             self.auto_layout()
-        else:
-             QMessageBox.warning(self, "Load Warning", "JSON file is empty or formatted incorrectly.")
+            if self.shapes:
+                 if layout:
+                     self.auto_layout()
+            else:
+                 self.show_warning("Load Warning", "JSON file is empty or formatted incorrectly.")
+            self.update_visible_items()
         
         self.refresh_preview() # Final refresh after layout
              
     def update_all_connectors(self):
-        for connector in self.connectors:
+        for connector in self.drawn_connectors:
             connector.update_position()
             
     def delete_selected_shape(self):
@@ -1474,18 +2918,8 @@ class FlowchartDesigner(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
             shape_to_delete = self.selected_shape
-            
-            connectors_to_remove = [c for c in self.connectors if c.start_shape == shape_to_delete or c.end_shape == shape_to_delete]
-            for connector in connectors_to_remove:
-                self.scene.removeItem(connector)
-                if connector in self.connectors:
-                    self.connectors.remove(connector)
-
-            if shape_to_delete.graphics_item:
-                self.scene.removeItem(shape_to_delete.graphics_item)
-                self.scene.parent_widget.autosave_activity()
-            
-            self.shapes.remove(shape_to_delete)
+            self.remove_shape(shape_to_delete)
+            self.autosave_activity()
             self.selected_shape = None
             self.selected_props_group.setVisible(False) # Hide properties panel
             
@@ -1493,11 +2927,12 @@ class FlowchartDesigner(QMainWindow):
             self.refresh_preview()
             
     def get_current_preview_type(self):
-        radio = self.preview_group.checkedButton()
-        return radio.preview_type if radio else "mermaid"
+        return self.PREVIEW_TAB_TYPES[self.preview_tabs.currentIndex()]
         
     def refresh_preview(self):
-        preview_type = self.get_current_preview_type()
+        """Called after every diagram change: bumps the revision so all previews become stale."""
+        self.diagram_revision += 1
+        self.model_revision += 1
         
         # NEW: Update the live editor on every refresh (GUI change)
         mermaid_code = self.generate_mermaid_code()
@@ -1505,6 +2940,27 @@ class FlowchartDesigner(QMainWindow):
         if self.mermaid_code_editor.toPlainText().strip() != mermaid_code.strip():
             self.mermaid_code_editor.setPlainText(mermaid_code)
         
+        self.render_visible_preview()
+
+    def invalidate_preview(self, preview_type):
+        """Marks one preview stale after one of its own options changed."""
+        self.preview_revisions[preview_type] = -1
+        self.render_visible_preview()
+
+    def previews_visible(self):
+        return (self.isVisible() and not self.isMinimized()
+                and self.preview_tabs.isVisible() and not self.preview_tabs.visibleRegion().isEmpty())
+
+    def render_visible_preview(self):
+        """Renders the visible preview tab, unless it already shows the current revision.
+        Nothing is rendered while the window is minimised or the preview panel is collapsed."""
+        if not self.previews_visible():
+            return
+        preview_type = self.get_current_preview_type()
+        if self.preview_revisions[preview_type] == self.diagram_revision:
+            return
+        self.preview_revisions[preview_type] = self.diagram_revision
+        
         # Update graphical previews
         if preview_type == "mermaid":
             self.generate_mermaid_preview()
@@ -1512,6 +2968,42 @@ class FlowchartDesigner(QMainWindow):
             self.generate_interactive_preview()
         elif preview_type == "static":
             self.generate_static_preview()
+
+    def ensure_preview_widget(self, preview_type):
+        """Builds the widget behind a preview tab the first time it is needed, importing
+        QtWebEngine or matplotlib's Qt backend at that point rather than at start-up."""
+        if preview_type == "mermaid" and self.mermaid_view is None:
+            from PyQt5.QtWebEngineWidgets import QWebEngineView
+            self.mermaid_view = QWebEngineView()
+            self.mermaid_tab.layout().addWidget(self.mermaid_view)
+        elif preview_type == "interactive" and self.interactive_view is None:
+            from PyQt5.QtWebEngineWidgets import QWebEngineView
+            self.interactive_view = QWebEngineView()
+            self.interactive_tab.layout().addWidget(self.interactive_view)
+        elif preview_type == "static" and self.static_canvas is None:
+            import matplotlib.figure
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+            from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+            self.static_canvas = FigureCanvas(matplotlib.figure.Figure(figsize=(8, 6)))
+            self.static_toolbar = NavigationToolbar(self.static_canvas, self)
+            self.static_tab.layout().addWidget(self.static_toolbar)
+            self.static_tab.layout().addWidget(self.static_canvas)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Previews are skipped until the window is first shown, and the first one waits until
+        # the canvas has painted so the window is usable while the preview widget is built
+        if self.shown_once:
+            QTimer.singleShot(0, self.render_visible_preview)
+        else:
+            self.shown_once = True
+            QTimer.singleShot(self.STARTUP_PREVIEW_DELAY_MS, self.render_visible_preview)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange and not self.isMinimized():
+            # Catch up on changes made while minimised
+            QTimer.singleShot(0, self.render_visible_preview)
             
     def find_shape_at_pos(self, scene_pos):
         items = self.scene.items(scene_pos)
@@ -1539,7 +3031,7 @@ class FlowchartDesigner(QMainWindow):
                     text=self.text_input.text(),
                     color=self.current_color
                 )
-                self.shapes.append(new_shape)
+                self.add_shape(new_shape)
                 self.refresh_preview()
         
         elif self.current_tool == "connector":
@@ -1570,8 +3062,7 @@ class FlowchartDesigner(QMainWindow):
             end_shape = self.find_shape_at_pos(scene_pos)
 
             if end_shape and end_shape != self.connection_start_shape:
-                new_connector = Connector(self.connection_start_shape, end_shape, self.scene)
-                self.connectors.append(new_connector)
+                self.add_connector(Connector(self.connection_start_shape, end_shape, self.scene))
                 self.status_bar.showMessage(f"Connected {self.connection_start_shape.text} to {end_shape.text}")
                 self.refresh_preview()
             
@@ -1580,90 +3071,316 @@ class FlowchartDesigner(QMainWindow):
         QGraphicsView.mouseReleaseEvent(self.graphics_view, event)
         
     def generate_interactive_preview(self):
-        if not self.shapes:
-            html_content = self._get_placeholder_html("Interactive Preview", "No shapes to preview.")
-            self.interactive_view.setHtml(html_content)
-            return
+        """Brings the persistent vis-network page up to date by sending only node/edge deltas,
+        so edits neither reload the page nor restart the physics simulation."""
+        if self.interactive_page_state != "ready":
+            if self.interactive_page_state == "unloaded":
+                self.load_interactive_page()
+            return  # on_interactive_page_loaded sends the full state
         
         try:
-            from pyvis.network import Network
-            net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="black", directed=True, notebook=False, cdn_resources='remote')
-            net.toggle_physics(self.physics_checkbox.isChecked())
-            id_map = self.generate_id_map() 
+            large = len(self.shapes) > self.large_graph_spin.value()
+            nodes, edges = self.build_interactive_elements(large)
+            options = self.interactive_options(large)
+            sent = self.interactive_sent
+            delta = {
+                "nodes": self._diff_elements(sent["nodes"], nodes),
+                "edges": self._diff_elements(sent["edges"], edges),
+            }
+            if options != sent["options"]:
+                delta["options"] = options
+            if large:
+                # Regroup only when cluster membership can have changed; relabelling keeps the clusters
+                cells_changed = any(sent["nodes"][node["id"]].get("cid") != node.get("cid") for node in delta["nodes"]["update"])
+                if not sent["large"] or cells_changed or any(delta[kind][change] for kind in ("nodes", "edges") for change in ("add", "remove")):
+                    delta["clusters"] = True
+            elif sent["large"]:
+                delta["clusters"] = False
+            self.interactive_sent = {"nodes": nodes, "edges": edges, "options": options, "large": large}
 
-            for shape in self.shapes:
-                shape_map = {'rectangle': 'box', 'diamond': 'diamond', 'ellipse': 'ellipse', 'start_end': 'box', 'input_output': 'box'}
-                net.add_node(id_map[shape.id], label=shape.text, shape=shape_map.get(shape.type, 'box'),
-                    color=shape.color.name(), font={'size': 14}, margin=10)
-            
-            for connector in self.connectors:
-                net.add_edge(id_map[connector.start_shape.id], id_map[connector.end_shape.id], label=connector.label)
-
-            temp_path = Path(tempfile.gettempdir()) / "pyvis_temp.html"
-            net.save_graph(str(temp_path))
-            self.interactive_view.setUrl(QUrl.fromLocalFile(str(temp_path)))
-            self.preview_tabs.setCurrentIndex(1)
+            if "options" in delta or "clusters" in delta or any(delta[kind][change] for kind in ("nodes", "edges") for change in delta[kind]):
+                self.interactive_view.page().runJavaScript(f"applyDelta({json.dumps(delta)});")
         except Exception as e:
             error_html = self._get_error_html("Error generating interactive preview", str(e))
+            self.interactive_page_state = "unloaded"
             self.interactive_view.setHtml(error_html)
+
+    def build_interactive_elements(self, large=False):
+        """vis-network node and edge dicts keyed by their id.
+
+        Nodes are seeded with their canvas centre (vis and Qt both grow y downwards). In
+        large-graph mode positions are always sent and each node gets a 'cid' naming the
+        canvas grid cell it falls in; the page clusters nodes sharing a cell."""
+        seed = large or self.seed_positions_checkbox.isChecked()
+        cell_size = self._cluster_cell_size() if large else None
+        nodes = {}
+        for shape in self.shapes:
+            node = {"id": shape.short_id, "label": shape.text,
+                    "shape": PYVIS_SHAPE_MAP.get(shape.type, 'box'),
+                    "color": shape.color.name(), "font": {"size": 14}, "margin": 10}
+            center_x, center_y = shape.x + shape.width / 2, shape.y + shape.height / 2
+            if seed:
+                node["x"], node["y"] = round(center_x, 1), round(center_y, 1)
+            if large:
+                node["cid"] = f"{int(center_x // cell_size)}_{int(center_y // cell_size)}"
+            nodes[shape.short_id] = node
+        edges = {}
+        for connector in self.connectors:
+            u, v = connector.start_shape.short_id, connector.end_shape.short_id
+            # Parallel connectors are numbered so every connector keeps its own stable edge id
+            index = 0
+            while f"{u}->{v}#{index}" in edges:
+                index += 1
+            edge_id = f"{u}->{v}#{index}"
+            edges[edge_id] = {"id": edge_id, "from": u, "to": v, "label": connector.label}
+        return nodes, edges
+
+    def _cluster_cell_size(self):
+        """Grid cell size giving roughly LARGE_GRAPH_CLUSTER_TARGET cells over the canvas extent."""
+        xs = [shape.x for shape in self.shapes]
+        ys = [shape.y for shape in self.shapes]
+        # A single row/column of shapes still has one shape's worth of extent across it
+        area = max(max(xs) - min(xs), 100.0) * max(max(ys) - min(ys), 100.0)
+        return math.sqrt(area / self.LARGE_GRAPH_CLUSTER_TARGET)
+
+    def interactive_options(self, large):
+        """vis-network options. Physics is capped by the stabilisation budget and switched off
+        in large-graph mode, where edges are also drawn straight and hidden while panning."""
+        return {
+            "physics": {"enabled": self.physics_checkbox.isChecked() and not large,
+                        "stabilization": {"enabled": True, "iterations": self.stabilization_spin.value()}},
+            "edges": {"smooth": not large},
+            "interaction": {"hideEdgesOnDrag": large, "hideEdgesOnZoom": large},
+        }
+
+    @staticmethod
+    def _diff_elements(sent, current):
+        return {
+            "add": [element for key, element in current.items() if key not in sent],
+            "update": [element for key, element in current.items() if key in sent and sent[key] != element],
+            "remove": [key for key in sent if key not in current],
+        }
+
+    def load_interactive_page(self):
+        lib_dir = vis_network_lib_dir()
+        if lib_dir is not None:
+            base_url = QUrl.fromLocalFile(str(lib_dir) + os.sep)
+            asset_prefix = ""
+        else:
+            base_url = QUrl()
+            asset_prefix = VIS_NETWORK_CDN_URL
+            self.status_bar.showMessage("pyvis is not installed, loading vis-network from the CDN.")
+
+        self.ensure_preview_widget("interactive")
+        self.interactive_page_state = "loading"
+        self.interactive_sent = {"nodes": {}, "edges": {}, "options": None, "large": False}
+        self.interactive_view.loadFinished.connect(self.on_interactive_page_loaded)
+        self.interactive_view.setHtml(self._get_interactive_page_html(asset_prefix), base_url)
+
+    def on_interactive_page_loaded(self, ok):
+        self.interactive_view.loadFinished.disconnect(self.on_interactive_page_loaded)
+        self.interactive_page_state = "ready"
+        self.generate_interactive_preview()
+
+    def _get_interactive_page_html(self, asset_prefix):
+        return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Interactive Preview</title>
+            <link rel="stylesheet" href="{asset_prefix}vis-network.css">
+            <script src="{asset_prefix}vis-network.min.js"></script>
+            <style>
+                html, body {{ margin: 0; height: 100%; background: #ffffff; font-family: Arial, sans-serif; }}
+                #network {{ width: 100%; height: 100%; }}
+                #message {{ position: absolute; top: 0; left: 0; right: 0; bottom: 0; display: flex; justify-content: center; align-items: center; color: #666; font-size: 18px; background: #f5f5f5; }}
+            </style>
+        </head>
+        <body>
+            <div id="network"></div>
+            <div id="message">No shapes to preview.</div>
+            <script>
+                var nodes = null, edges = null, network = null;
+                var clusterIds = [];
+                if (typeof vis === 'undefined') {{
+                    document.getElementById('message').textContent = 'vis-network could not be loaded.';
+                }} else {{
+                    nodes = new vis.DataSet([]);
+                    edges = new vis.DataSet([]);
+                    network = new vis.Network(document.getElementById('network'), {{ nodes: nodes, edges: edges }}, {{
+                        edges: {{ arrows: 'to', color: {{ color: 'gray' }} }},
+                        physics: {{ enabled: true, stabilization: {{ iterations: 200 }} }}
+                    }});
+                    network.on('doubleClick', function (params) {{
+                        if (params.nodes.length && network.isCluster(params.nodes[0])) {{
+                            network.openCluster(params.nodes[0]);
+                        }}
+                    }});
+                }}
+
+                function openClusters() {{
+                    clusterIds.forEach(function (clusterId) {{
+                        if (network.isCluster(clusterId)) network.openCluster(clusterId);
+                    }});
+                    clusterIds = [];
+                }}
+
+                // Large-graph mode: one cluster per canvas grid cell ('cid') holding 2+ nodes
+                function clusterByCell() {{
+                    openClusters();
+                    var members = {{}};
+                    nodes.forEach(function (node) {{
+                        if (node.cid === undefined) return;
+                        (members[node.cid] = members[node.cid] || new Set()).add(node.id);
+                    }});
+                    Object.keys(members).forEach(function (cid) {{
+                        var ids = members[cid];
+                        if (ids.size < 2) return;
+                        var clusterId = 'cluster:' + cid;
+                        network.cluster({{
+                            joinCondition: function (node) {{ return ids.has(node.id); }},
+                            clusterNodeProperties: {{ id: clusterId, label: ids.size + ' shapes', shape: 'database',
+                                                      color: '#d3d3d3', font: {{ size: 16 }} }}
+                        }});
+                        clusterIds.push(clusterId);
+                    }});
+                }}
+
+                // delta = {{nodes: {{add, update, remove}}, edges: {{add, update, remove}}, options?, clusters?}}
+                function applyDelta(delta) {{
+                    if (network === null) return;
+                    if (delta.options !== undefined) {{
+                        network.setOptions(delta.options);
+                    }}
+                    edges.remove(delta.edges.remove);
+                    nodes.remove(delta.nodes.remove);
+                    nodes.add(delta.nodes.add);
+                    nodes.update(delta.nodes.update);
+                    edges.add(delta.edges.add);
+                    edges.update(delta.edges.update);
+                    if (delta.clusters === true) {{
+                        clusterByCell();
+                    }} else if (delta.clusters === false) {{
+                        openClusters();
+                    }}
+                    document.getElementById('message').style.display = nodes.length ? 'none' : 'flex';
+                }}
+            </script>
+        </body>
+        </html>
+        """
     
     def generate_static_preview(self):
-        if not self.shapes:
-            self.static_canvas.figure.clear()
-            self.static_canvas.draw()
-            self.preview_tabs.setCurrentIndex(2) 
-            return
-        
         try:
-            G = nx.DiGraph()
-            id_map = self.generate_id_map()
-            for shape in self.shapes:
-                G.add_node(id_map[shape.id], label=shape.text, color=shape.color.name(), type=shape.type)
-            
-            edge_labels = {}
-            for connector in self.connectors:
-                u = id_map[connector.start_shape.id]
-                v = id_map[connector.end_shape.id]
-                G.add_edge(u, v)
-                if connector.label:
-                    edge_labels[(u, v)] = connector.label
-            
-            fig = self.static_canvas.figure
-            fig.clear()
-            ax = fig.add_subplot(111)
-            
-            # pos = nx.spring_layout(G, k=3, iterations=50)
-            pos = nx.kamada_kawai_layout(G)
-            node_colors = [G.nodes[node].get('color', 'lightblue') for node in G.nodes()]
-            
-            nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=2500, ax=ax, alpha=0.9, edgecolors='black', linewidths=1)
-            # nx.draw_networkx_edges(G, pos, ax=ax, edge_color='gray', arrows=True, arrowsize=20, arrowstyle='->')
-            nx.draw_networkx_edges(G, pos, ax=ax, edge_color='gray', arrows=True, arrowsize=20, arrowstyle='-|>',
-                node_size=2500,  # Must match node_size from draw_networkx_nodes
-                min_source_margin=15,  # Space from source node
-                min_target_margin=15,  # Space from target node
-                width=2  # Make edges more visible
-            )
-            labels = {node: G.nodes[node].get('label', '') for node in G.nodes()}
-            nx.draw_networkx_labels(G, pos, labels, font_size=10, ax=ax, font_weight='bold')
-            
-            nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='black', font_size=9, ax=ax)
-            
-            ax.set_title("Flowchart Preview (Static)", fontsize=14, fontweight='bold')
-            ax.axis('off')
-            fig.tight_layout()
-            
-            self.static_canvas.draw()
-            self.preview_tabs.setCurrentIndex(2) 
+            content = self.static_preview_content()
+            if not self.static_preview_live and self.show_cached_static_preview(content):
+                return  # Neither matplotlib nor the layout are needed for it
+            if self.static_renderer is None:
+                self.static_preview_live = True
+                self.static_cached_label.hide()
+                self.ensure_preview_widget("static")
+                self.static_renderer = StaticPreviewRenderer(self.static_canvas.figure)
+                self.static_canvas.mpl_connect('draw_event', self.on_static_preview_drawn)
+
+            G = self.graph
+            pos = self.compute_static_layout(self.static_layout_combo.currentText())
+            node_shapes = [shape for _, shape in G.nodes(data="shape")]
+            edge_list = list(G.edges())
+            edge_labels = {(u, v): self.graph_edge_label(u, v) for u, v in edge_list}
+
+            self.static_renderer.update(pos,
+                                        [shape.color.name() for shape in node_shapes],
+                                        [shape.text for shape in node_shapes],
+                                        edge_list, edge_labels)
+            self.static_preview_pending = content
+            self.static_canvas.draw_idle()
                 
         except Exception as e:
             QMessageBox.critical(self, "Static Preview Error", f"Error creating static preview: {e}")
+
+    def static_preview_content(self):
+        """Everything the static preview image depends on besides its size: the Mermaid code
+        (nodes, types, edges and their labels), the raw labels and colours, and the layout
+        (for 'canvas' the shapes' geometry, otherwise its name; it follows the topology)."""
+        layout_name = self.static_layout_combo.currentText()
+        geometry = ([(shape.x, shape.y, shape.width, shape.height) for shape in self.shapes]
+                    if layout_name == "canvas" else None)
+        return ("static-preview", self.generate_mermaid_code(),
+                [(shape.text, shape.color.name()) for shape in self.shapes], layout_name, geometry)
+
+    def static_preview_key(self, content):
+        size = self.static_tab.size()
+        return RenderCache.make_key(*content, size.width(), size.height(), self.devicePixelRatioF())
+
+    def show_cached_static_preview(self, content):
+        path = self.render_cache.lookup(self.static_preview_key(content), "png")
+        pixmap = QPixmap(str(path)) if path is not None else None
+        if pixmap is None or pixmap.isNull():
+            return False
+        pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.static_cached_label.setPixmap(pixmap)
+        self.static_cached_label.show()
+        return True
+
+    def show_live_static_preview(self, event=None):
+        """Replaces the cached image with the live figure, which can be zoomed and panned."""
+        if not self.static_preview_live:
+            self.static_preview_live = True
+            self.generate_static_preview()
+
+    def on_static_preview_drawn(self, event):
+        """Caches the first draw after a refresh (not those after zooming or panning)."""
+        content, self.static_preview_pending = self.static_preview_pending, None
+        if content is None:
+            return
+        pixels = np.asarray(self.static_canvas.get_renderer().buffer_rgba())
+        height, width = pixels.shape[:2]
+        image = QImage(pixels.tobytes(), width, height, 4 * width, QImage.Format_RGBA8888)
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        if image.save(buffer, "PNG"):
+            self.render_cache.write_bytes(self.static_preview_key(content), "png", bytes(buffer.data()))
             
+    def compute_static_layout(self, layout_name):
+        """Node positions for the static preview.
+
+        'canvas' maps each shape's centre on the design canvas (y flipped for matplotlib) and
+        costs O(N). Force-directed layouts are cached by topology hash (in memory and in the
+        render cache on disk), so they are only recomputed when the structure is new."""
+        G = self.graph
+        if layout_name == "canvas":
+            return {node: (shape.x + shape.width / 2, -(shape.y + shape.height / 2))
+                    for node, shape in G.nodes(data="shape")}
+
+        key = (layout_name, self.topology_hash())
+        pos = self.static_layout_cache.get(key)
+        if pos is None:
+            # Second level: layouts computed in earlier sessions, keyed by the same topology hash
+            disk_key = RenderCache.make_key("layout", *key)
+            cached = self.render_cache.read_text(disk_key, "json")
+            if cached is not None:
+                pos = {node: tuple(xy) for node, xy in json.loads(cached).items()}
+            else:
+                import networkx as nx
+                if layout_name == "spring":
+                    pos = nx.spring_layout(G, k=3, iterations=50, seed=42)
+                else:
+                    pos = nx.kamada_kawai_layout(G)
+                self.render_cache.write_text(disk_key, "json",
+                                             json.dumps({node: [float(x), float(y)] for node, (x, y) in pos.items()}))
+            if len(self.static_layout_cache) >= self.STATIC_LAYOUT_CACHE_SIZE:
+                # Dicts keep insertion order, so the first key is the oldest entry
+                del self.static_layout_cache[next(iter(self.static_layout_cache))]
+            self.static_layout_cache[key] = pos
+        return pos
+
     def export_plot(self):
         if not self.shapes:
             QMessageBox.warning(self, "Export Warning", "No shapes to export.")
             return
 
+        self.static_preview_live = True  # The export needs the figure, not the cached image
         self.generate_static_preview() 
         formats = "PNG Image (*.png);;JPEG Image (*.jpg *.jpeg);;SVG File (*.svg)"
         file_path, filter_name = QFileDialog.getSaveFileName(self, "Export Static Plot", "flowchart_static", formats)
@@ -1692,20 +3409,19 @@ class FlowchartDesigner(QMainWindow):
             return
         
         try:
-            from pyvis.network import Network
-            net = Network(height="800px", width="100%", bgcolor="#ffffff", font_color="black", directed=True, notebook=False, cdn_resources='remote')
-            net.toggle_physics(self.physics_checkbox.isChecked())
-            id_map = self.generate_id_map()
+            physics = self.physics_checkbox.isChecked()
+            cache_key = RenderCache.make_key(
+                "pyvis-export", physics,
+                [(shape.short_id, shape.text, shape.type, shape.color.name()) for shape in self.shapes],
+                [(c.start_shape.short_id, c.end_shape.short_id, c.label) for c in self.connectors])
+            html = self.render_cache.read_text(cache_key, "html")
 
-            for shape in self.shapes:
-                shape_map = {'rectangle': 'box', 'diamond': 'diamond', 'ellipse': 'ellipse', 'start_end': 'box', 'input_output': 'box'}
-                net.add_node(id_map[shape.id], label=shape.text, shape=shape_map.get(shape.type, 'box'),
-                    color=shape.color.name(), font={'size': 14}, margin=10)
-            
-            for connector in self.connectors:
-                net.add_edge(id_map[connector.start_shape.id], id_map[connector.end_shape.id], label=connector.label)
+            if html is None:
+                html = build_pyvis_html(self.iter_shape_records(), self.iter_connector_records(), physics)
+                self.render_cache.write_text(cache_key, "html", html)
 
-            net.save_graph(file_path)
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(html)
             QMessageBox.information(self, "Export Successful", f"Interactive HTML exported to:\n{file_path}")
         except Exception as e:
             QMessageBox.critical(self, "Export Error", f"Failed to export interactive HTML: {e}")
@@ -1721,19 +3437,57 @@ class FlowchartDesigner(QMainWindow):
         """
     # --- AUTOSAVE AND RECOVERY LOGIC ---
     
-    def save_json_data_to_file(self, data, file_path):
-        """Saves the given data structure to the specified file path."""
-        json_data = data #json.dumps(data, indent=2)
+    def save_project_file(self, file_path):
+        """Saves the project (atomically) in the format given by the file extension:
+        .fcb, .json.gz / .json.xz or plain JSON. Only the snapshot is taken here; encoding
+        and writing run on the file worker while the window stays responsive."""
+        snapshot = self.project_snapshot()
         try:
-            with open(file_path, 'w') as f:
-                f.write(json_data)
+            self.run_file_task(f"Saving {Path(file_path).name}...", write_project_file, file_path, snapshot)
             return True
+        except FileTaskCancelled:
+            self.status_bar.showMessage("Save cancelled.")
+            return False
         except Exception as e:
-            # We don't use QMessageBox for background autosave, just print the error
-            if file_path != str(self.autosave_file_path): 
-                QMessageBox.critical(self, "Save Error", f"Failed to save file: {e}")
+            QMessageBox.critical(self, "Save Error", f"Failed to save file: {e}")
             return False
 
+    def run_file_task(self, message, work, *args):
+        """Runs work(task, *args) on the file worker thread and returns its result (or raises
+        its exception, FileTaskCancelled after Cancel). Meanwhile a local event loop keeps the
+        window painting, and the status bar shows progress and a Cancel button."""
+        if self.file_task is not None:
+            raise RuntimeError("Another load or save is still running.")
+        task = FileTask()
+        loop = QEventLoop()
+        task.finished.connect(loop.quit)  # Queued, so it is handled even if emitted before exec_
+        task.progress.connect(self.file_progress.setValue)
+        self.file_task = task
+        self.status_bar.showMessage(message)
+        self.file_progress.setValue(0)
+        self.file_progress.setVisible(True)
+        self.file_cancel_button.setVisible(True)
+        future = self.file_executor.submit(self._run_file_task, task, work, args)
+        try:
+            loop.exec_()
+            return future.result()
+        finally:
+            self.file_task = None
+            self.file_progress.setVisible(False)
+            self.file_cancel_button.setVisible(False)
+
+    @staticmethod
+    def _run_file_task(task, work, args):
+        try:
+            return work(task, *args)
+        finally:
+            task.finished.emit()
+
+    def cancel_file_task(self):
+        if self.file_task is not None:
+            self.file_task.cancel()
+            self.status_bar.showMessage("Cancelling...")
+
     def setup_autosave(self):
         """Initializes the QTimer for periodic autosaving."""
         self.autosave_timer.timeout.connect(self.autosave_project)
@@ -1743,46 +3497,174 @@ class FlowchartDesigner(QMainWindow):
     def autosave_activity(self):
         """Triggers autosave reset when the user makes a change."""
         # Reset the timer every time the user performs an action (move, add, edit)
+        self.model_revision += 1
         self.autosave_timer.stop()
         self.autosave_timer.start(self.AUTOSAVE_INTERVAL_MS)
         
     def autosave_project(self):
-        """Background saving function called by the QTimer."""
-        if not self.shapes:
-            # self.delete_autosave_file()
-            pass
+        """Background saving function called by the QTimer. Only the snapshot is taken on the
+        GUI thread; JSON encoding and the atomic write happen on the autosave worker."""
+        if not self.shapes or self.model_revision == self.autosaved_revision:
+            return
+        if self.autosave_future is not None and not self.autosave_future.done():
+            return  # The previous write is still running; the next tick picks this revision up
+
+        self.journal.flush_shapes()
+        self.write_autosave_snapshot()
+
+    def write_autosave_snapshot(self):
+        """Writes the current state as the slot's snapshot on the autosave worker; only the
+        column copy (project_snapshot) is taken here. Journal records up to the current
+        sequence number are contained in it."""
+        self.autosave_write_id += 1
+        self.autosave_writes[self.autosave_write_id] = (self.model_revision, self.journal, self.journal.seq)
+        self.autosave_future = self.autosave_executor.submit(
+            self._write_autosave, self.autosave_slot.snapshot_path, self.project_snapshot(),
+            self.journal.seq, self.autosave_write_id)
+
+    def _write_autosave(self, path, snapshot, journal_seq, write_id):
+        """Runs on the autosave worker thread."""
+        try:
+            save_project_json(path, snapshot.node_records(), snapshot.edge_records(), journal_seq=journal_seq)
+            self.autosave_notifier.finished.emit(write_id, "")
+        except Exception as e:
+            self.autosave_notifier.finished.emit(write_id, str(e))
+
+    def on_autosave_finished(self, write_id, error):
+        revision, journal, snapshot_seq = self.autosave_writes.pop(write_id)
+        if error:
+            # We don't use QMessageBox for background autosave, just print the error
+            print(f"Warning: Autosave failed: {error}")
             return
+        self.autosaved_revision = max(self.autosaved_revision, revision)
+        if journal is self.journal:  # Unless the slot was switched while writing
+            self.journal.compact(snapshot_seq)
+        self.status_bar.showMessage(f"Autosaved project to temporary file. Next save in {self.AUTOSAVE_INTERVAL_MS // 60000} min.")
 
-        data = self.generate_json_data()
-        if self.save_json_data_to_file(data, str(self.autosave_file_path)):
-            self.status_bar.showMessage(f"Autosaved project to temporary file. Next save in {self.AUTOSAVE_INTERVAL_MS // 60000} min.")
+    def flush_journal(self):
+        self.journal.flush_shapes()
+        if len(self.journal.offsets) > self.JOURNAL_COMPACT_RECORDS:
+            self.autosave_project()  # The snapshot lets the journal be compacted
+
+    def wait_for_autosave(self):
+        """Blocks until an in-flight autosave write has finished."""
+        if self.autosave_future is not None:
+            self.autosave_future.exception()  # Waits; errors are reported by on_autosave_finished
+            self.autosave_future = None
+
+    def open_autosave_slot(self, project_path):
+        """Moves autosaving to the slot of project_path (or to a session slot when untitled or
+        when another designer already has that project open). The caller restarts the journal,
+        normally via delete_autosave_file."""
+        slot = AutosaveSlot.for_project(self.autosave_dir, project_path) if project_path else None
+        if slot is not None and self.autosave_slot is not None and slot.id == self.autosave_slot.id:
+            return
+        if slot is None or not slot.acquire():
+            if self.autosave_slot is not None and self.autosave_slot.id.startswith("session-"):
+                return
+            slot = AutosaveSlot.for_session(self.autosave_dir)
+            slot.acquire()
+
+        if self.autosave_slot is not None:
+            self.wait_for_autosave()
+            self.journal.discard()
+            self.autosave_slot.remove_files()
+            self.autosave_slot.release()
+        self.autosave_slot = slot
+        slot.write_meta(project_path)
+        self.journal = EditJournal(slot.journal_path)
 
     def check_for_recovery(self):
-        """Checks if a recovery file exists and prompts the user to load it."""
-        if self.autosave_file_path.exists() and self.autosave_file_path.stat().st_size > 0:
+        """Looks for slots left behind by designers that crashed or were killed (their lock
+        can be taken) and offers to load one of them. Slots of running designers are skipped."""
+        self.delete_autosave_file()  # Starts this session's journal
+        slots = []
+        for slot_id in AutosaveSlot.list_ids(self.autosave_dir):
+            if slot_id == self.autosave_slot.id:
+                continue
+            slot = AutosaveSlot(self.autosave_dir, slot_id)
+            if slot.acquire():
+                slots.append(slot)
+        if not slots:
+            return
+        try:
+            recovered = self.run_file_task("Checking for recoverable sessions...", read_recovery_data, slots)
+        except FileTaskCancelled:
+            recovered = [None] * len(slots)
+            discarded = []
+        else:
+            discarded = slots
+        candidates = []
+        for slot, data in zip(slots, recovered):
+            if data and data["nodes"]:
+                candidates.append((slot, data))
+            else:
+                if slot in discarded:  # Nothing worth recovering (a cancelled check removes nothing)
+                    slot.remove_files()
+                slot.release()
+        if not candidates:
+            return
+
+        candidates.sort(key=lambda candidate: candidate[0].last_modified(), reverse=True)
+        chosen, discard_all = None, False
+        if len(candidates) == 1:
             reply = QMessageBox.question(self, 'Recovery Available', 
                                    'A previous session crashed or closed without saving. Would you like to load the recovery file?',
                                    QMessageBox.Yes | QMessageBox.No)
-            if reply == QMessageBox.Yes:
-                try:
-                    with open(self.autosave_file_path, 'r') as f:
-                        content = f.read()
-                    self.parse_json_to_gui(content)
-                    self.status_bar.showMessage("Work recovered from autosave file.")
-                except Exception as e:
-                    QMessageBox.critical(self, "Recovery Error", f"Failed to load recovery file: {e}")
-            
-            # Whether loaded or not, offer to delete the old file to clean up
-            self.delete_autosave_file()
-            
-    def delete_autosave_file(self):
-        """Removes the temporary autosave file."""
-        print('temp file deleted')
-        if self.autosave_file_path.exists():
+            chosen = candidates[0] if reply == QMessageBox.Yes else None
+            discard_all = True  # Whether loaded or not, delete the old files to clean up
+        else:
+            items = []
+            for slot, data in candidates:
+                project = slot.read_meta().get("project")
+                name = Path(project).name if project else "Untitled"
+                modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(slot.last_modified()))
+                items.append(f"{name} - {modified} ({len(data['nodes'])} shapes)")
+            discard_item = "Discard all recovery data"
+            item, ok = QInputDialog.getItem(self, 'Recovery Available',
+                                            'Several sessions crashed or closed without saving.\nChoose one to load:',
+                                            items + [discard_item], 0, False)
+            if ok:
+                discard_all = item == discard_item
+                if not discard_all:
+                    chosen = candidates[items.index(item)]
+
+        for slot, data in candidates:
+            if discard_all or (chosen is not None and slot is chosen[0]):
+                slot.remove_files()
+            slot.release()  # Unchosen sessions stay recoverable on the next start
+        if chosen is not None:
             try:
-                os.remove(self.autosave_file_path)
+                self.parse_json_to_gui(json.dumps(chosen[1]), layout=False)
+                self.status_bar.showMessage("Work recovered from autosave file.")
             except Exception as e:
-                print(f"Warning: Could not delete autosave file: {e}")
+                QMessageBox.critical(self, "Recovery Error", f"Failed to load recovery file: {e}")
+
+    def delete_autosave_file(self, base_file=None):
+        """Removes the temporary autosave file and restarts the journal from the current state;
+        base_file is the project file that state was just saved to or loaded from."""
+        # A write still in flight would otherwise recreate the file after it is removed
+        self.wait_for_autosave()
+        self.autosave_slot.remove_snapshot()
+        self.restart_journal(base_file)
+
+    def restart_journal(self, base_file=None):
+        """Starts a new journal from the current state without serialising the diagram here:
+        the reset record names base_file (by path, size and mtime), or holds an empty diagram,
+        or refers to a snapshot then written on the autosave worker."""
+        if base_file is not None:
+            try:
+                stat = os.stat(base_file)
+                self.journal.start({"file": os.path.abspath(base_file), "size": stat.st_size,
+                                    "mtime_ns": stat.st_mtime_ns})
+                return
+            except OSError as e:
+                print(f"Warning: Could not read {base_file}, journaling from a snapshot instead: {e}")
+        if not self.shapes:
+            self.journal.start({"data": {"nodes": [], "connections": []}})
+            return
+        self.journal.start({"snapshot": True})
+        self.write_autosave_snapshot()
                 
     def closeEvent(self, event):
         '''Override close event to prompt for unsaved changes.'''
@@ -1801,10 +3683,740 @@ class FlowchartDesigner(QMainWindow):
                     event.ignore()
                     return
         
-        self.delete_autosave_file()
+        self.autosave_executor.shutdown(wait=True)
+        self.file_executor.shutdown(wait=True)
+        self.journal.discard()
+        self.autosave_slot.remove_files()
+        self.autosave_slot.release()
         super().closeEvent(event)
 
+# --- Headless Conversion ---
+
+class ConversionError(Exception):
+    """A diagram file could not be converted (raised instead of showing a warning box)."""
+
+PROJECT_FILE_SUFFIXES = (".json", ".json.gz", ".json.xz", BINARY_PROJECT_SUFFIX)
+MERMAID_FILE_SUFFIXES = (".mmd", ".txt")
+
+def diagram_file_kind(file_path):
+    """'project', 'mermaid', 'html' or one of CANVAS_IMAGE_FORMATS, from the file name."""
+    name = str(file_path).lower()
+    if name.endswith(PROJECT_FILE_SUFFIXES):
+        return "project"
+    if name.endswith(MERMAID_FILE_SUFFIXES):
+        return "mermaid"
+    if name.endswith((".html", ".htm")):
+        return "html"
+    if name.endswith(".jpeg"):
+        return "jpg"
+    suffix = Path(name).suffix.lstrip(".")
+    if suffix in CANVAS_IMAGE_FORMATS:
+        return suffix
+    raise ConversionError(f"Unsupported file type: {Path(file_path).name}")
+
+def conversion_needs_canvas(source_kind, target_kind):
+    """Mermaid sources are laid out with the canvas' font metrics and images are rendered
+    from the scene; every other conversion works on plain project dicts, without Qt."""
+    return source_kind == "mermaid" or target_kind in CANVAS_IMAGE_FORMATS
+
+def load_diagram_file(source, designer=None):
+    """Project dict of a Mermaid or project file. With a (headless) designer the diagram is
+    also built on its scene; Mermaid sources need one, as the layout happens there. Project
+    sources keep their saved positions; Mermaid sources get the designer's auto-layout."""
+    source_kind = diagram_file_kind(source)
+    if source_kind not in ("project", "mermaid"):
+        raise ConversionError(f"Cannot read diagrams from {Path(source).name}")
+    return build_diagram(read_project_file(FileTask(), source), source_kind, designer)
+
+def build_diagram(payload, source_kind, designer=None):
+    """Project dict of a read source: Mermaid text, a project dict or a BinaryProject (see
+    read_project_file), built on the designer's scene when one is given (required for Mermaid).
+    Without a designer, project dicts are normalised like a load into the designer: missing
+    fields get their defaults, IDs become valid strings and dangling connections are dropped."""
+    if designer is None:
+        if source_kind == "mermaid":
+            raise ConversionError("Mermaid sources need a designer for the layout")
+        if isinstance(payload, BinaryProject):
+            return payload.to_dict()
+        return Diagram.from_project(payload).to_project()
+    designer.clear_canvas_internal()
+    if source_kind == "mermaid":
+        designer.parse_mermaid_to_gui(payload)
+    else:
+        designer.load_project_records(*project_records(payload), layout=False)
+    return designer.project_data()
+
+def write_diagram_file(target, data, designer=None, physics=True):
+    """Writes a project dict in the format of target's extension; images are rendered from
+    the designer's scene, which must hold the same diagram (see load_diagram_file)."""
+    target_kind = diagram_file_kind(target)
+    if target_kind == "project":
+        write_project_file(FileTask(), target, data)
+    elif target_kind == "mermaid":
+        write_file_atomic(target, project_to_mermaid(data) + "\n")
+    elif target_kind == "html":
+        write_file_atomic(target, build_pyvis_html(data["nodes"], data["connections"], physics))
+    else:
+        render_scene_image(designer.scene, target, target_kind)
+
+def convert_diagram_file(source, target, designer=None, physics=True):
+    """Converts one diagram file into another (the format follows each extension). designer is
+    a headless FlowchartDesigner, required only when conversion_needs_canvas()."""
+    canvas = conversion_needs_canvas(diagram_file_kind(source), diagram_file_kind(target))
+    data = load_diagram_file(source, designer if canvas else None)
+    write_diagram_file(target, data, designer, physics)
+
+def diagram_file_stem(file_path):
+    """File name without its Mermaid or project suffix (which may be double, e.g. .json.gz)."""
+    name = Path(file_path).name
+    for suffix in PROJECT_FILE_SUFFIXES + MERMAID_FILE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return Path(name).stem
+
+def headless_designer():
+    """A never-shown FlowchartDesigner on Qt's offscreen platform (unless another platform was
+    requested explicitly), creating the QApplication if there is none yet."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    designer = FlowchartDesigner(headless=True)
+    designer.app = app  # The QApplication has to outlive the designer
+    return designer
+
+def conversion_targets(args):
+    """(source, target) pairs of a 'convert' command line."""
+    if args.to is None:
+        if len(args.inputs) != 2 or args.out_dir:
+            raise ConversionError("Give SOURCE TARGET, or several inputs with --to FORMAT.")
+        return [(Path(args.inputs[0]), Path(args.inputs[1]))]
+    suffix = args.to if args.to.startswith(".") else "." + args.to
+    return [(source, Path(args.out_dir or source.parent) / (diagram_file_stem(source) + suffix))
+            for source in map(Path, args.inputs)]
+
+def run_convert(args):
+    designer = None
+    failures = 0
+    for source, target in conversion_targets(args):
+        try:
+            if designer is None and conversion_needs_canvas(diagram_file_kind(source), diagram_file_kind(target)):
+                designer = headless_designer()
+            target.parent.mkdir(parents=True, exist_ok=True)
+            convert_diagram_file(source, target, designer, physics=not args.no_physics)
+            print(f"{source} -> {target}")
+        except Exception as e:
+            failures += 1
+            print(f"Error: {source}: {e}", file=sys.stderr)
+    return 1 if failures else 0
+
+# --- Batch Export ---
+
+BATCH_SOURCE_SUFFIXES = (".mmd",) + PROJECT_FILE_SUFFIXES
+BATCH_MANIFEST_NAME = ".flowchart-batch.json"  # Source path -> key of the outputs last rendered from it
+
+worker_designer = None  # One headless designer (and offscreen scene) per pool worker
+
+def init_render_worker():
+    global worker_designer
+    worker_designer = headless_designer()
+
+def batch_render_file(source, targets):
+    """Pool worker: parses source once and renders it to every target. Returns (elapsed
+    seconds, error message or "")."""
+    start = time.perf_counter()
+    try:
+        data = load_diagram_file(source, worker_designer)
+        for target in targets:
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            write_diagram_file(target, data, worker_designer)
+        error = ""
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    return time.perf_counter() - start, error
+
+def batch_source_key(source, formats):
+    """Content hash of a source plus the requested formats; equal keys mean the outputs of
+    the previous run are still current."""
+    return RenderCache.make_key(hashlib.sha256(Path(source).read_bytes()).hexdigest(), formats)
+
+def parse_image_formats(text):
+    """['png', 'svg'] for "png,svg"; only canvas image formats are accepted."""
+    formats = [fmt.strip().lstrip(".").lower() for fmt in text.split(",") if fmt.strip()]
+    formats = ["jpg" if fmt == "jpeg" else fmt for fmt in formats]
+    if not formats or any(fmt not in CANVAS_IMAGE_FORMATS for fmt in formats):
+        raise ConversionError(f"Image formats must be among {', '.join(CANVAS_IMAGE_FORMATS)}")
+    return formats
+
+def is_batch_source(path):
+    """True for a diagram source by name; the batch manifest is JSON but never a project."""
+    name = Path(path).name
+    return name != BATCH_MANIFEST_NAME and name.lower().endswith(BATCH_SOURCE_SUFFIXES)
+
+def batch_output_folder(root, out_dir):
+    """Path parts of out_dir relative to root when it lies inside (but is not) root, else
+    None. Nothing below it is a source: it only holds outputs of earlier runs."""
+    try:
+        parts = Path(out_dir).resolve().relative_to(Path(root).resolve()).parts
+    except ValueError:
+        return None
+    return parts or None
+
+def find_batch_sources(root, out_dir=None):
+    root = Path(root)
+    skipped = batch_output_folder(root, out_dir) if out_dir is not None else None
+    return sorted(path for path in root.rglob("*")
+                  if path.is_file() and is_batch_source(path)
+                  and not (skipped and path.relative_to(root).parts[:len(skipped)] == skipped))
+
+def batch_output_paths(root, out_dir, source, formats):
+    """Outputs of a source: same relative folder below out_dir, one file per format."""
+    folder = Path(out_dir) / Path(source).relative_to(root).parent
+    return [folder / f"{diagram_file_stem(source)}.{fmt}" for fmt in formats]
+
+def remove_batch_outputs(targets):
+    """Deletes the outputs of a source that was removed or failed to render, so a stale image
+    never stands in for the current source."""
+    for target in targets:
+        try:
+            Path(target).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: could not remove stale output {target}: {e}")
+
+def read_batch_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def run_batch(args):
+    root = Path(args.directory)
+    if not root.is_dir():
+        raise ConversionError(f"Not a directory: {root}")
+    out_dir = Path(args.out_dir) if args.out_dir else root
+    formats = parse_image_formats(args.formats)
+
+    manifest_path = out_dir / BATCH_MANIFEST_NAME
+    previous = read_batch_manifest(manifest_path)
+    manifest = {} if args.force else dict(previous)
+    timings = {}  # Relative source path -> (status, seconds, error)
+    pending = []  # (relative path, source, targets, key)
+    sources = find_batch_sources(root, out_dir)
+    for relative in set(previous) - {source.relative_to(root).as_posix() for source in sources}:
+        # Source deleted since the last run: its outputs would otherwise linger
+        remove_batch_outputs(batch_output_paths(root, out_dir, root / relative, formats))
+        manifest.pop(relative, None)
+        timings[relative] = ("removed", 0.0, "")
+    for source in sources:
+        relative = source.relative_to(root).as_posix()
+        targets = batch_output_paths(root, out_dir, source, formats)
+        key = batch_source_key(source, formats)
+        if manifest.get(relative) == key and all(target.exists() for target in targets):
+            timings[relative] = ("unchanged", 0.0, "")
+        else:
+            pending.append((relative, source, targets, key))
+
+    start = time.perf_counter()
+    workers = max(1, min(args.jobs or os.cpu_count() or 1, len(pending)))
+    if pending:
+        # Spawned (not forked) workers: each starts its own QApplication on the offscreen platform
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=init_render_worker) as pool:
+            futures = {pool.submit(batch_render_file, str(source), [str(target) for target in targets]): (relative, targets, key)
+                       for relative, source, targets, key in pending}
+            for future in as_completed(futures):
+                relative, targets, key = futures[future]
+                try:
+                    elapsed, error = future.result()
+                except Exception as e:  # The worker process itself died
+                    elapsed, error = 0.0, str(e) or type(e).__name__
+                if error:
+                    remove_batch_outputs(targets)
+                    manifest.pop(relative, None)
+                    timings[relative] = ("failed", elapsed, error)
+                else:
+                    manifest[relative] = key
+                    timings[relative] = ("rendered", elapsed, "")
+    if manifest != previous:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_file_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    wall = time.perf_counter() - start
+
+    for relative in sorted(timings):
+        status, elapsed, error = timings[relative]
+        print(f"{elapsed * 1000:>9.1f} ms  {status:<9}  {relative}" + (f": {error}" if error else ""))
+    counts = {status: sum(timing[0] == status for timing in timings.values())
+              for status in ("rendered", "unchanged", "failed", "removed")}
+    rate = f", {counts['rendered'] / wall:.1f} files/s" if counts["rendered"] and wall > 0 else ""
+    print(f"{counts['rendered']} rendered, {counts['unchanged']} unchanged, {counts['failed']} failed, "
+          f"{counts['removed']} removed "
+          f"in {wall:.2f} s (jobs: {workers if pending else 0}{rate})")
+    return 1 if counts["failed"] else 0
+
+# --- Watch Mode ---
+
+class DiagramWatcher(QObject):
+    """Keeps the images of every diagram below a folder current: file system notifications
+    restart a debounce timer, after which only the sources whose content changed are
+    re-rendered on one headless designer. Parsed models and Mermaid layouts stay in memory
+    between passes, so an edit that keeps the topology (e.g. a relabel) skips the layout."""
+    LAYOUT_CACHE_SIZE = 64  # Mermaid layouts kept, keyed by topology hash
+
+    def __init__(self, root, out_dir, formats, debounce_ms, designer):
+        super().__init__()
+        self.root, self.out_dir, self.formats = Path(root), Path(out_dir), formats
+        self.designer = designer
+        self.manifest_path = self.out_dir / BATCH_MANIFEST_NAME
+        self.manifest = read_batch_manifest(self.manifest_path)  # Shared with the batch command
+        self.output_folder = batch_output_folder(self.root, self.out_dir)
+        self.file_stats = {}  # Relative path -> (mtime_ns, size) at the last check
+        self.folder_snapshots = {}  # Watched folder -> folder_snapshot() at the last check
+        self.models = {}      # Relative path -> (content key, project dict) of the last render
+        self.layouts = OrderedDict()  # Topology hash -> {short_id: (x, y)}
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.folder_changed)
+        self.watcher.fileChanged.connect(self.schedule)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_ms)
+        self.timer.timeout.connect(self.render_changed)
+
+    def schedule(self, path=None):
+        self.timer.start()  # Restarts the debounce interval
+
+    def in_output_folder(self, path):
+        return bool(self.output_folder) and path.relative_to(self.root).parts[:len(self.output_folder)] == self.output_folder
+
+    def folder_snapshot(self, folder):
+        """Sources (with mtime and size) and subfolders of a folder. The outputs and manifest
+        this watcher writes are not part of it, so its own writes leave it unchanged."""
+        snapshot = {}
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if not self.in_output_folder(Path(entry.path)):
+                            snapshot[entry.name] = None
+                    elif is_batch_source(entry.name):
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+        return snapshot
+
+    def folder_changed(self, folder):
+        snapshot = self.folder_snapshot(folder)
+        if snapshot != self.folder_snapshots.get(folder):
+            self.folder_snapshots[folder] = snapshot
+            self.schedule()
+
+    def watch(self, sources):
+        # Editors often save by replacing the file, which drops it from the watcher: re-add
+        folders = [str(self.root)] + [str(path) for path in self.root.rglob("*")
+                                      if path.is_dir() and not self.in_output_folder(path)]
+        # Snapshots are taken before the sources are read, so later edits still differ from them
+        self.folder_snapshots = {folder: self.folder_snapshot(folder) for folder in folders}
+        paths = folders + [str(source) for source in sources]
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        missing = [path for path in paths if path not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def render_changed(self):
+        """One pass: renders new and changed sources, removes the outputs of deleted ones."""
+        sources = find_batch_sources(self.root, self.out_dir)
+        self.watch(sources)
+        seen = set()
+        rendered = 0
+        previous = dict(self.manifest)
+        for source in sources:
+            relative = source.relative_to(self.root).as_posix()
+            seen.add(relative)
+            try:
+                stat = source.stat()
+            except OSError:
+                continue  # Removed since the scan
+            stats = (stat.st_mtime_ns, stat.st_size)
+            if self.file_stats.get(relative) == stats:
+                continue
+            self.file_stats[relative] = stats
+            targets = batch_output_paths(self.root, self.out_dir, source, self.formats)
+            key = batch_source_key(source, self.formats)
+            if self.manifest.get(relative) == key and all(target.exists() for target in targets):
+                continue  # Touched, or saved without changes
+            start = time.perf_counter()
+            try:
+                self.render(relative, source, key, targets)
+                self.manifest[relative] = key
+                rendered += 1
+                print(f"{(time.perf_counter() - start) * 1000:>9.1f} ms  rendered   {relative}", flush=True)
+            except Exception as e:
+                remove_batch_outputs(targets)
+                self.manifest.pop(relative, None)
+                print(f"{(time.perf_counter() - start) * 1000:>9.1f} ms  failed     {relative}: {e}", flush=True)
+        # Sources deleted while watching, or (from the manifest) before the watch started
+        for relative in (set(self.file_stats) | set(self.manifest)) - seen:
+            remove_batch_outputs(batch_output_paths(self.root, self.out_dir, self.root / relative, self.formats))
+            self.file_stats.pop(relative, None)
+            self.models.pop(relative, None)
+            self.manifest.pop(relative, None)
+            print(f"{0:>9.1f} ms  removed    {relative}", flush=True)
+        if rendered or self.manifest != previous:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            write_file_atomic(self.manifest_path, json.dumps(self.manifest, indent=2, sort_keys=True))
+
+    def render(self, relative, source, key, targets):
+        designer = self.designer
+        cached = self.models.get(relative)
+        if cached is not None and cached[0] == key:
+            data = cached[1]  # Only the outputs were missing
+            designer.clear_canvas_internal()
+            designer.load_project_records(data["nodes"], data["connections"], layout=False)
+        elif diagram_file_kind(source) == "mermaid":
+            designer.clear_canvas_internal()
+            designer.parse_mermaid_to_gui(read_project_file(FileTask(), source), layout=False)
+            topology = designer.topology_hash()
+            positions = self.layouts.get(topology)
+            if positions is None:
+                designer.auto_layout()
+                positions = {shape.short_id: (shape.x, shape.y) for shape in designer.shapes}
+                if len(self.layouts) >= self.LAYOUT_CACHE_SIZE:
+                    self.layouts.popitem(last=False)
+                self.layouts[topology] = positions
+            else:
+                self.layouts.move_to_end(topology)
+                designer.place_shapes(positions)
+            data = designer.project_data()
+        else:
+            data = load_diagram_file(source, designer)
+        self.models[relative] = (key, data)
+        for target in targets:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            write_diagram_file(target, data, designer)
+
+def run_watch(args):
+    root = Path(args.directory)
+    if not root.is_dir():
+        raise ConversionError(f"Not a directory: {root}")
+    formats = parse_image_formats(args.formats)
+    designer = headless_designer()
+    watcher = DiagramWatcher(root, Path(args.out_dir) if args.out_dir else root, formats, args.debounce, designer)
+    watcher.render_changed()  # Brings everything up to date before waiting for changes
+    print(f"Watching {root} (Ctrl+C to stop)", flush=True)
+    # Qt's event loop does not return to Python on its own, so Ctrl+C needs a ticking timer
+    signal.signal(signal.SIGINT, lambda *args: designer.app.quit())
+    ticker = QTimer()
+    ticker.timeout.connect(lambda: None)
+    ticker.start(200)
+    designer.app.exec_()
+    return 0
+
+# --- Render Server ---
+
+RENDER_SERVER_FORMATS = {"svg": "image/svg+xml", "png": "image/png", "jpg": "image/jpeg",
+                         "json": "application/json"}  # json = the laid-out project
+RENDER_SERVER_MAX_BODY = 16 * 1024 * 1024
+RENDER_SERVER_TIMEOUT_S = 120
+RENDER_SERVER_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+def render_request(text, source_kind, output_format, path):
+    """Pool worker: renders Mermaid or project JSON text into path (written under a temporary
+    name, then renamed, so readers never see a partial file). Returns (elapsed seconds, error
+    message or "")."""
+    start = time.perf_counter()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if source_kind == "project":
+            project = json.loads(text)
+            if not isinstance(project, dict):
+                raise ConversionError("Project JSON must be an object with nodes and connections")
+            payload = {"nodes": project.get("nodes", []), "connections": project.get("connections", [])}
+        else:
+            payload = text
+        data = build_diagram(payload, source_kind, worker_designer)
+        if output_format == "json":
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                write_project_json(f, data["nodes"], data["connections"])
+        else:
+            render_scene_image(worker_designer.scene, temp_path, output_format)
+        os.replace(temp_path, path)
+        error = ""
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    return time.perf_counter() - start, error
+
+def warm_up_render_worker(delay):
+    time.sleep(delay)  # Keeps this worker busy so the pool starts the next one
+    return os.getpid()
+
+class RenderService:
+    """State shared by the render server's request threads: the pool of warm worker processes,
+    the content-addressed result cache (a RenderCache; workers write straight into its
+    folder), requests already being rendered, and the metrics."""
+    LATENCY_WINDOW = 2000     # Most recent requests kept for the latency percentiles
+    THROUGHPUT_WINDOW_S = 60  # Recent throughput is measured over this period
+
+    def __init__(self, workers, cache):
+        self.workers = workers
+        self.cache = cache
+        self.cache.directory.mkdir(parents=True, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_render_worker)
+        self.lock = threading.Lock()
+        self.in_flight = {}  # Cache key -> Future; identical concurrent requests share one render
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.active = 0
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)  # (finished at, seconds)
+        self.render_seconds = deque(maxlen=self.LATENCY_WINDOW)
+
+    def warm_up(self):
+        """Starts every worker process (and its QApplication) before the first request."""
+        futures = [self.pool.submit(warm_up_render_worker, 0.5) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def render(self, text, source_kind, output_format):
+        """(bytes, "hit" | "miss" | "shared") for a request body; raises ConversionError."""
+        try:
+            return self.render_once(text, source_kind, output_format)
+        except FileNotFoundError:
+            # Evicted by a concurrent request between rendering and reading it: render again
+            return self.render_once(text, source_kind, output_format)
+
+    def render_once(self, text, source_kind, output_format):
+        key = RenderCache.make_key("render-server", source_kind, output_format,
+                                   hashlib.sha256(text.encode("utf-8")).hexdigest())
+        path = self.cache.path_for(key, output_format)
+        with self.lock:
+            if self.cache.lookup(key, output_format) is not None:
+                return path.read_bytes(), "hit"  # Under the lock: no register() can evict it meanwhile
+            future = self.in_flight.get(key)
+            if future is not None:
+                status = "shared"
+                self.coalesced += 1
+            else:
+                status = "miss"
+                future = self.pool.submit(render_request, text, source_kind, output_format, str(path))
+                self.in_flight[key] = future
+        try:
+            elapsed, error = future.result(timeout=RENDER_SERVER_TIMEOUT_S)
+        finally:
+            if status == "miss":
+                with self.lock:
+                    self.in_flight.pop(key, None)
+        if error:
+            raise ConversionError(error)
+        with self.lock:
+            if status == "miss":
+                self.render_seconds.append(elapsed)
+                self.cache.register(path)
+            return path.read_bytes(), status
+
+    def record(self, seconds, failed):
+        with self.lock:
+            self.requests += 1
+            self.errors += failed
+            self.latencies.append((time.monotonic(), seconds))
+
+    def metrics(self):
+        with self.lock:
+            now = time.monotonic()
+            uptime = now - self.started
+            latencies = sorted(seconds for _, seconds in self.latencies)
+            recent = sum(finished >= now - self.THROUGHPUT_WINDOW_S for finished, _ in self.latencies)
+            renders = list(self.render_seconds)
+            result = {
+                "uptime_s": round(uptime, 3),
+                "workers": self.workers,
+                "requests": self.requests,
+                "errors": self.errors,
+                "active": self.active,
+                "coalesced": self.coalesced,
+                "throughput_rps": {
+                    "overall": round(self.requests / uptime, 3) if uptime else 0.0,
+                    "recent": round(recent / min(uptime, self.THROUGHPUT_WINDOW_S), 3) if uptime else 0.0,
+                },
+                "latency_ms": {name: round(1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+                               for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))}
+                              if latencies else {},
+                "render_ms_mean": round(1000 * sum(renders) / len(renders), 3) if renders else None,
+                "cache": self.cache.stats(),
+            }
+        return result
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """POST /render?format=svg|png|jpg|json[&input=mermaid|project] with the diagram as the
+    body (the input kind is guessed when omitted); GET /metrics; GET /health."""
+    service = None  # RenderService, set by run_serve
+    server_version = "FlowchartRenderServer/1.0"
+
+    def do_GET(self):
+        route = urlsplit(self.path).path
+        if route == "/metrics":
+            self.send_body(200, "application/json", json.dumps(self.service.metrics(), indent=2).encode("utf-8"))
+        elif route == "/health":
+            self.send_body(200, "text/plain; charset=utf-8", b"ok\n")
+        else:
+            self.send_body(404, "text/plain; charset=utf-8", b"Not found\n")
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        failed = True
+        with self.service.lock:
+            self.service.active += 1
+        try:
+            if url.path != "/render":
+                self.send_body(404, "text/plain; charset=utf-8", b"Not found\n")
+                return
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            output_format = query.get("format", "svg").lower()
+            length = int(self.headers.get("Content-Length") or 0)
+            if output_format not in RENDER_SERVER_FORMATS:
+                self.send_error_text(400, f"format must be one of {', '.join(RENDER_SERVER_FORMATS)}")
+                return
+            if not 0 < length <= RENDER_SERVER_MAX_BODY:
+                self.send_error_text(413 if length else 400, "Body must hold the diagram (at most 16 MiB)")
+                return
+            try:
+                text = self.rfile.read(length).decode("utf-8")
+            except UnicodeDecodeError:
+                self.send_error_text(400, "Body must be UTF-8 text")
+                return
+            source_kind = query.get("input") or ("project" if text.lstrip().startswith("{") else "mermaid")
+            if source_kind not in ("mermaid", "project"):
+                self.send_error_text(400, "input must be mermaid or project")
+                return
+            try:
+                content, status = self.service.render(text, source_kind, output_format)
+            except ConversionError as e:
+                self.send_error_text(422, str(e))
+                return
+            except TimeoutError:
+                self.send_error_text(504, "Rendering timed out")
+                return
+            except Exception as e:
+                self.send_error_text(500, f"Rendering failed: {e}")
+                return
+            failed = False
+            self.send_body(200, RENDER_SERVER_FORMATS[output_format], content, {"X-Render-Cache": status})
+        finally:
+            with self.service.lock:
+                self.service.active -= 1
+            self.service.record(time.perf_counter() - start, failed)
+
+    def send_body(self, code, content_type, content, headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_error_text(self, code, message):
+        self.send_body(code, "text/plain; charset=utf-8", (message + "\n").encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass  # One line per request would dominate the output; see /metrics instead
+
+def run_serve(args):
+    cache_dir = Path(args.cache_dir) if args.cache_dir else user_cache_dir() / "render-server"
+    service = RenderService(max(1, args.workers or os.cpu_count() or 1),
+                            RenderCache(cache_dir, args.cache_mb * 1024 * 1024))
+    RenderRequestHandler.service = service
+    # Loopback only: the server renders whatever it is sent
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), RenderRequestHandler)
+    server.daemon_threads = True
+    # Stop cleanly on SIGTERM too (serve_forever has to be stopped from another thread)
+    signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=server.shutdown).start())
+    try:
+        service.warm_up()
+        print(f"Render server listening on http://127.0.0.1:{server.server_address[1]} "
+              f"({service.workers} workers, cache {cache_dir})", flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(prog="plot_flowchart.py",
+                                     description="Flowchart Designer. Without a command the designer window opens.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser(
+        "convert", help="convert diagram files without opening a window",
+        description="Converts between Mermaid (.mmd/.txt), projects (.json, .json.gz, .json.xz, .fcb), "
+                    "canvas images (.svg, .png, .jpg) and interactive HTML (.html).")
+    convert.add_argument("inputs", nargs="+", metavar="FILE",
+                         help="SOURCE TARGET, or any number of sources when --to is given")
+    convert.add_argument("--to", metavar="FORMAT", help="target extension for every source, e.g. svg or json.gz")
+    convert.add_argument("--out-dir", metavar="DIR", help="folder for the --to outputs (default: next to each source)")
+    convert.add_argument("--no-physics", action="store_true", help="disable physics in HTML output")
+    convert.set_defaults(handler=run_convert)
+    batch = commands.add_parser(
+        "batch", help="render every diagram in a folder tree to images, in parallel",
+        description="Renders every .mmd and project file below DIRECTORY to canvas images on a pool of "
+                    "worker processes. Sources whose content is unchanged since the last run are skipped.")
+    batch.add_argument("directory", metavar="DIRECTORY")
+    batch.add_argument("--out-dir", metavar="DIR", help="output tree (default: next to each source)")
+    batch.add_argument("--formats", default="png,svg", help="comma-separated image formats (default: png,svg)")
+    batch.add_argument("--jobs", type=int, default=0, help="worker processes (default: one per CPU)")
+    batch.add_argument("--force", action="store_true", help="render unchanged sources too")
+    batch.set_defaults(handler=run_batch)
+    watch = commands.add_parser(
+        "watch", help="re-render diagrams in a folder tree whenever their sources change",
+        description="Renders every .mmd and project file below DIRECTORY to canvas images, then keeps "
+                    "watching and re-renders only the sources that change, after a debounce.")
+    watch.add_argument("directory", metavar="DIRECTORY")
+    watch.add_argument("--out-dir", metavar="DIR", help="output tree (default: next to each source)")
+    watch.add_argument("--formats", default="png,svg", help="comma-separated image formats (default: png,svg)")
+    watch.add_argument("--debounce", type=int, default=300, metavar="MS",
+                       help="quiet time after the last change before rendering (default: 300)")
+    watch.set_defaults(handler=run_watch)
+    serve = commands.add_parser(
+        "serve", help="run a localhost HTTP server that renders Mermaid or project JSON",
+        description="Serves POST /render?format=svg|png|jpg|json on 127.0.0.1 with a pool of warm worker "
+                    "processes and a content-addressed result cache; GET /metrics reports latency and throughput.")
+    serve.add_argument("--port", type=int, default=8765, help="TCP port on 127.0.0.1 (default: 8765, 0 = any free port)")
+    serve.add_argument("--workers", type=int, default=0, help="render processes (default: one per CPU)")
+    serve.add_argument("--cache-dir", metavar="DIR", help="result cache folder (default: in the user cache folder)")
+    serve.add_argument("--cache-mb", type=int, default=RENDER_SERVER_CACHE_MAX_BYTES // (1024 * 1024),
+                       help="result cache size limit in MiB (default: 500)")
+    serve.set_defaults(handler=run_serve)
+    return parser
+
+def run_cli(argv):
+    """Runs a command-line command; returns the process exit code."""
+    args = build_cli_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except ConversionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+CLI_COMMANDS = ("convert", "batch", "watch", "serve")
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS + ("-h", "--help"):
+        sys.exit(run_cli(sys.argv[1:]))
+
+    # QtWebEngine is imported after the QApplication exists (see ensure_preview_widget),
+    # which it only allows when OpenGL contexts are shared
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     